@@ -0,0 +1,485 @@
+"""Измерение быстродействия методов INA219Simple, INA219, INA226 на эмулируемой шине (ina_emu, sensor_pack_2.sim_bus).
+Работает на CPython и порте MicroPython unix. Для каждого метода выводит:
+    ns/call - время вызова в нс;
+    alloc/call - выделение памяти драйвером в куче, байт на вызов (MicroPython: gc.mem_alloc при выключенной сборке
+                 мусора; CPython: пиковый прирост памяти по tracemalloc). Измеряется на шине без выделения памяти
+                 (смотри _RegBus), поэтому все выделения - выделения драйвера, в том числе вызовы machine.I2C, которые
+                 возвращают новый объект bytes. В CPython целые больше 256 - объекты в куче, поэтому метод, который
+                 возвращает или вычисляет такое целое, показывает несколько десятков байт; в MicroPython это
+                 'малые' целые без выделения памяти;
+    tr/call - транзакций на шине I2C на вызов;
+    bus_us/call - время занятости шины 400 кГц на вызов, мкс.
+Отдельно измеряется путь записи 16-ти битного регистра (смотри _write_cases): запись целого через bytes
+(I2cAdapter.write_register) и через буфер адаптера (write_register_int, DeviceEx.write_reg_int, write_reg_16),
+и доступ к битовому полю (смотри _bitfield_cases): скомпилированные маски BitFields и вычисление маски при каждом
+обращении с поиском поля по имени (_UncompiledFields).
+Измеряются все открытые методы датчиков. Исключения с причинами - в _excluded, метод без случая измерения
+и без исключения считается ошибкой.
+Базовые значения хранятся в файле (по умолчанию bench_ina_baseline.json), отдельно для каждой реализации Python.
+Программа завершается с кодом 1, если значение хуже базового больше допуска, если метод завершился ошибкой,
+если для метода из базовых значений нет результата или если нет базовых значений для этой реализации Python.
+Время вызова зависит от компьютера и его загрузки, остальные значения от компьютера не зависят. Поэтому
+базовые значения в репозитории сохранены без времени (--no-time), время сравнивается только с базовыми значениями,
+сохраненными на том же компьютере.
+Запуск:
+    python bench_ina.py                  сравнение с базовыми значениями
+    python bench_ina.py --save           сохранение текущих значений как базовых
+    python bench_ina.py --save --no-time сохранение базовых значений без времени вызова
+    python bench_ina.py --tolerance=0.3  допуск для времени вызова (30 %)
+    python bench_ina.py --filter=INA226  только методы, имя которых содержит INA226
+    python bench_ina.py --baseline=file.json --count=500
+
+Benchmark suite for the ina_ti public methods with regression thresholds."""
+import sys
+import gc
+import json
+from array import array
+from sensor_pack_2.bus_service import I2cAdapter
+from sensor_pack_2.sim_bus import TimedSimI2C, SimClock
+from sensor_pack_2.timeutil import ticks_us, ticks_diff
+from sensor_pack_2.bitfield import BitFields, _bitmask
+from ina_emu import INA219Emu, INA226Emu
+import ina_ti
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# методы для измерения: имя метода: аргументы
+_common_cases = {
+    'get_shunt_voltage': (),
+    'get_voltage': (),
+    'get_shunt_reg': (),
+    'get_bus_reg': (),
+    'get_cfg_reg': (),
+    'get_16bit_reg': (0x01, 'h'),
+    'read_reg_16': (0x02,),
+    'get_conversion_cycle_time': (),
+    'get_shunt_lsb': (),
+    'get_bus_lsb': (),
+    'soft_reset': (),
+}
+
+_ex_cases = {
+    '__next__': (),
+    'get_current': (),
+    'get_power': (),
+    'get_curr_reg': (),
+    'get_pwr_reg': (),
+    'get_data_status': (),
+    'is_conversion_ready': (),
+    'get_status_reg': (),
+    'read_snapshot': (),
+    'get_config': (),
+    'set_config': (),
+    'get_current_config_hr': (),
+    'get_clbr_reg': (),
+    'get_scales': (),
+    'get_measurement_value': (0,),
+    'get_averaging_count': (),
+    'get_cct': (True,),
+    'get_config_field': (),
+    'get_shadow_stats': (),
+    'is_single_shot_mode': (),
+    'is_continuously_mode': (),
+    'start_measurement': (),
+    'calibrate': None,  # аргументы зависят от датчика, смотри _calibrate_args
+    'capture': (16, None, False, 1),
+    'choose_shunt_voltage_range': (0.05,),
+    'get_calibration': None,  # аргументы зависят от датчика, смотри _calibrate_args
+    'get_current_lsb': (),
+    'get_pwr_lsb': (1E-4,),
+    # значения, равные текущим: записи по шине нет (теневые копии)
+    'set_clbr_reg': lambda sensor: (sensor.get_clbr_reg(),),
+    'set_config_field': lambda sensor: (sensor.get_config_field('CNTNS'), 'CNTNS'),
+    'config_transaction': lambda sensor: _config_transaction,
+    'flush_shadow': (),
+    'invalidate_shadow': (0x05,),
+    'resync_shadow': (),
+    'read_raw': lambda sensor: (sensor.address, tuple(array(tc, (0,)) for tc in 'hHhHH')),
+    'feed_stats': lambda sensor: (sensor.make_stats(),),
+    # выделяют память по назначению: вызываются один раз при настройке
+    'make_capture_buffer': (16,),
+    'make_stats': (),
+}
+
+_ina219_cases = {
+    'shunt_voltage_range_to_volt': (3,),
+}
+
+_ina226_cases = {
+    'get_mask_enable': (),
+    'get_alert_limit': (),
+    'set_alert_limit': (0x1000,),
+    'limit_to_raw': ('bus_ov', 20.0),
+    'watch': (),
+    'get_id': (),
+    'get_conv_time': (4,),
+    'set_mask_enable': lambda sensor: (sensor.get_mask_enable(),),
+    'enable_conversion_ready_alert': (),
+    'set_threshold': ('bus_ov', 20.0),
+    'clear_threshold': (),
+}
+
+# количество измерений времени вызова, смотри measure
+_ROUNDS = 5
+
+# аргументы calibrate: максимальный ток, А; сопротивление шунта, Ом
+_calibrate_args = {'INA219': (2.0, 0.1), 'INA226': (2.0, 0.01)}
+
+# методы, которые не относятся к датчику (общие методы доступа к шине базовых классов) и не измеряются
+_not_measured = ('is_big_byteorder', 'pack', 'unpack', 'read', 'read_to_buf', 'write', 'read_buf_from_mem',
+                 'write_buf_to_mem', 'read_reg', 'read_reg_16_from', 'write_reg', 'write_reg_int', 'write_reg_16',
+                 'set_16bit_reg', 'set_cfg_reg')
+# методы датчиков, которые не измеряются: 'Класс.метод': причина
+_excluded = {
+    'INA219Simple.get_id': "нет регистра идентификатора, NotImplementedError",
+    'INA219.get_id': "нет регистра идентификатора, NotImplementedError",
+}
+
+
+def _config_transaction(sensor):
+    """Транзакция конфигурации (config_transaction) целиком: создание, изменение поля текущим значением и фиксация"""
+    with sensor.config_transaction() as cfg:
+        cfg['CNTNS'] = sensor.get_config_field('CNTNS')
+
+
+class _RegBus:
+    """Шина с одним устройством, не выделяющая память, для измерения alloc/call (смотри _alloc_per_call).
+    16-ти битные регистры хранятся в заранее выделенных bytearray, старшие и младшие байты отдельно, чтобы индексы
+    оставались целыми до 256 (в CPython это заранее созданные объекты). Содержимое регистров копируется
+    из эмулятора и со временем не изменяется. Флаг готовности данных (INA219: CNVR, INA226: CVRF) установлен,
+    поэтому ожидание готовности завершается сразу. Методы readfrom и readfrom_mem выделяют память, как machine.I2C."""
+
+    def __init__(self, emu):
+        self._hi, self._lo = bytearray(256), bytearray(256)
+        for reg in tuple(range(8)) + (0xFE, 0xFF):
+            val = emu.read_reg(reg)
+            self._hi[reg], self._lo[reg] = val >> 8, val & 0xFF
+        if isinstance(emu, INA226Emu):
+            self._lo[0x06] |= 0x08
+        else:
+            self._lo[0x02] |= 0x02
+        self._ptr = 0
+
+    def writeto(self, addr: int, buf, stop: bool = True) -> int:
+        reg = self._ptr = buf[0]
+        if len(buf) > 2:
+            self._hi[reg], self._lo[reg] = buf[1], buf[2]
+        return len(buf)
+
+    def readfrom(self, addr: int, nbytes: int, stop: bool = True) -> bytes:
+        buf = bytearray(nbytes)
+        self.readfrom_into(addr, buf)
+        return bytes(buf)
+
+    def readfrom_into(self, addr: int, buf, stop: bool = True):
+        reg = self._ptr
+        buf[0], buf[1] = self._hi[reg], self._lo[reg]
+
+    def writeto_mem(self, addr: int, memaddr: int, buf, addrsize: int = 8):
+        self._ptr = memaddr
+        self._hi[memaddr], self._lo[memaddr] = buf[0], buf[1]
+
+    def readfrom_mem(self, addr: int, memaddr: int, nbytes: int, addrsize: int = 8) -> bytes:
+        self._ptr = memaddr
+        return self.readfrom(addr, nbytes)
+
+    def readfrom_mem_into(self, addr: int, memaddr: int, buf, addrsize: int = 8):
+        self._ptr = memaddr
+        buf[0], buf[1] = self._hi[memaddr], self._lo[memaddr]
+
+
+def _make(cls):
+    """Возвращает настроенный датчик класса cls на эмулируемой шине 400 кГц и эту шину"""
+    clock = SimClock()
+    bus = TimedSimI2C(freq=400_000, clock=clock)
+    emu = bus.attach(0x40, INA226Emu(clock=clock) if cls is ina_ti.INA226 else INA219Emu(clock=clock))
+    emu.set_input(shunt_voltage=0.0123, bus_voltage=11.7)
+    sensor = cls(I2cAdapter(bus))
+    if cls is not ina_ti.INA219Simple:
+        sensor.calibrate(*_calibrate_args[cls.__name__])
+        sensor.start_measurement(continuous=True)
+    clock.advance(10_000)
+    return sensor, bus
+
+
+def _cases(cls) -> dict:
+    cases = dict(_common_cases)
+    if cls is not ina_ti.INA219Simple:
+        cases.update(_ex_cases)
+        cases['calibrate'] = cases['get_calibration'] = _calibrate_args[cls.__name__]
+    if cls is ina_ti.INA219:
+        cases.update(_ina219_cases)
+    if cls is ina_ti.INA226:
+        cases.update(_ina226_cases)
+    return cases
+
+
+def _alloc_per_call(method, args) -> float:
+    """Возвращает выделение памяти в байтах на один вызов"""
+    if tracemalloc is None:
+        # MicroPython
+        gc.collect()
+        gc.disable()
+        try:
+            before = gc.mem_alloc()
+            for _ in range(10):
+                method(*args)
+            return (gc.mem_alloc() - before) / 10
+        finally:
+            gc.enable()
+    tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(3):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            method(*args)
+            total += tracemalloc.get_traced_memory()[1] - before
+        return total / 3
+    finally:
+        tracemalloc.stop()
+
+
+def _write_cases(sensor) -> dict:
+    """Путь записи 16-ти битного регистра: имя: (метод, аргументы). Сравнивается прежняя запись целого через
+    bytes (int.to_bytes в write_register) с записью в буфер адаптера (write_register_int) и методы DeviceEx.
+    Записывается текущее значение регистра калибровки, поэтому состояние эмулятора не изменяется"""
+    adapter, addr = sensor.adapter, sensor.address
+    cal = sensor.read_reg_16(0x05)
+    return {
+        'I2cAdapter.write_register': (adapter.write_register, (addr, 0x05, cal, 2, 'big')),
+        'I2cAdapter.write_register_int': (adapter.write_register_int, (addr, 0x05, cal, 2, True)),
+        'DeviceEx.write_reg': (sensor.write_reg, (0x05, cal, 2)),
+        'DeviceEx.write_reg_int': (sensor.write_reg_int, (0x05, cal, 2)),
+        'DeviceEx.write_reg_16': (sensor.write_reg_16, (0x05, cal)),
+    }
+
+
+class _UncompiledFields:
+    """Доступ к битовым полям без компиляции: поиск поля перебором по имени и вычисление маски _bitmask
+    при каждом обращении. Образец для сравнения с BitFields"""
+
+    def __init__(self, fields_info: tuple):
+        self._fields_info = fields_info
+
+    def _by_name(self, name: str):
+        for item in self._fields_info:
+            if name == item.name:
+                return item
+
+    def get_field_value(self, field_name: str, source: int) -> [int, bool]:
+        pos = self._by_name(field_name).position
+        val = (source & _bitmask(pos)) >> pos.start
+        if 1 == len(pos):
+            return 0 != val
+        return val
+
+    def set_field_value(self, value: int, source: int, field: str) -> int:
+        item = self._by_name(field)
+        rng = item.valid_values
+        if rng and value not in rng:
+            raise ValueError(f"{field}: {value}")
+        pos = item.position
+        bitmask = _bitmask(pos)
+        return (source & ~bitmask) | ((value << pos.start) & bitmask)
+
+
+def _bitfield_cases(sensor) -> dict:
+    """Доступ к полю SADC (последнее многобитовое поле) регистра конфигурации INA219: имя: (метод, аргументы).
+    Шина не используется, параметр sensor не нужен"""
+    fields_info = ina_ti.INA219._config_reg_ina219
+    compiled, uncompiled = BitFields(fields_info), _UncompiledFields(fields_info)
+    return {
+        'BitFields.get_field_value': (compiled.get_field_value, ('SADC', False, 0x399F)),
+        'BitFields.set_field_value': (compiled.set_field_value, (0x0B, 0x399F, 'SADC')),
+        'uncompiled.get_field_value': (uncompiled.get_field_value, ('SADC', 0x399F)),
+        'uncompiled.set_field_value': (uncompiled.set_field_value, (0x0B, 0x399F, 'SADC')),
+    }
+
+
+def measure(cls, name: str, args, count: int) -> dict:
+    """Измеряет метод name датчика класса cls. Возвращает словарь: ns, alloc, tr, bus_us на вызов.
+    args - аргументы метода или функция args(sensor), которая возвращает аргументы для настроенного датчика,
+    либо функцию, которая измеряется вместо метода (вызывается с аргументом sensor)"""
+    sensor, bus = _make(cls)
+    method = getattr(sensor, name)
+    if callable(args):
+        args = args(sensor)
+        if callable(args):
+            method, args = args, (sensor,)
+    return _measure(sensor, bus, method, args, count)
+
+
+def _measure(sensor, bus, method, args: tuple, count: int) -> dict:
+    """Измеряет вызов method(*args) на датчике sensor, подключенном к эмулируемой шине bus"""
+    # прогрев: кэши драйвера, теневые копии регистров, указатель регистра
+    method(*args)
+    # транзакции шины
+    bus.reset_stats()
+    method(*args)
+    st = bus.get_stats(0x40)
+    # память: на шине без выделения памяти. Указатель регистра адаптера после подмены шины неизвестен
+    adapter = sensor.adapter
+    adapter.bus = _RegBus(bus.device(0x40))
+    adapter.invalidate_reg_pointer(sensor.address)
+    try:
+        alloc = _alloc_per_call(method, args)
+    finally:
+        adapter.bus = bus
+        adapter.invalidate_reg_pointer(sensor.address)
+    # время: наименьшее из _ROUNDS измерений, чтобы уменьшить влияние других процессов и сборки мусора
+    per_round = max(1, count // _ROUNDS)
+    best = None
+    for _ in range(_ROUNDS):
+        gc.collect()
+        start = ticks_us()
+        for _ in range(per_round):
+            method(*args)
+        elapsed = ticks_diff(ticks_us(), start)
+        if best is None or elapsed < best:
+            best = elapsed
+    return {'ns': round(1000 * best / per_round), 'alloc': round(alloc, 1), 'tr': st.transactions,
+            'bus_us': round(st.busy_us, 1)}
+
+
+def run(count: int = 200, name_filter: [str, None] = None) -> dict:
+    """Измеряет все методы. Возвращает словарь: 'Класс.метод': результат measure.
+    Для метода, завершившегося ошибкой, результат - словарь с единственным ключом 'error'."""
+    results = dict()
+    for cls in (ina_ti.INA219Simple, ina_ti.INA219, ina_ti.INA226):
+        cases = _cases(cls)
+        for n in dir(cls):
+            key = f"{cls.__name__}.{n}"
+            if n.startswith('_') or not callable(getattr(cls, n)) or n in cases or n in _not_measured:
+                continue
+            if key in _excluded:
+                print(f"{key}: не измеряется: {_excluded[key]}")
+            elif not (name_filter and name_filter not in key):
+                results[key] = {'error': "нет случая измерения (добавьте его или исключение в _excluded)"}
+        for name, args in cases.items():
+            key = f"{cls.__name__}.{name}"
+            if name_filter and name_filter not in key:
+                continue
+            try:
+                results[key] = measure(cls, name, args, count)
+            except Exception as e:
+                results[key] = {'error': f"{type(e).__name__}: {e}"}
+    for micro_cases in (_write_cases, _bitfield_cases):
+        for key in micro_cases(_make(ina_ti.INA226)[0]):
+            if name_filter and name_filter not in key:
+                continue
+            try:
+                sensor, bus = _make(ina_ti.INA226)
+                method, args = micro_cases(sensor)[key]
+                results[key] = _measure(sensor, bus, method, args, count)
+            except Exception as e:
+                results[key] = {'error': f"{type(e).__name__}: {e}"}
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float, name_filter: [str, None] = None) -> list:
+    """Возвращает список регрессий. Время сравнивается с допуском tolerance (доля),
+    выделение памяти, транзакции и время занятости шины - точно.
+    Регрессия - также ошибка метода и метод из базовых значений (с учетом name_filter), для которого нет результата."""
+    regressions = []
+    for key in baseline:
+        if key not in results and not (name_filter and name_filter not in key):
+            regressions.append(f"{key}: нет результата")
+    for key, res in results.items():
+        if 'error' in res:
+            regressions.append(f"{key}: ошибка {res['error']}")
+            continue
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if 'ns' in base and res['ns'] > base['ns'] * (1 + tolerance):
+            regressions.append(f"{key}: ns/call {base['ns']} -> {res['ns']}")
+        if res['alloc'] > base['alloc'] + 1:
+            regressions.append(f"{key}: alloc/call {base['alloc']} -> {res['alloc']}")
+        if res['tr'] > base['tr']:
+            regressions.append(f"{key}: tr/call {base['tr']} -> {res['tr']}")
+        if res['bus_us'] > base['bus_us'] + 0.1:
+            regressions.append(f"{key}: bus_us/call {base['bus_us']} -> {res['bus_us']}")
+    return regressions
+
+
+def _print(results: dict, baseline: dict):
+    print(f"{'method':<40}{'ns/call':>10}{'base':>10}{'alloc/call':>12}{'tr/call':>9}{'bus_us/call':>13}")
+    for key, res in results.items():
+        if 'error' in res:
+            print(f"{key:<40}ошибка {res['error']}")
+            continue
+        base = baseline.get(key)
+        print(f"{key:<40}{res['ns']:>10}{base.get('ns', '-') if base else '-':>10}{res['alloc']:>12}{res['tr']:>9}"
+              f"{res['bus_us']:>13}")
+
+
+def _dump(all_baselines: dict, f):
+    """Записывает базовые значения в файл f, по одному методу в строке, чтобы изменения было удобно сравнивать.
+    json.dump в MicroPython не поддерживает параметры indent и sort_keys"""
+    impls = []
+    for impl in sorted(all_baselines):
+        base = all_baselines[impl]
+        lines = ',\n'.join(f"  {json.dumps(key)}: {json.dumps(base[key])}" for key in sorted(base))
+        impls.append(f" {json.dumps(impl)}: {{\n{lines}\n }}")
+    f.write('{\n' + ',\n'.join(impls) + '\n}\n')
+
+
+def main(argv) -> int:
+    save = False
+    no_time = False
+    tolerance = 0.25
+    path = 'bench_ina_baseline.json'
+    name_filter = None
+    count = 200
+    for arg in argv[1:]:
+        if '--save' == arg:
+            save = True
+        elif '--no-time' == arg:
+            no_time = True
+        elif arg.startswith('--tolerance='):
+            tolerance = float(arg.split('=')[1])
+        elif arg.startswith('--baseline='):
+            path = arg.split('=')[1]
+        elif arg.startswith('--filter='):
+            name_filter = arg.split('=')[1]
+        elif arg.startswith('--count='):
+            count = int(arg.split('=')[1])
+        else:
+            print(f"Неизвестный параметр: {arg}")
+            return 2
+    impl = sys.implementation.name
+    try:
+        with open(path) as f:
+            all_baselines = json.load(f)
+    except OSError:
+        all_baselines = dict()
+    baseline = all_baselines.get(impl, dict())
+    results = run(count, name_filter)
+    _print(results, baseline)
+    errors = [key for key, res in results.items() if 'error' in res]
+    if save:
+        for key, res in results.items():
+            if 'error' not in res:
+                baseline[key] = {k: v for k, v in res.items() if not (no_time and 'ns' == k)}
+        all_baselines[impl] = baseline
+        with open(path, 'w') as f:
+            _dump(all_baselines, f)
+        print(f"Базовые значения сохранены: {path} ({impl})")
+        if errors:
+            print(f"Не сохранены (ошибка): {', '.join(errors)}")
+        return 1 if errors else 0
+    if not baseline:
+        print(f"Нет базовых значений для {impl} в {path}. Сохраните их: --save")
+        return 1
+    regressions = compare(results, baseline, tolerance, name_filter)
+    for line in regressions:
+        print(f"РЕГРЕССИЯ: {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
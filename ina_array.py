@@ -0,0 +1,278 @@
+"""Группы датчиков INA219/INA226 на одной шине I2C.
+
+Groups of INA219/INA226 sensors sharing one I2C bus."""
+from array import array
+from collections import namedtuple
+from ina_ti import INABaseEx
+from ina_conv import ina_block, scale
+from sensor_pack_2.timeutil import ticks_us, ticks_add, ticks_diff, sleep_us
+
+# статистика последнего синхронного измерения группы, мкс
+# trigger_span_us - время от запуска первого до запуска последнего датчика (рассогласование отсчетов во времени);
+# min_skew_us, max_skew_us - наименьшее и наибольшее время от запуска датчика до чтения его данных;
+# read_span_us - время чтения данных всех датчиков
+group_stats = namedtuple("group_stats", "trigger_span_us min_skew_us max_skew_us read_span_us")
+
+
+def _zeros(typecode: str, n: int) -> array:
+    return array(typecode, (0 for _ in range(n)))
+
+
+class SensorGroup:
+    """Синхронные однократные измерения группой датчиков (до 16-ти INA226 по адресам 0x40..0x4F) на одной шине.
+    Все датчики запускаются подряд, без промежуточных чтений, затем выполняется одно ожидание по наибольшему
+    предсказанному времени преобразования и данные всех датчиков считываются за один проход.
+    Результаты (сырые коды регистров) и метки времени (ticks_us) хранятся в массивах, по индексу датчика:
+    shunt, bus, current, trigger_ts, read_ts.
+    Пример:
+        group = SensorGroup((ina_0, ina_1, ina_2))
+        group.prepare()
+        while True:
+            group.sample()
+            print(group.shunt, group.get_stats())"""
+
+    def __init__(self, sensors: tuple):
+        if not sensors:
+            raise ValueError("Группа датчиков не может быть пустой!")
+        self._sensors = tuple(sensors)
+        n = len(self._sensors)
+        # настройки однократного измерения и время преобразования каждого датчика
+        self._configs = _zeros('H', n)
+        self._cct = _zeros('I', n)
+        # результаты
+        self.shunt = _zeros('h', n)
+        self.bus = _zeros('H', n)
+        self.current = _zeros('h', n)
+        self.trigger_ts = _zeros('I', n)
+        self.read_ts = _zeros('I', n)
+        self._trigger_span = self._min_skew = self._max_skew = self._read_span = 0
+
+    def __len__(self) -> int:
+        return len(self._sensors)
+
+    def __getitem__(self, index: int) -> INABaseEx:
+        return self._sensors[index]
+
+    def prepare(self):
+        """Переводит сохраненные конфигурации всех датчиков в режим однократных измерений и запоминает их.
+        Вызовите после настройки и калибровки датчиков, а также после каждого изменения их настроек!"""
+        for i, sensor in enumerate(self._sensors):
+            sensor.set_config_field(False, 'CNTNS')
+            self._configs[i] = sensor.get_config_field()
+            self._cct[i] = sensor.get_conversion_cycle_time()
+
+    def trigger(self):
+        """Запускает однократное измерение всеми датчиками подряд"""
+        sensors, configs, trigger_ts = self._sensors, self._configs, self.trigger_ts
+        for i in range(len(sensors)):
+            # запись в регистр конфигурации запускает однократное измерение
+            sensors[i].set_cfg_reg(configs[i])
+            trigger_ts[i] = ticks_us()
+
+    def wait(self):
+        """Одно ожидание завершения преобразования всеми датчиками, по предсказанному времени"""
+        trigger_ts, cct = self.trigger_ts, self._cct
+        deadline = ticks_add(trigger_ts[0], cct[0])
+        for i in range(1, len(trigger_ts)):
+            t = ticks_add(trigger_ts[i], cct[i])
+            if ticks_diff(t, deadline) > 0:
+                deadline = t
+        delay = ticks_diff(deadline, ticks_us())
+        if delay > 0:
+            sleep_us(delay)
+
+    def drain(self):
+        """Считывает данные всех датчиков за один проход и вычисляет рассогласование по времени"""
+        sensors = self._sensors
+        shunt, bus, current = self.shunt, self.bus, self.current
+        trigger_ts, read_ts = self.trigger_ts, self.read_ts
+        for i in range(len(sensors)):
+            sensor = sensors[i]
+            read_ts[i] = ticks_us()
+            shunt[i] = sensor.read_reg_16(0x01, True)
+            bus[i] = sensor.read_reg_16(0x02, False)
+            current[i] = sensor.read_reg_16(0x04, True)
+        # статистика
+        last = len(sensors) - 1
+        self._trigger_span = ticks_diff(trigger_ts[last], trigger_ts[0])
+        self._read_span = ticks_diff(ticks_us(), read_ts[0])
+        min_skew = max_skew = ticks_diff(read_ts[0], trigger_ts[0])
+        for i in range(1, last + 1):
+            skew = ticks_diff(read_ts[i], trigger_ts[i])
+            if skew < min_skew:
+                min_skew = skew
+            if skew > max_skew:
+                max_skew = skew
+        self._min_skew, self._max_skew = min_skew, max_skew
+
+    def sample(self):
+        """Синхронное однократное измерение всеми датчиками: запуск, ожидание, чтение"""
+        self.trigger()
+        self.wait()
+        self.drain()
+
+    def get_stats(self) -> group_stats:
+        """Возвращает статистику последнего синхронного измерения"""
+        return group_stats(trigger_span_us=self._trigger_span, min_skew_us=self._min_skew,
+                           max_skew_us=self._max_skew, read_span_us=self._read_span)
+
+
+class SensorArray:
+    """Массив однотипных датчиков на одной шине, обслуживаемый одним(!) экземпляром драйвера (INA219 или INA226).
+    Настройки и калибровка каждого датчика хранятся в компактных массивах, а не в отдельном объекте для каждого
+    датчика. Одинаковые конфигурации хранятся один раз. Запись в регистры датчика производится только при изменении.
+    Опрос выполняется по кругу, по одному считыванию всех регистров данных на датчик.
+    Результаты (сырые коды) хранятся по столбцам, один массив на величину: shunt, bus, current, power, status, ts.
+    Обмен с датчиками массива идет по их адресам (INABaseEx.read_raw, запись через адаптер шины), мимо теневых
+    копий и сохраненной конфигурации драйвера. Адрес драйвера не изменяется, поэтому драйвер можно использовать
+    и отдельно, для своего датчика.
+    Пример:
+        drv = INA226(adapter, address=0x40, shunt_resistance=0.01)
+        arr = SensorArray(drv, addresses=range(0x40, 0x50))
+        arr.set_config(drv.get_config_field())  # настройки драйвера (шаблона) для всех датчиков
+        arr.calibrate(2.0)
+        arr.apply()
+        arr.poll()
+        values = arr.get_units()"""
+
+    def __init__(self, driver: INABaseEx, addresses, shunt_resistances=None):
+        """driver - драйвер, экземпляр INA219 или INA226. Используется для обмена со всеми датчиками массива;
+        addresses - адреса датчиков на шине;
+        shunt_resistances - сопротивления шунтов в Омах, по одному на датчик. None - как у driver."""
+        self._driver = driver
+        self._addresses = bytearray(addresses)
+        n = len(self._addresses)
+        if 0 == n:
+            raise ValueError("Массив датчиков не может быть пустым!")
+        if shunt_resistances is None:
+            shunt_resistances = (driver.shunt_resistance for _ in range(n))
+        self._shunt_res = array('f', shunt_resistances)
+        # уникальные конфигурации и индекс конфигурации каждого датчика
+        self._cfg_table = array('H', (driver.get_config_field(),))
+        self._cfg_index = bytearray(n)
+        # калибровка: значение регистра и цены младших разрядов тока и мощности каждого датчика
+        self._cal = _zeros('H', n)
+        self._current_lsb = array('f', (0.0 for _ in range(n)))
+        self._power_lsb = array('f', (0.0 for _ in range(n)))
+        # значения, записанные в регистры конфигурации и калибровки датчиков. -1 - неизвестно
+        self._cfg_written = array('l', (-1 for _ in range(n)))
+        self._cal_written = array('l', (-1 for _ in range(n)))
+        # результаты опроса, по столбцам
+        self.shunt = _zeros('h', n)
+        self.bus = _zeros('H', n)
+        self.current = _zeros('h', n)
+        self.power = _zeros('H', n)
+        self.status = _zeros('H', n)
+        self.ts = _zeros('I', n)
+        # столбцы в порядке ячеек INABaseEx.read_raw. status: INA226 - Mask/Enable; INA219 - флаги CNVR, OVF
+        self._columns = self.shunt, self.bus, self.current, self.power, self.status
+        # индекс следующего опрашиваемого датчика
+        self._next = 0
+        adapter = driver.adapter
+        for addr in self._addresses:
+            adapter.track_reg_pointer(addr)
+
+    def __len__(self) -> int:
+        return len(self._addresses)
+
+    @property
+    def driver(self) -> INABaseEx:
+        return self._driver
+
+    def get_address(self, index: int) -> int:
+        return self._addresses[index]
+
+    def _devices(self, devices) -> [range, tuple]:
+        return range(len(self._addresses)) if devices is None else devices
+
+    def set_config(self, value: int, devices=None):
+        """Устанавливает сырую конфигурацию value для датчиков с индексами devices (None - для всех).
+        Одинаковые конфигурации хранятся один раз. Запись в датчики производится методом apply."""
+        table = self._cfg_table
+        for index in range(len(table)):
+            if value == table[index]:
+                break
+        else:
+            table.append(value)
+            index = len(table) - 1
+        for i in self._devices(devices):
+            self._cfg_index[i] = index
+
+    def get_config(self, index: int) -> int:
+        """Возвращает сырую конфигурацию датчика с индексом index"""
+        return self._cfg_table[self._cfg_index[index]]
+
+    @property
+    def unique_configs(self) -> int:
+        """Количество различных конфигураций"""
+        return len(self._cfg_table)
+
+    def calibrate(self, max_expected_current: float, devices=None):
+        """Вычисляет калибровку датчиков с индексами devices (None - для всех) по максимальному току, Ампер.
+        Для одинаковых сопротивлений шунтов калибровка вычисляется один раз. Запись в датчики - методом apply.
+        Диапазон напряжения на шунте (поле PGA у INA219) задается конфигурацией, смотри set_config!"""
+        drv = self._driver
+        cache = dict()
+        for i in self._devices(devices):
+            res = self._shunt_res[i]
+            cal = cache.get(res)
+            if cal is None:
+                # драйвер не изменяется, смотри INABaseEx.get_calibration
+                cal = drv.get_calibration(max_expected_current, res)
+                cache[res] = cal
+            self._cal[i] = cal.value
+            self._current_lsb[i] = cal.current_lsb
+            self._power_lsb[i] = cal.power_lsb
+
+    def apply(self, force: bool = False) -> int:
+        """Записывает конфигурацию и калибровку в датчики, у которых они изменились (все при force в Истина).
+        Возвращает количество записей по шине."""
+        drv = self._driver
+        adapter, big = drv.adapter, drv.big_byte_order
+        writes = 0
+        for i in range(len(self._addresses)):
+            addr = self._addresses[i]
+            cal = self._cal[i]
+            if force or cal != self._cal_written[i]:
+                adapter.write_register_int(addr, 0x05, cal, 2, big)
+                self._cal_written[i] = cal
+                writes += 1
+            cfg = self.get_config(i)
+            if force or cfg != self._cfg_written[i]:
+                adapter.write_register_int(addr, 0x00, cfg, 2, big)
+                self._cfg_written[i] = cfg
+                writes += 1
+        return writes
+
+    def poll(self, count: [int, None] = None) -> int:
+        """Опрашивает по кругу count датчиков (None - все), начиная со следующего после последнего опрошенного.
+        Сырые коды записываются в столбцы shunt, bus, current, power, status, метки времени в ts.
+        Возвращает индекс следующего опрашиваемого датчика."""
+        n = len(self._addresses)
+        cnt = n if count is None else count
+        read_raw = self._driver.read_raw
+        addresses, columns, ts, index = self._addresses, self._columns, self.ts, self._next
+        for _ in range(cnt):
+            ts[index] = ticks_us()
+            read_raw(addresses[index], columns, index)
+            index += 1
+            if index >= n:
+                index = 0
+        self._next = index
+        return index
+
+    def get_units(self) -> ina_block:
+        """Преобразует последние результаты опроса всех датчиков в физические величины, по столбцам.
+        Возвращает ina_conv.ina_block: shunt, bus - Вольт; current - Ампер; power - Ватт."""
+        sc = self._driver.get_scales()
+        # у каждого датчика своя калибровка: преобразование с единичной ценой разряда, затем умножение.
+        # Все столбцы одного типа: ndarray при наличии NumPy/ulab, иначе array('f'), смотри ina_conv.scale
+        current = scale(self.current, 1.0)
+        power = scale(self.power, 1.0)
+        cur_lsb, pwr_lsb = self._current_lsb, self._power_lsb
+        for i in range(len(self._addresses)):
+            current[i] *= cur_lsb[i]
+            power[i] *= pwr_lsb[i]
+        return ina_block(shunt=scale(self.shunt, sc.shunt_lsb),
+                         bus=scale(self.bus, sc.bus_lsb, sc.bus_shift),
+                         current=current, power=power)
@@ -0,0 +1,113 @@
+"""Асинхронные (asyncio/uasyncio) варианты методов датчиков INA219/INA226.
+Вместо блокирующего ожидания преобразования (time.sleep_us) задача уступает управление циклу событий
+на предсказанное время преобразования (get_conversion_cycle_time), поэтому один цикл событий может обслуживать
+много датчиков, обмен данными и запись в журнал одновременно.
+Работает под asyncio (CPython, для проверок) и uasyncio (MicroPython).
+
+Asyncio/uasyncio variants of the INA219/INA226 driver methods."""
+from ina_ti import INABaseEx, InaSnapshot
+from sensor_pack_2.timeutil import ticks_us, ticks_add, ticks_diff
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+
+async def sleep_us(us: int):
+    """Уступает управление циклу событий на us мкс. Разрешение - 1 мс (uasyncio), меньшие задержки - просто
+    передача управления другим задачам"""
+    if us <= 0:
+        await asyncio.sleep(0)
+        return
+    if hasattr(asyncio, "sleep_ms"):
+        # uasyncio
+        await asyncio.sleep_ms(us // 1000)
+        return
+    await asyncio.sleep(us / 1000_000)
+
+
+class AsyncINA:
+    """Асинхронная обертка датчика INA219/INA226 (INABaseEx).
+    Пример:
+        ina = AsyncINA(INA226(adapter))
+        await ina.start_measurement(continuous=True)
+        snap = await ina.read_snapshot()
+        async for snap in ina.stream(100):
+            print(snap.bus, snap.current)"""
+
+    def __init__(self, sensor: INABaseEx, poll_interval_us: int = 1000, max_polls: int = 10):
+        """sensor - датчик;
+        poll_interval_us - интервал повторной проверки готовности данных, если они не готовы по истечении
+        предсказанного времени преобразования;
+        max_polls - количество повторных проверок, после которого данные считываются без готовности."""
+        self._sensor = sensor
+        self._poll_us = poll_interval_us
+        self._max_polls = max_polls
+        # время завершения текущего преобразования (ticks_us)
+        self._ready_at = ticks_us()
+        # количество оставшихся отсчетов для async for. None - без ограничения
+        self._remaining = None
+
+    @property
+    def sensor(self) -> INABaseEx:
+        return self._sensor
+
+    def _mark(self):
+        """Запоминает предсказанное время завершения преобразования, начатого сейчас"""
+        self._ready_at = ticks_add(ticks_us(), self._sensor.get_conversion_cycle_time())
+
+    async def wait_conversion(self) -> [int, None]:
+        """Ожидает завершения текущего преобразования, не блокируя другие задачи.
+        Сначала предсказанное время, затем проверки готовности данных с интервалом poll_interval_us.
+        Возвращает значение регистра состояния, считанное последней проверкой (смотри INABaseEx.get_status_reg),
+        или None, если данные так и не стали готовы. Чтение регистра состояния INA226 сбрасывает флаг готовности,
+        поэтому значение нужно передать в read_snapshot датчика, а не читать регистр еще раз."""
+        await sleep_us(ticks_diff(self._ready_at, ticks_us()))
+        sensor = self._sensor
+        for _ in range(self._max_polls):
+            status = sensor.get_status_reg()
+            if sensor.is_conversion_ready(status):
+                return status
+            await sleep_us(self._poll_us)
+        return None
+
+    async def start_measurement(self, continuous: bool = True, enable_calibration: bool = False,
+                                enable_shunt_adc: bool = True, enable_bus_adc: bool = True):
+        """Аналог INABaseEx.start_measurement. Завершается, когда результат первого преобразования готов."""
+        self._sensor.start_measurement(continuous=continuous, enable_calibration=enable_calibration,
+                                       enable_shunt_adc=enable_shunt_adc, enable_bus_adc=enable_bus_adc)
+        self._mark()
+        await self.wait_conversion()
+
+    async def read_snapshot(self, out: [InaSnapshot, None] = None, full: bool = True) -> InaSnapshot:
+        """Аналог INABaseEx.read_snapshot. Ожидает завершения текущего преобразования, затем считывает данные.
+        В режиме однократных измерений перед ожиданием запускает новое измерение."""
+        sensor = self._sensor
+        if sensor.is_single_shot_mode():
+            # запись в регистр конфигурации запускает однократное измерение
+            sensor.set_cfg_reg(sensor.get_config_field())
+            self._mark()
+        status = await self.wait_conversion()
+        # регистр состояния, считанный при ожидании, повторно не читается: флаг готовности сохраняется в снимке
+        snap = sensor.read_snapshot(out, full, status=status)
+        if sensor.is_continuously_mode():
+            self._mark()
+        return snap
+
+    def stream(self, count: [int, None] = None):
+        """Возвращает асинхронный итератор отсчетов (InaSnapshot) для async for.
+        count - количество отсчетов, None - без ограничения."""
+        self._remaining = count
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> InaSnapshot:
+        remaining = self._remaining
+        if remaining is not None:
+            if remaining <= 0:
+                raise StopAsyncIteration
+            self._remaining = remaining - 1
+        return await self.read_snapshot()
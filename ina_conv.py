@@ -0,0 +1,75 @@
+"""Преобразование блоков сырых кодов регистров INA219/INA226 в физические величины (Вольт, Ампер, Ватт).
+Использует NumPy (CPython) или ulab (MicroPython), если они доступны, иначе простой цикл на Python.
+Модуль не зависит от модуля machine и может использоваться для обработки данных на ПК.
+
+Conversion of raw INA219/INA226 register code blocks into volts, amperes and watts."""
+from array import array
+from collections import namedtuple
+from sensor_pack_2.ringbuf import RingBuffer
+# цены младших разрядов для преобразования. Смотри INABaseEx.get_scales
+from ina_ti import ina_scales
+
+try:
+    import numpy as np
+except ImportError:
+    try:
+        from ulab import numpy as np
+    except ImportError:
+        np = None
+
+# тип с плавающей точкой NumPy/ulab
+_np_float = None if np is None else getattr(np, "float64", None) or np.float
+
+# блок значений в физических величинах. power может быть None
+ina_block = namedtuple("ina_block", "shunt bus current power")
+
+
+def has_numpy() -> bool:
+    """Возвращает Истина, если для преобразования используется NumPy/ulab"""
+    return np is not None
+
+
+def scale(raw, lsb: float, shift: int = 0, count: [int, None] = None, out=None):
+    """Преобразует блок сырых кодов raw в физические величины: (raw[i] >> shift) * lsb.
+    count - количество преобразуемых элементов, None - все;
+    out - массив для результата. Если out is None и доступен NumPy/ulab, то возвращается ndarray,
+    иначе array('f').
+    Returns (raw[i] >> shift) * lsb for the whole block."""
+    n = len(raw) if count is None else count
+    if np is not None and out is None:
+        values = np.array(raw[:n] if n != len(raw) else raw, dtype=_np_float)
+        if shift:
+            # для кодов без знака (регистр напряжения на шине) это равносильно сдвигу вправо
+            values = np.floor(values / (1 << shift))
+        return values * lsb
+    if out is None:
+        out = array('f', (0.0 for _ in range(n)))
+    if shift:
+        for i in range(n):
+            out[i] = (raw[i] >> shift) * lsb
+        return out
+    for i in range(n):
+        out[i] = raw[i] * lsb
+    return out
+
+
+def convert_block(scales: ina_scales, shunt_raw=None, bus_raw=None, current_raw=None, power_raw=None,
+                  count: [int, None] = None) -> ina_block:
+    """Преобразует блоки сырых кодов регистров в физические величины за один проход по каждому блоку.
+    Блок, равный None, не преобразуется, соответствующее поле результата равно None."""
+    return ina_block(
+        shunt=None if shunt_raw is None else scale(shunt_raw, scales.shunt_lsb, 0, count),
+        bus=None if bus_raw is None else scale(bus_raw, scales.bus_lsb, scales.bus_shift, count),
+        current=None if current_raw is None else scale(current_raw, scales.current_lsb, 0, count),
+        power=None if power_raw is None else scale(power_raw, scales.power_lsb, 0, count),
+    )
+
+
+def convert_capture(scales: ina_scales, rb: RingBuffer) -> ina_block:
+    """Забирает все отсчеты из буфера метода INABaseEx.capture и преобразует их в физические величины.
+    Каналы буфера: 0 - шунт, 1 - шина, 2 - ток (смотри CAPTURE_SHUNT, CAPTURE_BUS, CAPTURE_CURRENT в ina_ti)."""
+    n = len(rb)
+    shunt, bus, curr = array('h', (0 for _ in range(n))), array('H', (0 for _ in range(n))), \
+        array('h', (0 for _ in range(n)))
+    cnt = rb.drain((shunt, bus, curr) + (None,) * (rb.channels - 3))
+    return convert_block(scales, shunt_raw=shunt, bus_raw=bus, current_raw=curr, count=cnt)
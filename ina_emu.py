@@ -0,0 +1,368 @@
+"""Эмуляторы INA219 и INA226 на уровне регистров, для проверок и измерений быстродействия драйвера ina_ti без
+оборудования. Подключаются к эмулируемой шине sensor_pack_2.sim_bus.SimI2C.
+Модель построена по документации TI независимо от ina_ti: регистр конфигурации и бит RST, расчет тока и мощности
+по регистру калибровки, флаги CNVR/OVF (INA219), регистр Mask/Enable, Alert Limit и вывод ALERT (INA226),
+идентификаторы 0xFE/0xFF (INA226), время преобразования с учетом усреднения, непрерывный и однократный режимы.
+Входные сигналы (напряжение на шунте и на шине) задаются числами или функциями времени.
+Пример:
+    clock = SimClock()
+    bus = SimI2C()
+    emu = bus.attach(0x40, INA226Emu(clock=clock))
+    emu.set_input(shunt_voltage=0.01, bus_voltage=lambda t: 12 + 0.1 * math.sin(t))
+    ina = INA226(I2cAdapter(bus))
+    clock.advance(2000)
+
+Register level INA219/INA226 emulators."""
+from sensor_pack_2.sim_bus import RegisterDevice
+from sensor_pack_2.timeutil import ticks_us, ticks_diff
+
+
+def _div_trunc(a: int, b: int) -> int:
+    """Целочисленное деление с отбрасыванием дробной части (к нулю), как в АЛУ датчика"""
+    q = abs(a) // b
+    return -q if a < 0 else q
+
+
+def _clamp(value: int, lo: int, hi: int) -> int:
+    if value < lo:
+        return lo
+    if value > hi:
+        return hi
+    return value
+
+
+class INAEmuBase(RegisterDevice):
+    """Общая часть эмуляторов INA219/INA226. Для переопределения в классах-наследниках!"""
+
+    # значения регистров после включения питания или сброса (бит RST). адрес: значение
+    _defaults = {}
+    # записываемые регистры и маски их записываемых бит
+    _write_masks = {}
+    # цены младших разрядов АЦП, Вольт
+    _shunt_lsb = 1.0
+    _bus_lsb = 1.0
+    # делители в формулах расчета тока и мощности
+    _current_div = 1
+    _power_div = 1
+
+    def __init__(self, clock=None):
+        """clock - функция, возвращающая время в мкс (например, sensor_pack_2.sim_bus.SimClock).
+        Если None, то используется ticks_us."""
+        super().__init__()
+        self._clock = ticks_us if clock is None else clock
+        self._raw_last = self._clock()
+        # время эмулятора в мкс, без 'заворачивания'
+        self._time = 0
+        self._shunt_in = 0.0
+        self._bus_in = 0.0
+        # количество завершенных преобразований
+        self.conversions = 0
+        self.reset()
+
+    # время
+    def _now(self) -> int:
+        raw = self._clock()
+        self._time += ticks_diff(raw, self._raw_last)
+        self._raw_last = raw
+        return self._time
+
+    @property
+    def time_us(self) -> int:
+        """Время эмулятора в мкс"""
+        return self._now()
+
+    # входные сигналы
+    def set_input(self, shunt_voltage=None, bus_voltage=None):
+        """Задает входные сигналы: число (Вольт) или функция f(t) -> Вольт, где t - время эмулятора в секундах.
+        None - сигнал не изменяется"""
+        if shunt_voltage is not None:
+            self._shunt_in = shunt_voltage
+        if bus_voltage is not None:
+            self._bus_in = bus_voltage
+
+    @staticmethod
+    def _sample(source, t_end_us: int, duration_us: int, count: int) -> float:
+        """Значение сигнала source, усредненное по count отсчетам на интервале duration_us, заканчивающемся t_end_us"""
+        if not callable(source):
+            return source
+        if count <= 1:
+            return source(t_end_us / 1000_000)
+        step = duration_us / count
+        start = t_end_us - duration_us + step / 2
+        acc = 0.0
+        for k in range(count):
+            acc += source((start + k * step) / 1000_000)
+        return acc / count
+
+    # регистры
+    def reset(self):
+        """Сброс, как при включении питания"""
+        self._regs = dict(self._defaults)
+        self._flags_reset()
+        self._start_conversion()
+
+    def _flags_reset(self):
+        """Для переопределения в классах-наследниках!"""
+        pass
+
+    def _mode(self) -> int:
+        return self._regs[0x00] & 0x07
+
+    def _start_conversion(self):
+        """Запуск преобразований с начала. Вызывается при записи в регистр конфигурации"""
+        self._cycle_start = self._now()
+        mode = self._mode()
+        self._pending = mode in (1, 2, 3)
+
+    def read_reg(self, reg_addr: int) -> int:
+        self._update()
+        return self._regs.get(reg_addr, 0)
+
+    def write_reg(self, reg_addr: int, value: int):
+        self._update()
+        mask = self._write_masks.get(reg_addr)
+        if mask is None:
+            return  # регистр только для чтения
+        if 0x00 == reg_addr:
+            if value & 0x8000:
+                self.reset()
+                return
+            self._regs[0x00] = (self._regs[0x00] & ~mask) | (value & mask)
+            self._on_config_write()
+            self._start_conversion()
+            return
+        self._regs[reg_addr] = (self._regs.get(reg_addr, 0) & ~mask) | (value & mask)
+
+    def _on_config_write(self):
+        """Для переопределения в классах-наследниках! Например, сброс флага готовности"""
+        pass
+
+    # преобразование
+    def get_adc_times(self) -> tuple:
+        """Возвращает время преобразования (с учетом усреднения) АЦП напряжения на шунте и на шине в мкс
+        и количество усредняемых отсчетов каждого АЦП. Для переопределения в классах-наследниках!"""
+        raise NotImplementedError
+
+    def get_cycle_time(self) -> int:
+        """Возвращает время полного цикла преобразования для текущего режима в мкс"""
+        t_sh, t_bus, _, _ = self.get_adc_times()
+        mode = self._mode()
+        return (t_sh if mode & 0x01 else 0) + (t_bus if mode & 0x02 else 0)
+
+    def _update(self):
+        """Приводит регистры данных в соответствие со временем эмулятора"""
+        mode = self._mode()
+        if 0 == mode & 0x03:
+            return  # выключен
+        now = self._now()
+        cycle = self.get_cycle_time()
+        elapsed = now - self._cycle_start
+        if elapsed < cycle:
+            return
+        if mode & 0x04:
+            # непрерывный режим. результат последнего завершенного цикла
+            n = elapsed // cycle
+            self._cycle_start += n * cycle
+            self._convert(self._cycle_start, mode)
+            return
+        if self._pending:
+            # однократный режим
+            self._pending = False
+            self._convert(self._cycle_start + cycle, mode)
+
+    def _convert(self, t_end_us: int, mode: int):
+        """Завершение цикла преобразования в момент времени t_end_us"""
+        t_sh, t_bus, avg_sh, avg_bus = self.get_adc_times()
+        regs = self._regs
+        if mode & 0x01:
+            # шунт преобразуется первым
+            volts = self._sample(self._shunt_in, t_end_us - (t_bus if mode & 0x02 else 0), t_sh, avg_sh)
+            regs[0x01] = self._shunt_code(volts) & 0xFFFF
+        if mode & 0x02:
+            volts = self._sample(self._bus_in, t_end_us, t_bus, avg_bus)
+            self._set_bus_code(self._bus_code(volts))
+        shunt = regs[0x01]
+        if shunt & 0x8000:
+            shunt -= 0x10000
+        cal = regs.get(0x05, 0)
+        current = _div_trunc(shunt * cal, self._current_div)
+        power = _div_trunc(abs(current) * self._get_bus_code(), self._power_div)
+        overflow = not -0x8000 <= current <= 0x7FFF or power > 0xFFFF
+        regs[0x04] = _clamp(current, -0x8000, 0x7FFF) & 0xFFFF
+        regs[0x03] = _clamp(power, 0, 0xFFFF)
+        self.conversions += 1
+        self._on_conversion(overflow)
+
+    def _shunt_code(self, volts: float) -> int:
+        """Для переопределения в классах-наследниках!"""
+        raise NotImplementedError
+
+    def _bus_code(self, volts: float) -> int:
+        """Для переопределения в классах-наследниках!"""
+        raise NotImplementedError
+
+    def _set_bus_code(self, code: int):
+        self._regs[0x02] = code
+
+    def _get_bus_code(self) -> int:
+        return self._regs[0x02]
+
+    def _on_conversion(self, overflow: bool):
+        """Установка флагов по завершении преобразования. Для переопределения в классах-наследниках!"""
+        pass
+
+
+# время преобразования INA219 в мкс для значений полей SADC/BADC 0..3 (9..12 бит). Смотри 'Table 5. ADC Settings'
+_ina219_res_times = 84, 148, 276, 532
+
+
+class INA219Emu(INAEmuBase):
+    """Эмулятор INA219. Регистр напряжения на шине содержит флаги CNVR (бит 1) и OVF (бит 0).
+    CNVR устанавливается по завершении преобразования и сбрасывается чтением регистра мощности
+    или записью в регистр конфигурации."""
+
+    _defaults = {0x00: 0x399F, 0x01: 0, 0x02: 0, 0x03: 0, 0x04: 0, 0x05: 0}
+    # бит 14 конфигурации зарезервирован, младший бит калибровки всегда 0
+    _write_masks = {0x00: 0xBFFF, 0x05: 0xFFFE}
+    _shunt_lsb = 1E-5
+    _bus_lsb = 4E-3
+    _current_div = 4096
+    _power_div = 5000
+
+    def _flags_reset(self):
+        self._cnvr = self._ovf = False
+
+    @staticmethod
+    def _adc_field(value: int) -> tuple:
+        """Время преобразования и количество усредняемых отсчетов для значения поля SADC/BADC"""
+        if value < 8:
+            return _ina219_res_times[value & 0x03], 1
+        avg = 1 << (value - 8)
+        return 532 * avg, avg
+
+    def get_adc_times(self) -> tuple:
+        cfg = self._regs[0x00]
+        t_sh, avg_sh = INA219Emu._adc_field((cfg >> 3) & 0x0F)
+        t_bus, avg_bus = INA219Emu._adc_field((cfg >> 7) & 0x0F)
+        return t_sh, t_bus, avg_sh, avg_bus
+
+    def _shunt_code(self, volts: float) -> int:
+        # диапазон PGA: ±40 мВ * 2 ** PGA
+        limit = 4000 << ((self._regs[0x00] >> 11) & 0x03)
+        return _clamp(round(volts / self._shunt_lsb), -limit, limit)
+
+    def _bus_code(self, volts: float) -> int:
+        # BRNG: 0 - 16 В, 1 - 32 В
+        limit = 8000 if self._regs[0x00] & 0x2000 else 4000
+        return _clamp(round(volts / self._bus_lsb), 0, min(limit, 0x1FFF))
+
+    def _set_bus_code(self, code: int):
+        self._bus = code
+        self._store_bus()
+
+    def _get_bus_code(self) -> int:
+        return self._bus
+
+    def _store_bus(self):
+        self._regs[0x02] = (self._bus << 3) | (0x02 if self._cnvr else 0) | (0x01 if self._ovf else 0)
+
+    def reset(self):
+        self._bus = 0
+        super().reset()
+
+    def _on_conversion(self, overflow: bool):
+        self._cnvr = True
+        self._ovf = overflow
+        self._store_bus()
+
+    def _on_config_write(self):
+        self._cnvr = False
+        self._store_bus()
+
+    def read_reg(self, reg_addr: int) -> int:
+        val = super().read_reg(reg_addr)
+        if 0x03 == reg_addr and self._cnvr:
+            # чтение регистра мощности сбрасывает CNVR
+            self._cnvr = False
+            self._store_bus()
+        return val
+
+
+class INA226Emu(INAEmuBase):
+    """Эмулятор INA226. Флаги в регистре Mask/Enable: AFF (бит 4), CVRF (бит 3), OVF (бит 2).
+    CVRF устанавливается по завершении преобразования и сбрасывается чтением Mask/Enable или записью
+    в регистр конфигурации. Функции ALERT: SOL, SUL, BOL, BUL, POL (сравнение с Alert Limit) и CNVR.
+    Уровень вывода ALERT - свойство alert_pin."""
+
+    _defaults = {0x00: 0x4127, 0x01: 0, 0x02: 0, 0x03: 0, 0x04: 0, 0x05: 0, 0x06: 0, 0x07: 0,
+                 0xFE: 0x5449, 0xFF: 0x2260}
+    _write_masks = {0x00: 0x8FFF, 0x05: 0x7FFF, 0x06: 0xFC03, 0x07: 0xFFFF}
+    _shunt_lsb = 2.5E-6
+    _bus_lsb = 1.25E-3
+    _current_div = 2048
+    _power_div = 20000
+    # время преобразования в мкс для значений полей VBUSCT/VSHCT, количество отсчетов для значений поля AVG
+    _conv_times = 140, 204, 332, 588, 1100, 2116, 4156, 8244
+    _avg_counts = 1, 4, 16, 64, 128, 256, 512, 1024
+
+    def get_adc_times(self) -> tuple:
+        cfg = self._regs[0x00]
+        avg = INA226Emu._avg_counts[(cfg >> 9) & 0x07]
+        t_bus = INA226Emu._conv_times[(cfg >> 6) & 0x07]
+        t_sh = INA226Emu._conv_times[(cfg >> 3) & 0x07]
+        return t_sh * avg, t_bus * avg, avg, avg
+
+    def _shunt_code(self, volts: float) -> int:
+        return _clamp(round(volts / self._shunt_lsb), -0x8000, 0x7FFF)
+
+    def _bus_code(self, volts: float) -> int:
+        return _clamp(round(volts / self._bus_lsb), 0, 0x7FFF)
+
+    def _on_conversion(self, overflow: bool):
+        regs = self._regs
+        me = regs[0x06]
+        flags = 0x08    # CVRF
+        if overflow:
+            flags |= 0x04
+        if self._limit_exceeded(me):
+            flags |= 0x10
+        if me & 0x0001:
+            # LEN. флаги удерживаются до чтения Mask/Enable
+            me |= flags
+        else:
+            me = (me & ~0x001C) | flags
+        regs[0x06] = me
+
+    def _limit_exceeded(self, me: int) -> bool:
+        """Сравнение с Alert Limit. Работает функция с наибольшим номером бита"""
+        regs = self._regs
+        limit = regs[0x07]
+        if me & 0xC000:
+            shunt = regs[0x01] - 0x10000 if regs[0x01] & 0x8000 else regs[0x01]
+            lim = limit - 0x10000 if limit & 0x8000 else limit
+            return shunt > lim if me & 0x8000 else shunt < lim
+        if me & 0x2000:
+            return regs[0x02] > limit
+        if me & 0x1000:
+            return regs[0x02] < limit
+        if me & 0x0800:
+            return regs[0x03] > limit
+        return False
+
+    def _on_config_write(self):
+        self._regs[0x06] &= ~0x0008
+
+    def read_reg(self, reg_addr: int) -> int:
+        val = super().read_reg(reg_addr)
+        if 0x06 == reg_addr:
+            # чтение Mask/Enable сбрасывает CVRF и, в режиме LEN, AFF
+            self._regs[0x06] &= ~0x0018
+        return val
+
+    @property
+    def alert_pin(self) -> bool:
+        """Уровень вывода ALERT (Истина - высокий). Активный уровень задается битом APOL"""
+        self._update()
+        me = self._regs[0x06]
+        active = bool(me & 0x0010) or bool(me & 0x0400 and me & 0x0008)
+        return active if me & 0x0002 else not active
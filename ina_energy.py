@@ -0,0 +1,152 @@
+"""Счетчики энергии (Вт*ч) и заряда (А*ч) для INA219/INA226.
+Интегрирование 'сырых' кодов регистров мощности и тока по меткам времени ticks_us методом трапеций
+в целых числах: суммы точны и не накапливают ошибку округления чисел с плавающей точкой.
+В физические величины суммы переводятся только при чтении счетчиков.
+
+Energy and charge accumulator for INA219/INA226."""
+from collections import namedtuple
+from ina_ti import INABaseEx
+from sensor_pack_2.timeutil import ticks_us, ticks_ms, ticks_diff
+
+# показания счетчика
+# energy_wh - энергия, Вт*ч; charge_ah - заряд, А*ч (со знаком, для двунаправленного тока); duration_s - время, с
+energy_reading = namedtuple("energy_reading", "energy_wh charge_ah duration_s")
+
+# мкс в часе
+_US_PER_HOUR = 3_600_000_000
+
+
+class EnergyAccumulator:
+    """Интегратор энергии и заряда с несколькими независимыми счетчиками.
+    Все счетчики считают одну общую сумму, каждый счетчик хранит лишь ее значение в момент своего сброса,
+    поэтому обработка отсчета не зависит от количества счетчиков.
+    При изменении калибровки датчика (цены младшего разряда) накопленная сумма переводится в физические величины
+    по старой цене, интегрирование продолжается по новой.
+    Пример:
+        acc = EnergyAccumulator(ina226, counters=('lifetime', 'session', 'trip'), checkpoint_ms=60_000,
+                                on_checkpoint=save_to_flash)
+        acc.set_state(load_from_flash())   # продолжить счетчики после перезапуска
+        while True:
+            acc.sample()
+            ...
+        print(acc.get('trip'))
+        acc.reset('trip')"""
+
+    def __init__(self, sensor: INABaseEx, counters: tuple = ('lifetime', 'session'), checkpoint_ms: int = 0,
+                 on_checkpoint=None, max_gap_us: int = 0):
+        """counters - имена счетчиков;
+        checkpoint_ms - период вызова on_checkpoint(state: dict) из метода sample, мс (0 - не вызывается);
+        max_gap_us - интервал между отсчетами больше этого значения не интегрируется (пауза в измерениях),
+        0 - интегрируются все интервалы."""
+        self._sensor = sensor
+        self._checkpoint_ms = checkpoint_ms
+        self._on_checkpoint = on_checkpoint
+        self._max_gap_us = max_gap_us
+        # суммы (код + предыдущий код) * интервал в мкс. 'удвоенные' трапеции
+        self._e_raw = self._q_raw = 0
+        # суммы, переведенные в Джоули и Кулоны при предыдущих калибровках и восстановлении состояния
+        self._e_base = self._q_base = 0.0
+        # общее проинтегрированное время, мкс
+        self._t_us = 0
+        self._p_lsb, self._i_lsb = sensor.power_lsb, sensor.current_lsb
+        # предыдущий отсчет
+        self._last_t = self._last_p = self._last_i = 0
+        self._has_last = False
+        self._checkpoint_start = ticks_ms()
+        # количество не проинтегрированных пауз
+        self.gaps = 0
+        # имя счетчика: (энергия, Дж; заряд, Кл; время, мкс) в момент сброса счетчика
+        self._offsets = dict()
+        for name in counters:
+            self._offsets[name] = 0.0, 0.0, 0
+
+    def restart(self):
+        """Забывает предыдущий отсчет: интервал до следующего отсчета не интегрируется.
+        Вызовите после намеренной паузы в измерениях."""
+        self._has_last = False
+
+    def sample(self) -> int:
+        """Считывает регистры мощности и тока и добавляет интервал от предыдущего отсчета.
+        Возвращает интервал в мкс (0 для первого отсчета или паузы)."""
+        sensor = self._sensor
+        if sensor.power_lsb != self._p_lsb or sensor.current_lsb != self._i_lsb:
+            self._rebase()
+        p = sensor.read_reg_16(0x03, False)
+        i = sensor.read_reg_16(0x04, True)
+        t = ticks_us()
+        dt = 0
+        if self._has_last:
+            dt = ticks_diff(t, self._last_t)
+            if self._max_gap_us and dt > self._max_gap_us:
+                self.gaps += 1
+                dt = 0
+            else:
+                self._e_raw += (p + self._last_p) * dt
+                self._q_raw += (i + self._last_i) * dt
+                self._t_us += dt
+        self._last_t, self._last_p, self._last_i = t, p, i
+        self._has_last = True
+        if self._checkpoint_ms and ticks_diff(ticks_ms(), self._checkpoint_start) >= self._checkpoint_ms:
+            self.checkpoint()
+        return dt
+
+    def _rebase(self):
+        """Переводит накопленные суммы в физические величины по старой цене младшего разряда"""
+        self._e_base, self._q_base = self._totals()
+        self._e_raw = self._q_raw = 0
+        sensor = self._sensor
+        self._p_lsb, self._i_lsb = sensor.power_lsb, sensor.current_lsb
+        # предыдущий отсчет получен при старой калибровке
+        self._has_last = False
+
+    def _totals(self) -> tuple:
+        """Возвращает общие энергию в Джоулях и заряд в Кулонах"""
+        return (self._e_base + self._e_raw * self._p_lsb / 2_000_000,
+                self._q_base + self._q_raw * self._i_lsb / 2_000_000)
+
+    # счетчики
+    def add_counter(self, name: str):
+        """Добавляет счетчик с нулевыми показаниями"""
+        self.reset(name)
+
+    def remove_counter(self, name: str):
+        self._offsets.pop(name, None)
+
+    def counters(self) -> tuple:
+        """Возвращает имена счетчиков"""
+        return tuple(self._offsets)
+
+    def reset(self, name: str):
+        """Обнуляет показания счетчика name"""
+        e, q = self._totals()
+        self._offsets[name] = e, q, self._t_us
+
+    def get(self, name: str) -> energy_reading:
+        """Возвращает показания счетчика name"""
+        e_off, q_off, t_off = self._offsets[name]
+        e, q = self._totals()
+        return energy_reading(energy_wh=(e - e_off) / 3600, charge_ah=(q - q_off) / 3600,
+                              duration_s=(self._t_us - t_off) / 1000_000)
+
+    # сохранение/восстановление
+    def get_state(self) -> dict:
+        """Возвращает состояние для сохранения (например, в json файл): общие энергию (Дж), заряд (Кл),
+        время (мкс) и значения в момент сброса каждого счетчика"""
+        e, q = self._totals()
+        return {'energy_j': e, 'charge_c': q, 'time_us': self._t_us,
+                'counters': {name: list(off) for name, off in self._offsets.items()}}
+
+    def set_state(self, state: dict):
+        """Восстанавливает состояние, полученное методом get_state. Счетчики, отсутствующие в state, не изменяются"""
+        self._e_base, self._q_base = state['energy_j'], state['charge_c']
+        self._e_raw = self._q_raw = 0
+        self._t_us = state['time_us']
+        for name, off in state['counters'].items():
+            self._offsets[name] = off[0], off[1], off[2]
+        self._has_last = False
+
+    def checkpoint(self):
+        """Передает состояние в on_checkpoint (если задан) и начинает новый период сохранения"""
+        self._checkpoint_start = ticks_ms()
+        if self._on_checkpoint is not None:
+            self._on_checkpoint(self.get_state())
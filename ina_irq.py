@@ -0,0 +1,85 @@
+"""Сбор данных INA226 по прерыванию от вывода ALERT (готовность данных).
+Вывод ALERT датчика срабатывает по готовности данных, обработчик прерывания вывода MCU (machine.Pin.irq)
+планирует чтение (micropython.schedule), которое записывает сырые коды регистров в кольцевой буфер.
+Опрос флага готовности по шине не нужен!
+
+Interrupt driven INA226 acquisition using the conversion ready ALERT pin."""
+from ina_ti import INA226, CAPTURE_SHUNT, CAPTURE_BUS, CAPTURE_CURRENT, CAPTURE_TIME
+from sensor_pack_2.ringbuf import RingBuffer
+from sensor_pack_2.timeutil import ticks_us
+
+try:
+    from micropython import schedule
+except ImportError:
+    # CPython (проверки на ПК): чтение выполняется сразу, в обработчике
+    def schedule(func, arg):
+        func(arg)
+
+
+class AlertReader:
+    """Сбор данных INA226 по прерыванию от вывода ALERT.
+    pin - вывод MCU (machine.Pin или совместимый объект с методом irq и константами IRQ_FALLING, IRQ_RISING),
+    к которому подключен вывод ALERT датчика. Для активного низкого уровня нужна подтяжка к питанию!
+    Пример:
+        reader = AlertReader(ina226, Pin(15, Pin.IN, Pin.PULL_UP), capacity=512)
+        ina226.start_measurement(continuous=True)
+        reader.start()
+        ...
+        i = reader.buffer.peek()"""
+
+    def __init__(self, sensor: INA226, pin, buffer: [RingBuffer, None] = None, capacity: int = 256,
+                 timestamps: bool = True, latch: bool = True, active_high: bool = False):
+        """buffer - кольцевой буфер с каналами как у INABaseEx.make_capture_buffer. Если None, то создается новый
+        емкостью capacity, с метками времени при timestamps в Истина;
+        latch, active_high - смотри INA226.enable_conversion_ready_alert."""
+        self._sensor = sensor
+        self._pin = pin
+        self._buffer = sensor.make_capture_buffer(capacity, timestamps) if buffer is None else buffer
+        self._latch = latch
+        self._active_high = active_high
+        # ссылки на связанные методы создаются заранее: в обработчике прерывания выделять память нельзя!
+        self._irq_ref = self._on_irq
+        self._read_ref = self._read
+        # количество прерываний, чтение по которым не удалось запланировать (очередь schedule заполнена)
+        self.dropped = 0
+        # количество считанных отсчетов
+        self.samples = 0
+
+    @property
+    def buffer(self) -> RingBuffer:
+        return self._buffer
+
+    def start(self):
+        """Настраивает ALERT датчика на готовность данных и подключает обработчик прерывания вывода MCU"""
+        sensor, pin = self._sensor, self._pin
+        sensor.enable_conversion_ready_alert(True, self._latch, self._active_high)
+        trigger = pin.IRQ_RISING if self._active_high else pin.IRQ_FALLING
+        pin.irq(trigger=trigger, handler=self._irq_ref)
+        # чтение Mask/Enable сбрасывает возможно 'зависший' ALERT
+        sensor.get_mask_enable()
+
+    def stop(self):
+        """Отключает обработчик прерывания и функцию готовности данных вывода ALERT"""
+        self._pin.irq(handler=None)
+        self._sensor.enable_conversion_ready_alert(False, self._latch, self._active_high)
+
+    def _on_irq(self, pin):
+        """Обработчик прерывания. Обмен по шине в нем невозможен, поэтому чтение планируется"""
+        try:
+            schedule(self._read_ref, 0)
+        except RuntimeError:
+            self.dropped += 1
+
+    def _read(self, _):
+        """Читает данные в кольцевой буфер, затем регистр Mask/Enable, что сбрасывает CVRF и ALERT"""
+        sensor, rb = self._sensor, self._buffer
+        i = rb.reserve()
+        if i >= 0:
+            if rb.channels > CAPTURE_TIME:
+                rb.channel(CAPTURE_TIME)[i] = ticks_us()
+            rb.channel(CAPTURE_SHUNT)[i] = sensor.read_reg_16(0x01, True)
+            rb.channel(CAPTURE_BUS)[i] = sensor.read_reg_16(0x02, False)
+            rb.channel(CAPTURE_CURRENT)[i] = sensor.read_reg_16(0x04, True)
+            rb.commit()
+            self.samples += 1
+        sensor.get_mask_enable()
@@ -0,0 +1,196 @@
+"""Сбор данных INAxxx с постоянной частотой по таймеру.
+Отсчеты производятся в обработчике аппаратного таймера (machine.Timer + micropython.schedule) или в цикле
+с абсолютными сроками (на CPython и везде, где таймера нет). Сроки отсчитываются от момента запуска,
+а не от окончания предыдущей обработки, поэтому частота не 'уплывает' из-за времени обработки и сборки мусора.
+Сырые коды регистров записываются в кольцевой буфер (один производитель, один потребитель), потребитель может
+работать во втором потоке (_thread), например на втором ядре RP2040.
+
+Timer driven INAxxx acquisition with drift free sample timing."""
+from collections import namedtuple
+from ina_ti import INABaseEx, CAPTURE_SHUNT, CAPTURE_BUS, CAPTURE_CURRENT, CAPTURE_TIME
+from sensor_pack_2.ringbuf import RingBuffer
+from sensor_pack_2.timeutil import ticks_us, ticks_add, ticks_diff, sleep_us
+
+try:
+    from micropython import schedule
+except ImportError:
+    # CPython (проверки на ПК): чтение выполняется сразу, в обработчике
+    def schedule(func, arg):
+        func(arg)
+
+try:
+    from machine import Timer
+except ImportError:
+    # CPython. Доступен только цикл с абсолютными сроками (метод run)
+    Timer = None
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+
+# статистика планировщика
+# ticks - количество срабатываний (отсчетов по расписанию); samples - количество записанных в буфер отсчетов;
+# overruns - отсчеты, не поместившиеся в буфер; missed - пропущенные сроки (обработка не успела к сроку);
+# dropped - срабатывания таймера, чтение по которым не удалось запланировать (очередь schedule заполнена);
+# jitter_max_us - наибольшее опоздание отсчета относительно срока, мкс; jitter_mean_us - среднее опоздание, мкс
+sched_stats = namedtuple("sched_stats", "ticks samples overruns missed dropped jitter_max_us jitter_mean_us")
+
+
+class Scheduler:
+    """Сбор данных с постоянной частотой в кольцевой буфер.
+    Период по умолчанию равен времени преобразования датчика (get_conversion_cycle_time), то есть каждый отсчет
+    содержит новые данные. В режиме однократных измерений следующее измерение запускается сразу после чтения.
+    Пример (RP2040, потребитель на втором ядре):
+        sched = Scheduler(ina226, capacity=512)
+        sched.start_consumer(lambda rb, i: print(rb.channel(0)[i]))
+        ina226.start_measurement(continuous=True)
+        sched.start()
+    Пример (CPython или без таймера):
+        sched.run(1000)"""
+
+    def __init__(self, sensor: INABaseEx, buffer: [RingBuffer, None] = None, capacity: int = 256,
+                 timestamps: bool = True, period_us: [int, None] = None, timer_id: int = -1):
+        """buffer - кольцевой буфер с каналами как у INABaseEx.make_capture_buffer. Если None, то создается новый
+        емкостью capacity, с метками времени при timestamps в Истина;
+        period_us - период отсчетов в мкс. Если None, то равен времени преобразования датчика;
+        timer_id - номер аппаратного таймера (-1 - виртуальный таймер, если он есть у порта MicroPython)."""
+        self._sensor = sensor
+        self._buffer = sensor.make_capture_buffer(capacity, timestamps) if buffer is None else buffer
+        self._period = sensor.get_conversion_cycle_time() if period_us is None else period_us
+        if self._period < 1:
+            raise ValueError(f"Неверный период отсчетов: {self._period}")
+        self._timer_id = timer_id
+        self._timer = None
+        self._single_shot = False
+        self._cfg = 0
+        # срок следующего отсчета
+        self._deadline = 0
+        # ссылки на связанные методы создаются заранее: в обработчике прерывания выделять память нельзя!
+        self._irq_ref = self._on_timer
+        self._tick_ref = self._tick
+        self._consuming = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Обнуляет счетчики"""
+        self._ticks = self._samples = self._missed = self._dropped = 0
+        self._jitter_max = self._jitter_sum = 0
+        self._buffer.overruns = 0
+
+    def get_stats(self) -> sched_stats:
+        """Возвращает статистику планировщика"""
+        ticks = self._ticks
+        return sched_stats(ticks=ticks, samples=self._samples, overruns=self._buffer.overruns,
+                           missed=self._missed, dropped=self._dropped, jitter_max_us=self._jitter_max,
+                           jitter_mean_us=self._jitter_sum // ticks if ticks else 0)
+
+    @property
+    def buffer(self) -> RingBuffer:
+        return self._buffer
+
+    @property
+    def period_us(self) -> int:
+        """Возвращает период отсчетов в мкс"""
+        return self._period
+
+    def _prepare(self):
+        """Запоминает режим датчика и задает срок первого отсчета"""
+        sensor = self._sensor
+        self._single_shot = sensor.is_single_shot_mode()
+        self._cfg = sensor.get_config_field()
+        if self._single_shot:
+            # запуск первого однократного измерения
+            sensor.set_cfg_reg(self._cfg)
+        self._deadline = ticks_add(ticks_us(), self._period)
+
+    def _on_timer(self, timer):
+        """Обработчик прерывания таймера. Обмен по шине в нем невозможен, поэтому чтение планируется"""
+        try:
+            schedule(self._tick_ref, 0)
+        except RuntimeError:
+            self._dropped += 1
+
+    def _tick(self, _):
+        """Один отсчет по расписанию: учет опоздания, чтение данных в буфер, запуск следующего измерения"""
+        now = ticks_us()
+        period = self._period
+        late = ticks_diff(now, self._deadline)
+        if late < 0:
+            late = -late
+        elif late >= period:
+            # обработка не успела к одному или нескольким срокам. Расписание не сдвигается, сроки пропускаются
+            skipped = late // period
+            self._missed += skipped
+            self._deadline = ticks_add(self._deadline, skipped * period)
+            late -= skipped * period
+        self._deadline = ticks_add(self._deadline, period)
+        self._ticks += 1
+        self._jitter_sum += late
+        if late > self._jitter_max:
+            self._jitter_max = late
+        sensor, rb = self._sensor, self._buffer
+        i = rb.reserve()
+        if i >= 0:
+            if rb.channels > CAPTURE_TIME:
+                rb.channel(CAPTURE_TIME)[i] = now
+            rb.channel(CAPTURE_SHUNT)[i] = sensor.read_reg_16(0x01, True)
+            rb.channel(CAPTURE_BUS)[i] = sensor.read_reg_16(0x02, False)
+            rb.channel(CAPTURE_CURRENT)[i] = sensor.read_reg_16(0x04, True)
+            rb.commit()
+            self._samples += 1
+        if self._single_shot:
+            sensor.set_cfg_reg(self._cfg)
+
+    def start(self):
+        """Запускает отсчеты по аппаратному таймеру. Настройте датчик и вызовите start_measurement до вызова!"""
+        if Timer is None:
+            raise RuntimeError("machine.Timer недоступен! Используйте метод run.")
+        self._prepare()
+        if self._timer is None:
+            self._timer = Timer(self._timer_id)
+        self._timer.init(mode=Timer.PERIODIC, freq=1_000_000 / self._period, callback=self._irq_ref)
+
+    def stop(self):
+        """Останавливает таймер"""
+        if self._timer is not None:
+            self._timer.deinit()
+
+    def run(self, count: int):
+        """Производит count отсчетов в цикле с абсолютными сроками. Блокирующий вызов!
+        Настройте датчик и вызовите start_measurement до вызова этого метода!"""
+        self._prepare()
+        tick = self._tick
+        for _ in range(count):
+            delay = ticks_diff(self._deadline, ticks_us())
+            if delay > 0:
+                sleep_us(delay)
+            tick(0)
+
+    # потребитель
+    def _consumer_loop(self, callback, idle_us: int):
+        rb = self._buffer
+        while self._consuming:
+            i = rb.peek()
+            if i < 0:
+                sleep_us(idle_us)
+                continue
+            callback(rb, i)
+            rb.release()
+
+    def start_consumer(self, callback, idle_us: int = 1000):
+        """Запускает потребителя в отдельном потоке (на RP2040 - на втором ядре).
+        callback(rb: RingBuffer, index: int) вызывается для каждого отсчета, значения каналов доступны по индексу
+        index до возврата из callback. Если буфер пуст, поток 'спит' idle_us мкс.
+        Потребитель не должен обращаться к шине датчика!"""
+        if _thread is None:
+            raise RuntimeError("Модуль _thread недоступен!")
+        if self._consuming:
+            return
+        self._consuming = True
+        _thread.start_new_thread(self._consumer_loop, (callback, idle_us))
+
+    def stop_consumer(self):
+        """Останавливает поток потребителя после обработки текущего отсчета"""
+        self._consuming = False
@@ -11,14 +11,19 @@ dissipated power to be allocated on it!!
 The power dissipated on any resistance (direct current) is calculated by the formula: P=I**2 * R
 where: I - current in Amperes; R - resistance in ohms"""
 import math
+from array import array
 # from select import select
 
 from sensor_pack_2 import bus_service
-from sensor_pack_2.base_sensor import BaseSensorEx, IBaseSensorEx, Iterator, check_value
+from sensor_pack_2.base_sensor import BaseSensorEx, IBaseSensorEx, Iterator, check_value, get_error_str
 
 from collections import namedtuple
 from sensor_pack_2.bitfield import bit_field_info
-from sensor_pack_2.bitfield import BitFields
+from sensor_pack_2.bitfield import BitFields, BitFieldsTransaction
+from sensor_pack_2.regmod import RegisterShadow, shadow_stats
+from sensor_pack_2.ringbuf import RingBuffer
+from sensor_pack_2.stats import WindowStats
+from sensor_pack_2.timeutil import ticks_us, ticks_add, ticks_diff, sleep_us
 
 def get_exponent(value: float) -> int:
     """Возвращает десятичную степень числа.
@@ -55,25 +60,35 @@ def _get_conv_time(value: int) -> int:
     coefficient = 2 ** value
     return 532 * coefficient
 
+
+# время преобразования INA219 в мкс для всех значений полей SADC, BADC (0..15), с учетом усреднения
+_ina219_conv_times = tuple(_get_conv_time(_v) for _v in range(0x10))
+
 class INABase(BaseSensorEx):
     """Базовый класс измерителей тока и напряжения от TI.
     Base class for INA current/voltage monitor."""
 
+    # сдвиг вправо значения регистра напряжения шины для получения кода АЦП (у INA219 младшие 3 бита - флаги)
+    _bus_shift = 0
+
     def __init__(self, adapter: bus_service.BusAdapter, address: int):
         """"""
         super().__init__(adapter, address, True)
+        # INA219/INA226 запоминают последний адрес регистра. При повторном чтении того же регистра
+        # запись указателя на шину не требуется!
+        adapter.track_reg_pointer(address)
 
     def get_16bit_reg(self, address: int, format_char: str) -> int:
-        _raw = self.read_reg(address, 2)
-        return self.unpack(format_char, _raw)[0]
+        """Возвращает значение 16-ти битного регистра. format_char: 'h' - со знаком, 'H' - без знака"""
+        return self.read_reg_16(address, 'h' == format_char)
 
     def set_16bit_reg(self, address: int, value: int):
-        self.write_reg(address, value, 2)
+        self.write_reg_16(address, value)
 
     # BaseSensor
     def set_cfg_reg(self, value: int) -> int:
         """Установить сырую конфигурацию в регистре. Set raw configuration in register."""
-        return self.write_reg(0x00, value, 2)
+        return self.write_reg_16(0x00, value)
 
     def get_cfg_reg(self) -> int:
         """Возвращает сырую конфигурацию из регистра. Get raw configuration from register"""
@@ -81,11 +96,11 @@ class INABase(BaseSensorEx):
 
     def get_shunt_reg(self) -> int:
         """возвращает содержимое регистра напряжения шунта"""
-        return self.get_16bit_reg(0x01, "h")
+        return self.read_reg_16(0x01, True)
 
     def get_bus_reg(self) -> int:
         """возвращает содержимое регистра напряжения шины"""
-        return self.get_16bit_reg(0x02, "H")
+        return self.read_reg_16(0x02, False)
 
     def get_shunt_lsb(self) -> float:
         """Возвращает цену наименьшего младшего разряда АЦП напряжения на шунте в вольтах"""
@@ -122,6 +137,7 @@ class INA219Simple(INABase):
     # предельное напряжение на шунте: 0.32768 В. lsb = желаемое предельное напряжение на шунте поделить на 2 ** 15
     _lsb_shunt_voltage = 1E-5   # 10 uV
     _lsb_bus_voltage = 4E-3     # 4 mV
+    _bus_shift = 3
 
     def get_shunt_lsb(self)->float:
         """Возвращает цену младшего разряда АЦП токового шунта. Не изменяется при изменении разрядности, что странно!"""
@@ -149,8 +165,9 @@ class INA219Simple(INABase):
 
     def get_conversion_cycle_time(self) -> int:
         """Возвращает время в мкс(!) преобразования сигнала в цифровой код и готовности его для чтения по шине!
-        Для текущих настроек датчика. При изменении настроек следует заново вызвать этот метод!"""
-        return 532
+        Для текущих настроек датчика. При изменении настроек следует заново вызвать этот метод!
+        Настройки по умолчанию: шунт и шина, 12 бит, по 532 мкс, преобразования последовательные."""
+        return 2 * 532
 
     def get_voltage(self) -> voltage_ina219:
         """Возвращает кортеж из входного измеряемого напряжения, флага готовности данных, флага математического переполнения (OVF).
@@ -174,16 +191,58 @@ class INA219Simple(INABase):
                               overflow=bool(_raw & 0x01))
 
 ina_voltage = namedtuple("ina_voltage", "shunt bus")
+# калибровка: value - значение регистра калибровки; current_lsb - цена младшего разряда регистра тока, Ампер;
+# power_lsb - цена младшего разряда регистра мощности, Ватт. Смотри INABaseEx.get_calibration
+ina_calibration = namedtuple("ina_calibration", "value current_lsb power_lsb")
+# цены младших разрядов для преобразования сырых кодов (смотри INABaseEx.get_scales, ina_conv)
+# shunt_lsb - напряжение на шунте, Вольт; bus_lsb - напряжение на шине, Вольт;
+# bus_shift - сдвиг вправо регистра напряжения на шине (у INA219 младшие 3 бита - флаги);
+# current_lsb - ток, Ампер; power_lsb - мощность, Ватт
+ina_scales = namedtuple("ina_scales", "shunt_lsb bus_lsb bus_shift current_lsb power_lsb")
+
+# номера каналов буфера метода INABaseEx.capture
+CAPTURE_SHUNT = 0       # регистр напряжения на шунте, 'h'
+CAPTURE_BUS = 1         # регистр напряжения на шине, 'H'. У INA219 вместе с флагами, смотри _bus_shift!
+CAPTURE_CURRENT = 2     # регистр тока, 'h'
+CAPTURE_TIME = 3        # метка времени, ticks_us, 'I'. Только для буфера с метками времени
+# коды типов каналов буфера метода INABaseEx.capture
+_capture_typecodes = 'h', 'H', 'h'
+_capture_typecodes_ts = 'h', 'H', 'h', 'I'
+
+
+class InaSnapshot:
+    """Снимок всех измеренных датчиком значений. Экземпляр выделяется заранее и заполняется методом read_snapshot,
+    поэтому при каждом измерении новый объект не создается!
+    Сырые значения регистров:
+        shunt_raw - напряжение на шунте (со знаком); bus_raw - напряжение на шине (у INA219 вместе с флагами!);
+        current_raw - ток (со знаком); power_raw - мощность; status - флаги состояния (INA219: биты CNVR, OVF
+        регистра напряжения шины; INA226: регистр Mask/Enable).
+    Значения в единицах измерения (None, если регистр не считывался): shunt, bus - Вольт; current - Ампер;
+    power - Ватт. conv_ready - флаг готовности данных, overflow - флаг математического переполнения."""
+
+    __slots__ = ("shunt_raw", "bus_raw", "current_raw", "power_raw", "status",
+                 "shunt", "bus", "current", "power", "conv_ready", "overflow")
+
+    def __init__(self):
+        self.shunt_raw = self.bus_raw = self.current_raw = self.power_raw = self.status = 0
+        self.shunt = self.bus = self.current = self.power = None
+        self.conv_ready = self.overflow = False
+
 
 class INABaseEx(INABase):
     """Чтобы не перегружать InaBase ненужным функционалом"""
+    # записываемые регистры и маски их записываемых бит для теневых копий (смотри RegisterShadow).
+    # Переопределяется в классах-наследниках. По умолчанию - общие для всех INA2xx регистры конфигурации (без RST)
+    # и калибровки, иначе set_cfg_reg и set_clbr_reg наследника без своего словаря не работали бы
+    _writable_regs = {0x00: 0x7FFF, 0x05: 0xFFFF}
+
     def get_pwr_reg(self) -> int:
         """Возвращает содержимое регистра мощности"""
-        return self.get_16bit_reg(0x03, 'H')
+        return self.read_reg_16(0x03, False)
 
     def get_curr_reg(self) -> int:
         """Возвращает содержимое регистра тока. Значение со знаком!"""
-        return self.get_16bit_reg(0x04, 'h')
+        return self.read_reg_16(0x04, True)
 
     def get_current_lsb(self) -> float:
         """Цена наименьшего значащего бита регистра тока.
@@ -197,9 +256,20 @@ class INABaseEx(INABase):
         Для переопределения в классах-наследниках!"""
         raise NotImplemented
 
-    def set_clbr_reg(self, value: int):
-        """Запись в регистр калибровки"""
-        return self.set_16bit_reg(address=0x05, value=value)
+    def get_scales(self) -> ina_scales:
+        """Возвращает текущие цены младших разрядов регистров для преобразования блоков сырых кодов
+        в физические величины (смотри модуль ina_conv). Вызовите после калибровки!"""
+        return ina_scales(shunt_lsb=self.get_shunt_lsb(), bus_lsb=self.get_bus_lsb(), bus_shift=self._bus_shift,
+                          current_lsb=self._current_lsb, power_lsb=self._power_lsb)
+
+    def set_clbr_reg(self, value: int) -> bool:
+        """Запись в регистр калибровки. Если значение не изменилось, то запись не производится.
+        Возвращает Истина, если запись была произведена."""
+        return self._shadow.write(0x05, value)
+
+    def get_clbr_reg(self) -> int:
+        """Возвращает содержимое регистра калибровки. Из теневой копии, если она известна"""
+        return self._shadow.read(0x05)
 
     def choose_shunt_voltage_range(self, voltage: float) -> int:
         """Возвращает диапазон напряжения на шунте в 'сыром' виде,
@@ -208,6 +278,17 @@ class INABaseEx(INABase):
         Для переопределения в классах-наследниках!"""
         raise NotImplemented
 
+    def get_calibration(self, max_expected_current: float, shunt_resistance: float) -> ina_calibration:
+        """Вычисляет калибровку по максимальному току в Амперах и сопротивлению шунта в Омах, без записи в датчик.
+        Состояние драйвера не изменяется, поэтому метод годится для расчета калибровки других датчиков того же типа
+        (смотри ina_array.SensorArray)."""
+        _max_shunt_vltg = max_expected_current * shunt_resistance
+        if _max_shunt_vltg > self.max_shunt_voltage or _max_shunt_vltg <= 0 or max_expected_current <= 0:
+            raise ValueError(f"Неверная комбинация входных параметров! {max_expected_current}\t{shunt_resistance}")
+        current_lsb = max_expected_current / 2 ** 15
+        return ina_calibration(value=int(self._internal_fix_val / (current_lsb * shunt_resistance)),
+                               current_lsb=current_lsb, power_lsb=self.get_pwr_lsb(current_lsb))
+
     def calibrate(self, max_expected_current: float, shunt_resistance: float) -> int:
         """Производит калибровку значений в регистре калибровки по максимальному току в Амперах
         и сопротивлению шунта в Омах"""
@@ -238,6 +319,14 @@ class INABaseEx(INABase):
         self._current_lsb = None        # для метода calibrate
         self._power_lsb = None          # для метода calibrate
         self._internal_fix_val = internal_fixed_value   # для метода calibrate. Значение из документации!
+        # теневые копии записываемых регистров. адрес регистра: маска записываемых бит (смотри _writable_regs)
+        self._shadow = RegisterShadow(self, self._writable_regs)
+        # конфигурация, для которой вычислено время цикла преобразования, и само время (get_conversion_cycle_time)
+        self._cct_config, self._cct_value = None, 0
+        # заранее выделенный снимок для метода read_snapshot
+        self._snapshot = InaSnapshot()
+        # заранее выделенные ячейки для read_raw: шунт, шина, ток, мощность, состояние (смотри _read_raw)
+        self._raw = array('h', (0,)), array('H', (0,)), array('h', (0,)), array('H', (0,)), array('H', (0,))
         #
         self.max_expected_current = max_shunt_voltage / shunt_resistance
         self._current_lsb = self.get_current_lsb()
@@ -256,6 +345,41 @@ class INABaseEx(INABase):
         Для переопределения в наследниках"""
         raise NotImplemented
 
+    def set_cfg_reg(self, value: int, force: bool = True) -> bool:
+        """Установить сырую конфигурацию в регистре. Set raw configuration in register.
+        Если force в Ложь и значение не изменилось, то запись не производится.
+        Возвращает Истина, если запись была произведена."""
+        if value & 0x8000:
+            # после программного сброса (бит RST) содержимое всех регистров возвращается к значениям по умолчанию
+            super().set_cfg_reg(value)
+            self._shadow.invalidate()
+            return True
+        return self._shadow.write(0x00, value, force)
+
+    def get_cfg_reg(self) -> int:
+        """Возвращает сырую конфигурацию из регистра. Get raw configuration from register.
+        Всегда читает регистр по шине и обновляет его теневую копию."""
+        raw = super().get_cfg_reg()
+        self._shadow.update(0x00, raw)
+        return raw
+
+    def get_shadow_stats(self) -> shadow_stats:
+        """Возвращает счетчики теневых копий регистров: сколько чтений и записей по шине удалось избежать"""
+        return self._shadow.get_stats()
+
+    def invalidate_shadow(self, reg_addr: [int, None] = None):
+        """Делает теневую копию регистра (всех регистров при reg_addr is None) неизвестной.
+        Вызовите, если содержимое регистров датчика могло измениться без участия драйвера."""
+        self._shadow.invalidate(reg_addr)
+
+    def resync_shadow(self, reg_addr: [int, None] = None):
+        """Считывает из датчика регистр (все записываемые регистры при reg_addr is None) в теневые копии"""
+        self._shadow.resync(reg_addr)
+
+    def flush_shadow(self) -> int:
+        """Записывает в датчик все отложенные изменения теневых копий. Возвращает количество записей"""
+        return self._shadow.flush()
+
     def get_config(self) -> tuple:
         """Возврат текущей конфигурации датчика в виде кортежа.
         Вызовите этот метод, когда считаете, что нужно обновить конфигурацию в полях класса!!!"""
@@ -280,12 +404,27 @@ class INABaseEx(INABase):
             return
         bf[field_name] = value
 
-    def set_config(self) -> int:
-        """Настраивает датчик в соответствии с настройками. Возвращает значение настроек в сыром(!) виде"""
+    def set_config(self, force: bool = True) -> int:
+        """Настраивает датчик в соответствии с настройками. Возвращает значение настроек в сыром(!) виде.
+        Если force в Ложь, то запись в регистр производится только при изменении настроек."""
         _cfg = self.get_config_field()
-        self.set_cfg_reg(_cfg)
+        self.set_cfg_reg(_cfg, force)
         return _cfg
 
+    def _commit_config(self, value: int) -> bool:
+        """Функция фиксации транзакции конфигурации. Возвращает Истина, если была запись в регистр."""
+        self.set_config_field(value)
+        return self.set_cfg_reg(value, force=False)
+
+    def config_transaction(self) -> BitFieldsTransaction:
+        """Возвращает транзакцию для одновременного изменения нескольких полей регистра конфигурации.
+        Изменения проверяются вместе и записываются в датчик одной записью при фиксации, либо не записываются,
+        если значение регистра не изменилось. Пример:
+            with ina.config_transaction() as cfg:
+                cfg['BADC'] = 3
+                cfg['SADC'] = 3"""
+        return BitFieldsTransaction(self._bit_fields, self.get_config_field(), self._commit_config)
+
     @property
     def max_expected_current(self) -> float:
         """Возвращает расчетный максимальный ожидаемый ток в Амперах"""
@@ -316,6 +455,16 @@ class INABaseEx(INABase):
             return
         raise ValueError(f"Неверное значение сопротивления шунта: {value}")
 
+    @property
+    def current_lsb(self) -> float:
+        """Возвращает цену младшего разряда регистра тока в Амперах, для текущей калибровки"""
+        return self._current_lsb
+
+    @property
+    def power_lsb(self) -> float:
+        """Возвращает цену младшего разряда регистра мощности в Ваттах, для текущей калибровки"""
+        return self._power_lsb
+
     @property
     def shunt_adc_enabled(self) -> bool:
         """Если Истина, то АЦП напряжения на токовом шунте включен!
@@ -340,18 +489,19 @@ class INABaseEx(INABase):
         return self.get_config_field('CNTNS')
 
     def get_conversion_cycle_time(self) -> int:
-        """Возвращает время в мс или мкс преобразования сигнала в цифровой код и готовности его для чтения по шине!
-        Для текущих настроек датчика. При изменении настроек следует заново вызвать этот метод!
+        """Возвращает время в мкс преобразования сигнала в цифровой код и готовности его для чтения по шине!
+        Для текущих настроек датчика (сохраненной конфигурации).
+        Преобразования напряжения на шунте и на шине выполняются последовательно, поэтому время цикла равно
+        сумме времен включенных АЦП, с учетом усреднения. Значение вычисляется один раз для каждой конфигурации и
+        запоминается, поэтому повторный вызов почти ничего не стоит.
         Общий для 219 и 226"""
-        _t0, _t1 = 0, 0
-        #
-        if self.shunt_adc_enabled:
-            _t0 = self.get_cct(shunt=True)
-
-        if self.bus_adc_enabled:
-            _t1 = self.get_cct(shunt=False)
-        # возвращаю наибольшее значение, поскольку измерения производятся параллельно, как утверждает документация
-        return max(_t0, _t1)
+        src = self._bit_fields.source
+        if src == self._cct_config:
+            return self._cct_value
+        # get_cct возвращает 0 для выключенного АЦП
+        value = self.get_cct(shunt=True) + self.get_cct(shunt=False)
+        self._cct_config, self._cct_value = src, value
+        return value
 
     def start_measurement(self, continuous: bool = True, enable_calibration: bool = False,
                           enable_shunt_adc: bool = True, enable_bus_adc: bool = True):
@@ -367,8 +517,9 @@ class INABaseEx(INABase):
         self.set_config_field(continuous, 'CNTNS')
         if enable_calibration:
             self.calibrate(self.max_expected_current, self.shunt_resistance)
-
-        self.set_config()
+        # в режиме однократных измерений запись в регистр конфигурации запускает измерение, поэтому она обязательна.
+        # в непрерывном режиме запись не нужна, если настройки не изменились
+        self.set_config(force=not continuous)
 
 
     @property
@@ -391,13 +542,134 @@ class INABaseEx(INABase):
 
     def __next__(self) -> ina_voltage:
         """Возвращает измеренные значения. кортеж, число."""
-        _shunt, _bus = None, None
-        if self.shunt_adc_enabled:
-            _shunt = self.get_shunt_voltage()
-        if self.bus_adc_enabled:
-            _bus = self.get_voltage()
+        snap = self.read_snapshot(full=False)
+        return ina_voltage(shunt=snap.shunt, bus=snap.bus)
 
-        return ina_voltage(shunt=_shunt, bus=_bus)
+    @staticmethod
+    def make_capture_buffer(capacity: int, timestamps: bool = False) -> RingBuffer:
+        """Возвращает кольцевой буфер для метода capture.
+        Каналы: CAPTURE_SHUNT, CAPTURE_BUS, CAPTURE_CURRENT и, если timestamps в Истина, CAPTURE_TIME."""
+        return RingBuffer(capacity, _capture_typecodes_ts if timestamps else _capture_typecodes)
+
+    def capture(self, n: int, out: [RingBuffer, None] = None, timestamps: bool = False,
+                period_us: [int, None] = None) -> RingBuffer:
+        """Собирает n отсчетов в виде сырых кодов регистров (напряжение на шунте, напряжение на шине, ток)
+        в кольцевой буфер out с частотой преобразования датчика. Преобразование в Вольты/Амперы производится позже,
+        для всего блока сразу. Если out is None, то создается новый буфер (смотри make_capture_buffer).
+        Если буфер полон, то отсчет отбрасывается и увеличивается счетчик out.overruns.
+        timestamps - записывать метки времени (ticks_us), только для нового буфера;
+        period_us - период отсчетов в мкс. Если None, то равен времени преобразования (get_conversion_cycle_time).
+        В режиме однократных измерений каждое измерение запускается записью в регистр конфигурации.
+        Настройте датчик и вызовите start_measurement до вызова этого метода!"""
+        rb = self.make_capture_buffer(n, timestamps) if out is None else out
+        shunt, bus, curr = rb.channel(CAPTURE_SHUNT), rb.channel(CAPTURE_BUS), rb.channel(CAPTURE_CURRENT)
+        ts = rb.channel(CAPTURE_TIME) if rb.channels > CAPTURE_TIME else None
+        period = self.get_conversion_cycle_time() if period_us is None else period_us
+        single_shot = self.is_single_shot_mode()
+        cfg = self.get_config_field()
+        deadline = ticks_us()
+        for _ in range(n):
+            if single_shot:
+                # запуск однократного измерения
+                self.set_cfg_reg(cfg)
+                deadline = ticks_us()
+            # отсчет времени от предыдущего срока, а не от текущего момента. Период не 'уплывает'
+            deadline = ticks_add(deadline, period)
+            delay = ticks_diff(deadline, ticks_us())
+            if delay > 0:
+                sleep_us(delay)
+            i = rb.reserve()
+            if i < 0:
+                continue
+            if ts is not None:
+                ts[i] = ticks_us()
+            shunt[i] = self.read_reg_16(0x01, True)
+            bus[i] = self.read_reg_16(0x02, False)
+            curr[i] = self.read_reg_16(0x04, True)
+            rb.commit()
+        return rb
+
+    def make_stats(self, window: int = 0, window_ms: int = 0, callback=None) -> WindowStats:
+        """Возвращает потоковую статистику по окнам для каналов: напряжение на шунте, напряжение на шине, ток.
+        Порядок каналов как у буфера метода capture, поэтому буфер можно передать в метод WindowStats.consume.
+        Цены младших разрядов берутся из текущей калибровки (get_scales). Смотри sensor_pack_2.stats."""
+        sc = self.get_scales()
+        return WindowStats(lsbs=(sc.shunt_lsb, sc.bus_lsb, sc.current_lsb), shifts=(0, sc.bus_shift, 0),
+                           window=window, window_ms=window_ms, callback=callback)
+
+    def feed_stats(self, stats: WindowStats) -> [tuple, None]:
+        """Считывает сырые коды напряжения на шунте, напряжения на шине и тока и добавляет их в статистику stats
+        (смотри make_stats). Возвращает итоги окна, если оно завершилось, иначе None."""
+        stats.add(CAPTURE_SHUNT, self.read_reg_16(0x01, True))
+        stats.add(CAPTURE_BUS, self.read_reg_16(0x02, False))
+        stats.add(CAPTURE_CURRENT, self.read_reg_16(0x04, True))
+        return stats.end_sample()
+
+    def get_status_reg(self) -> int:
+        """Возвращает значение регистра состояния (INA226: Mask/Enable; INA219: регистр напряжения на шине
+        с флагами CNVR, OVF). Значение можно передать в is_conversion_ready и read_snapshot, чтобы не читать
+        регистр повторно. Для переопределения в классах-наследниках!"""
+        raise NotImplementedError
+
+    def is_conversion_ready(self, status: [int, None] = None) -> bool:
+        """Возвращает Истина, если преобразование завершено и данные готовы для чтения.
+        Самый быстрый способ проверки готовности: одно чтение регистра, без создания кортежей.
+        status - уже считанное значение регистра состояния (get_status_reg) или None, тогда регистр читается.
+        Для переопределения в классах-наследниках!"""
+        raise NotImplementedError
+
+    def read_raw(self, address: int, out: tuple, index: int = 0, full: bool = True,
+                 status: [int, None] = None) -> bool:
+        """Считывает сырые значения регистров датчика с адресом address в наилучшем для датчика порядке.
+        Значения записываются в элементы с индексом index массивов out: (шунт, шина, ток, мощность, состояние).
+        Адрес может отличаться от адреса драйвера (смотри ina_array.SensorArray): адрес драйвера и его теневые копии
+        не изменяются. Если full в Истина, то считываются все регистры данных и состояние, иначе только регистры
+        напряжения включенных АЦП. status - уже считанное значение регистра состояния или None.
+        Возвращает Истина, если ячейка состояния заполнена. Память в куче не выделяется!
+        Для переопределения в классах-наследниках!"""
+        raise NotImplementedError
+
+    def _read_raw(self, snap: InaSnapshot, full: bool, status: [int, None]):
+        """Считывает сырые значения регистров в snap методом read_raw (один порядок чтения для драйвера и
+        для массива датчиков). Значения регистров, которые не считывались, не определены."""
+        if full and status is None:
+            # через get_status_reg: у INA226 обновляется теневая копия Mask/Enable
+            status = self.get_status_reg()
+        raw = self._raw
+        has_status = self.read_raw(self.address, raw, 0, full, status)
+        snap.shunt_raw = raw[0][0]
+        snap.bus_raw = raw[1][0]
+        snap.current_raw = raw[2][0]
+        snap.power_raw = raw[3][0]
+        if has_status:
+            st = raw[4][0]
+            snap.status = st
+            snap.conv_ready = 0 != st & self._conv_ready_mask
+            snap.overflow = 0 != st & self._overflow_mask
+
+    def read_snapshot(self, out: [InaSnapshot, None] = None, full: bool = True, scale: bool = True,
+                      status: [int, None] = None) -> InaSnapshot:
+        """Считывает за один вызов напряжение на шунте, напряжение на шине, ток, мощность и состояние датчика.
+        Возвращает out, если он не None, иначе заранее выделенный снимок датчика, который перезаписывается при
+        каждом вызове! Если full в Ложь, то считываются только напряжения включенных АЦП (как в __next__),
+        а ток, мощность и состояние не считываются.
+        Если scale в Ложь, то заполняются только сырые значения, без преобразования в физические величины.
+        status - значение регистра состояния (INA226: Mask/Enable; INA219: регистр напряжения на шине), уже
+        считанное вызывающим, например при проверке готовности. Регистр не читается повторно, флаги снимка
+        берутся из status. Это экономит транзакцию и сохраняет флаги, которые сбрасываются чтением (CVRF, AFF)."""
+        snap = self._snapshot if out is None else out
+        snap.shunt = snap.bus = snap.current = snap.power = None
+        self._read_raw(snap, full, status)
+        if not scale:
+            return snap
+        if full or self.shunt_adc_enabled:
+            snap.shunt = self.get_shunt_lsb() * snap.shunt_raw
+        if full or self.bus_adc_enabled:
+            snap.bus = self.get_bus_lsb() * (snap.bus_raw >> self._bus_shift)
+        if full:
+            snap.current = self._current_lsb * snap.current_raw
+            snap.power = self._power_lsb * snap.power_raw
+        return snap
 
 
 
@@ -412,6 +684,11 @@ class INA219(INABaseEx, IBaseSensorEx, Iterator):   # INA219Simple
     _shunt_voltage_limit = 0.32768
     _lsb_shunt_voltage = 1E-5   # 10 uV
     _lsb_bus_voltage = 4E-3     # 4 mV
+    _bus_shift = 3
+    # записываемые регистры и маски их записываемых бит. младший бит регистра калибровки недоступен для записи!
+    _writable_regs = {0x00: 0x3FFF, 0x05: 0xFFFE}
+    # флаги CNVR и OVF в ячейке состояния read_raw (биты 1, 0 регистра напряжения на шине)
+    _conv_ready_mask, _overflow_mask = 0x02, 0x01
     # разрешенные значения для полей BADC, SADC
     _vval = tuple(i for i in range(0x10) if i not in range(4, 8))
     # описание регистра конфигурации
@@ -497,20 +774,16 @@ class INA219(INABaseEx, IBaseSensorEx, Iterator):   # INA219Simple
         """Возвращает время в мкс(!) преобразования сигнала в цифровой код и готовности его для чтения по шине!
         Get Current Conversion Time (CCT).
         Если shunt is True, то возвращается время преобразования напряжения на шУнте, иначе
-        возвращается время преобразования напряжения на шИне!"""
-        result = 0
+        возвращается время преобразования напряжения на шИне!
+        Время включает усреднение (значения 9..15 полей SADC, BADC). Для выключенного АЦП возвращается 0."""
         if shunt:
             if not self.shunt_adc_enabled:
-                return result
-            adc_field = self.shunt_adc_resolution
-            result = _get_conv_time(adc_field)
-            return result
+                return 0
+            return _ina219_conv_times[self.shunt_adc_resolution]
         # BUS
         if not self.bus_adc_enabled:
-            return result
-        adc_field = self.bus_adc_resolution
-        result = _get_conv_time(adc_field)
-        return result
+            return 0
+        return _ina219_conv_times[self.bus_adc_resolution]
 
 #    def start_measurement(self, continuous: bool = True, enable_calibration: bool = False,
 #                          enable_shunt_adc: bool = True, enable_bus_adc: bool = True):
@@ -585,6 +858,39 @@ class INA219(INABaseEx, IBaseSensorEx, Iterator):   # INA219Simple
     def shunt_adc_resolution(self, value: int):
         self.set_config_field(value, 'SADC')
 
+    def get_averaging_count(self, shunt: bool = True) -> int:
+        """Возвращает количество усредняемых датчиком отсчетов АЦП напряжения на шунте (shunt в Истина)
+        или на шине, в соответствии с полями SADC/BADC. Смотри 'Table 5. ADC Settings'"""
+        value = self.shunt_adc_resolution if shunt else self.bus_adc_resolution
+        return 1 << (value - 8) if value > 8 else 1
+
+    def read_raw(self, address: int, out: tuple, index: int = 0, full: bool = True,
+                 status: [int, None] = None) -> bool:
+        """Порядок чтения: шина (флаги CNVR, OVF), шунт, ток и последним мощность,
+        так как чтение регистра мощности сбрасывает флаг готовности CNVR!
+        status - уже считанный регистр напряжения на шине. В ячейку состояния записываются флаги CNVR, OVF."""
+        shunt, bus, current, power, st = out
+        has_status = full or self.bus_adc_enabled
+        if has_status:
+            breg_val = self.read_reg_16_from(address, 0x02, False) if status is None else status
+            bus[index] = breg_val
+            st[index] = breg_val & 0x03
+        if full or self.shunt_adc_enabled:
+            shunt[index] = self.read_reg_16_from(address, 0x01, True)
+        if full:
+            current[index] = self.read_reg_16_from(address, 0x04, True)
+            power[index] = self.read_reg_16_from(address, 0x03, False)
+        return has_status
+
+    def get_status_reg(self) -> int:
+        """Возвращает содержимое регистра напряжения на шине, вместе с флагами CNVR (бит 1) и OVF (бит 0)"""
+        return self.read_reg_16(0x02, False)
+
+    def is_conversion_ready(self, status: [int, None] = None) -> bool:
+        """Возвращает Истина, если установлен бит CNVR регистра напряжения на шине.
+        Бит сбрасывается чтением регистра мощности или записью в регистр конфигурации!"""
+        return 0 != (self.read_reg_16(0x02, False) if status is None else status) & 0x02
+
     def get_data_status(self) -> ina219_data_status:
         """Возвращает состояние готовности данных, доступны ли данные для считывания?
         Тип возвращаемого значения выбирайте сами!"""
@@ -595,6 +901,16 @@ class INA219(INABaseEx, IBaseSensorEx, Iterator):   # INA219Simple
         _raw = self.get_bus_reg()
         return self.get_bus_lsb() * (_raw >> 3)
 
+    # IBaseSensorEx
+    def get_measurement_value(self, value_index: int = 0):
+        """Возвращает измеренное датчиком значение(значения).
+        Если 0 == value_index, то возвращает напряжение на шунте.
+        Если 1 == value_index, то возвращает напряжение на шине питания."""
+        if 0 == value_index:
+            return self.get_shunt_voltage()
+        if 1 == value_index:
+            return self.get_voltage()
+
 
 ina226_id = namedtuple("ina226_id", "manufacturer_id die_id")
 config_ina226 = namedtuple("config_ina226", "AVG VBUSCT VSHCT CNTNS BADC_EN SADC_EN")
@@ -609,6 +925,11 @@ class INA226(INABaseEx, IBaseSensorEx, Iterator):   # INA219Simple
     _shunt_voltage_limit = 0.08192
     _lsb_shunt_voltage = 2.5E-6   # 2.5 uV
     _lsb_bus_voltage = 1.25E-3     # 1.25 mV
+    # записываемые регистры и маски их записываемых бит: конфигурация (без RST и битов 14..12 только для чтения),
+    # калибровка, Mask/Enable (без флагов), Alert Limit
+    _writable_regs = {0x00: 0x0FFF, 0x05: 0x7FFF, 0x06: 0xFC03, 0x07: 0xFFFF}
+    # флаги CVRF и OVF регистра Mask/Enable
+    _conv_ready_mask, _overflow_mask = 0x08, 0x04
     # описание регистра конфигурации
     _config_reg_ina226 = (bit_field_info(name='RST', position=range(15, 16), valid_values=None, description="Сбрасывает все регистры в значениям по умолчанию."),    # Reset Bit
                           bit_field_info(name='AVG', position=range(9, 12), valid_values=None, description="Режим усреднения."),
@@ -622,12 +943,21 @@ class INA226(INABaseEx, IBaseSensorEx, Iterator):   # INA219Simple
                                          description='1 - АЦП напряжения на токовом шунте включен, 0 - выключен'),
                           )
 
+    # время одного преобразования в мкс для значений полей VBUSCT/VSHCT (0..7). Смотри таблицы 7 и 8 документации
+    _conv_times = 140, 204, 332, 588, 1100, 2116, 4156, 8244
+    # количество усредняемых отсчетов для значений поля AVG (0..7). Смотри таблицу 6 документации
+    _avg_counts = 1, 4, 16, 64, 128, 256, 512, 1024
+
     @staticmethod
     def get_conv_time(value: int = 0) -> int:
-        """Возвращает время преобразования в мкс(!)"""
+        """Возвращает время одного преобразования в мкс(!), без учета усреднения"""
         check_value(value, range(8), f"Неверное значение поля VBUSCT/VSHCT: {value}")
-        val = 0.14, 0.204, 0.332, 0.558, 1.1, 2.16, 4.156, 8.244
-        return int(1000 * val[value])
+        return INA226._conv_times[value]
+
+    def get_averaging_count(self, shunt: bool = True) -> int:
+        """Возвращает количество усредняемых отсчетов, в соответствии с полем AVG. Одно для обоих АЦП, параметр shunt
+        оставлен для совместимости с INA219.get_averaging_count"""
+        return INA226._avg_counts[self.averaging_mode]
 
     def __init__(self, adapter: bus_service.BusAdapter, address=0x40, shunt_resistance: float = 0.01):
         """shunt_resistance - сопротивление шунта, [Ом].
@@ -671,8 +1001,109 @@ class INA226(INABaseEx, IBaseSensorEx, Iterator):   # INA219Simple
         return 25 * curr_lsb
 
     def get_mask_enable(self) -> int:
-        """Возвращает содержимое регистра Mask/Enable."""
-        return self.get_16bit_reg(0x06, "H")
+        """Возвращает содержимое регистра Mask/Enable.
+        Регистр всегда читается по шине, так как содержит флаги состояния, которые сбрасываются при его чтении!"""
+        val = self.read_reg_16(0x06)
+        self._shadow.update(0x06, val)
+        return val
+
+    def set_mask_enable(self, value: int) -> bool:
+        """Запись в регистр Mask/Enable. Если записываемые биты не изменились, то запись не производится.
+        Возвращает Истина, если запись была произведена."""
+        return self._shadow.write(0x06, value)
+
+    def enable_conversion_ready_alert(self, enable: bool = True, latch: bool = True, active_high: bool = False) -> bool:
+        """Настраивает вывод ALERT на срабатывание по готовности данных (бит CNVR регистра Mask/Enable).
+        latch - если Истина, то ALERT удерживается до чтения регистра Mask/Enable (бит LEN);
+        active_high - если Истина, то активный уровень ALERT высокий, иначе низкий (бит APOL).
+        Остальные функции ALERT (SOL, SUL, BOL, BUL, POL) не изменяются.
+        Возвращает Истина, если была запись в регистр."""
+        me_reg = self._shadow.read(0x06) & ~0x0403
+        if enable:
+            me_reg |= 0x0400
+        if active_high:
+            me_reg |= 0x0002
+        if latch:
+            me_reg |= 0x0001
+        return self.set_mask_enable(me_reg)
+
+    def get_alert_limit(self) -> int:
+        """Возвращает содержимое регистра Alert Limit. Из теневой копии, если она известна"""
+        return self._shadow.read(0x07)
+
+    def set_alert_limit(self, value: int) -> bool:
+        """Запись в регистр Alert Limit. Если значение не изменилось, то запись не производится.
+        Возвращает Истина, если запись была произведена."""
+        return self._shadow.write(0x07, value)
+
+    # функции вывода ALERT по порогу: имя функции: (бит регистра Mask/Enable, единица измерения порога)
+    # 'shunt_ov', 'shunt_uv' - напряжение на шунте, Вольт; 'current_ov', 'current_uv' - ток, Ампер (сравнение
+    # выполняется по напряжению на шунте); 'bus_ov', 'bus_uv' - напряжение на шине, Вольт; 'pwr_lim' - мощность, Ватт
+    _limit_functions = {'shunt_ov': (0x8000, 'V'), 'shunt_uv': (0x4000, 'V'),
+                        'current_ov': (0x8000, 'A'), 'current_uv': (0x4000, 'A'),
+                        'bus_ov': (0x2000, 'V'), 'bus_uv': (0x1000, 'V'), 'pwr_lim': (0x0800, 'W')}
+
+    def limit_to_raw(self, function: str, limit: float) -> int:
+        """Преобразует порог limit в единицах измерения функции function в значение регистра Alert Limit.
+        Порог сравнивается датчиком с сырым значением регистра, поэтому все вычисления с плавающей точкой
+        выполняются один раз, здесь. Смотри _limit_functions."""
+        info = INA226._limit_functions.get(function)
+        if info is None:
+            raise ValueError(f"Неверная функция ALERT: {function}")
+        bit, unit = info
+        if 0x2000 == bit or 0x1000 == bit:
+            raw, rng = round(limit / self.get_bus_lsb()), range(0x8000)
+        elif 0x0800 == bit:
+            raw, rng = round(limit / self._power_lsb), range(0x10000)
+        else:
+            if 'A' == unit:
+                limit *= self.shunt_resistance
+            raw, rng = round(limit / self.get_shunt_lsb()), range(-0x8000, 0x8000)
+        if raw not in rng:
+            raise ValueError(get_error_str(function, raw, rng))
+        return raw & 0xFFFF
+
+    def set_threshold(self, function: str, limit: float, latch: [bool, None] = None,
+                      active_high: [bool, None] = None) -> bool:
+        """Настраивает аппаратное сравнение с порогом: вывод ALERT и флаг AFF срабатывают, когда
+        измеренное значение выходит за порог limit. Единица измерения limit зависит от function, смотри _limit_functions.
+        Одновременно может работать только одна функция сравнения (SOL, SUL, BOL, BUL, POL), поэтому прежняя
+        функция сравнения заменяется. Функция готовности данных (CNVR) работает вместе с ней и не изменяется.
+        latch - если Истина, то ALERT и AFF удерживаются до чтения регистра Mask/Enable (бит LEN);
+        active_high - если Истина, то активный уровень ALERT высокий, иначе низкий (бит APOL).
+        Если latch или active_high в None, то соответствующий бит не изменяется (он общий с функцией CNVR,
+        смотри enable_conversion_ready_alert).
+        Флаг AFF, оставшийся от прежнего порога или функции, сбрасывается.
+        Возвращает Истина, если была запись хотя бы в один регистр."""
+        raw = self.limit_to_raw(function, limit)
+        # заменяются только биты функции сравнения. CNVR, APOL, LEN - из теневой копии
+        me_reg = (self._shadow.read(0x06) & ~0xF800) | INA226._limit_functions[function][0]
+        if active_high is not None:
+            me_reg = me_reg | 0x0002 if active_high else me_reg & ~0x0002
+        if latch is not None:
+            me_reg = me_reg | 0x0001 if latch else me_reg & ~0x0001
+        written = self.set_alert_limit(raw)
+        written = self.set_mask_enable(me_reg) or written
+        # порог и функция записываются отдельно. AFF мог быть защелкнут до настройки или между записями,
+        # сравнением нового порога по старой функции. Чтение Mask/Enable сбрасывает его
+        self.get_mask_enable()
+        return written
+
+    def clear_threshold(self) -> bool:
+        """Выключает все функции сравнения с порогом (SOL, SUL, BOL, BUL, POL). Биты CNVR, APOL, LEN не изменяются.
+        Возвращает Истина, если была запись в регистр."""
+        return self.set_mask_enable(self._shadow.read(0x06) & ~0xF800)
+
+    def watch(self, out: [InaSnapshot, None] = None) -> [InaSnapshot, None]:
+        """Проверка срабатывания порога, заданного методом set_threshold.
+        Читает только регистр Mask/Enable (одна транзакция на шине). Если флаг AFF не установлен, возвращает None.
+        Иначе считывает данные (read_snapshot) и возвращает их. Поле status содержит значение Mask/Enable,
+        прочитанное при проверке, повторно регистр не читается. В режиме latch чтение Mask/Enable сбрасывает AFF
+        и освобождает ALERT."""
+        me_reg = self.get_mask_enable()
+        if not me_reg & 0x10:
+            return None
+        return self.read_snapshot(out, status=me_reg)
 
     def choose_shunt_voltage_range(self, voltage: float) -> int:
         """Заглушка. Работа не требуется, так как у INA226 один(!) диапазон напряжения на шунте!"""
@@ -682,18 +1113,16 @@ class INA226(INABaseEx, IBaseSensorEx, Iterator):   # INA219Simple
         """Возвращает время в мкс(!) преобразования сигнала в цифровой код и готовности его для чтения по шине!
         Get Current Conversion Time (CCT).
         Если shunt is True, то возвращается время преобразования напряжения на шУнте, иначе
-        возвращается время преобразования напряжения на шИне!"""
-        result = 0
+        возвращается время преобразования напряжения на шИне!
+        Время включает усреднение (поле AVG). Для выключенного АЦП возвращается 0."""
         if shunt:
             if not self.shunt_adc_enabled:
-                return result
-            result = INA226.get_conv_time(self.shunt_voltage_conv)
-            return result
+                return 0
+            return INA226._conv_times[self.shunt_voltage_conv] * self.get_averaging_count()
         # BUS
         if not self.bus_adc_enabled:
-            return result
-        result = INA226.get_conv_time(self.bus_voltage_conv)
-        return result
+            return 0
+        return INA226._conv_times[self.bus_voltage_conv] * self.get_averaging_count()
 
     # BaseSensorEx
     def get_id(self) -> ina226_id:
@@ -703,6 +1132,15 @@ class INA226(INABaseEx, IBaseSensorEx, Iterator):   # INA219Simple
     def soft_reset(self):
         self.set_cfg_reg(0b1100_0001_0010_0111)
 
+    def get_status_reg(self) -> int:
+        """Возвращает содержимое регистра Mask/Enable. Чтение сбрасывает флаг CVRF (и AFF в режиме LEN)!"""
+        return self.get_mask_enable()
+
+    def is_conversion_ready(self, status: [int, None] = None) -> bool:
+        """Возвращает Истина, если установлен флаг CVRF регистра Mask/Enable.
+        Флаг сбрасывается этим чтением регистра Mask/Enable или записью в регистр конфигурации!"""
+        return 0 != (self.get_mask_enable() if status is None else status) & 0x08
+
     def get_data_status(self) -> ina226_data_status:
         """Возвращает именованный кортеж, состояния данных."""
         me_reg = self.get_mask_enable()
@@ -722,6 +1160,22 @@ class INA226(INABaseEx, IBaseSensorEx, Iterator):   # INA219Simple
     def get_voltage(self) -> float:
         return self.get_bus_lsb() * self.get_bus_reg()
 
+    def read_raw(self, address: int, out: tuple, index: int = 0, full: bool = True,
+                 status: [int, None] = None) -> bool:
+        """Порядок чтения: Mask/Enable (флаги CVRF, OVF; чтение сбрасывает CVRF), шунт, шина, ток, мощность.
+        status - уже считанный регистр Mask/Enable."""
+        shunt, bus, current, power, st = out
+        if full:
+            st[index] = self.read_reg_16_from(address, 0x06, False) if status is None else status
+        if full or self.shunt_adc_enabled:
+            shunt[index] = self.read_reg_16_from(address, 0x01, True)
+        if full or self.bus_adc_enabled:
+            bus[index] = self.read_reg_16_from(address, 0x02, False)
+        if full:
+            current[index] = self.read_reg_16_from(address, 0x04, True)
+            power[index] = self.read_reg_16_from(address, 0x03, False)
+        return full
+
     # IBaseSensorEx
     def get_measurement_value(self, value_index: int = 0):
         """Возвращает измеренное датчиком значение(значения).
@@ -731,3 +1185,121 @@ class INA226(INABaseEx, IBaseSensorEx, Iterator):   # INA219Simple
             return self.get_shunt_voltage()
         if 1 == value_index:
             return self.get_voltage()
+
+
+# статистика ожидания готовности данных (ConversionWaiter)
+# samples - количество ожиданий; polls - общее количество проверок готовности по шине;
+# last_polls - количество проверок готовности для последнего отсчета; timeouts - количество отсчетов без готовности;
+# latency_us - среднее измеренное время готовности, мкс; sleep_us - текущее время сна до первой проверки, мкс
+waiter_stats = namedtuple("waiter_stats", "samples polls last_polls timeouts latency_us sleep_us")
+
+
+class ConversionWaiter:
+    """Ожидание готовности данных датчика, которое подстраивается под реальное время преобразования.
+    Сначала 'спит' время, полученное из модели времени преобразования (get_conversion_cycle_time) и уточненное по
+    измерениям, затем опрашивает флаг готовности (INA219: CNVR, INA226: CVRF) с интервалом poll_interval_us.
+    Время сна подбирается так, чтобы готовность обнаруживалась первой или второй проверкой:
+    меньше лишних обращений к шине и меньше потерянного времени.
+    Пример:
+        waiter = ConversionWaiter(ina226)
+        while True:
+            if waiter.wait():
+                data = ina226.read_snapshot(status=waiter.status)
+    Для однократных измерений вызовите mark() сразу после start_measurement.
+    INA219 в непрерывном режиме: флаг CNVR сбрасывается только чтением регистра мощности, используйте read_snapshot!"""
+
+    def __init__(self, sensor: INABaseEx, poll_interval_us: int = 50, timeout_factor: int = 2):
+        """sensor - датчик;
+        poll_interval_us - интервал между проверками готовности, мкс;
+        timeout_factor - ожидание прекращается через timeout_factor * (предсказанное время преобразования)."""
+        self._sensor = sensor
+        self._poll_us = poll_interval_us
+        self._timeout_factor = timeout_factor
+        # начало текущего преобразования
+        self._start = ticks_us()
+        # предсказанное время преобразования, для которого выполнено обучение
+        self._predicted = -1
+        self._sleep_us = 0
+        self._latency_us = 0
+        # регистр состояния, считанный последней проверкой готовности, или None
+        self._status = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Обнуляет счетчики"""
+        self._samples = self._polls = self._last_polls = self._timeouts = 0
+
+    def get_stats(self) -> waiter_stats:
+        return waiter_stats(samples=self._samples, polls=self._polls, last_polls=self._last_polls,
+                            timeouts=self._timeouts, latency_us=self._latency_us, sleep_us=self._sleep_us)
+
+    @property
+    def status(self) -> [int, None]:
+        """Значение регистра состояния (смотри INABaseEx.get_status_reg), считанное проверкой, обнаружившей готовность,
+        или None, если последнее ожидание завершилось без готовности. Передайте его в read_snapshot датчика:
+        чтение регистра Mask/Enable INA226 сбрасывает CVRF, повторное чтение потеряет флаг и займет шину"""
+        return self._status
+
+    @property
+    def last_polls(self) -> int:
+        """Количество проверок готовности, потребовавшееся для последнего отсчета"""
+        return self._last_polls
+
+    def mark(self):
+        """Отмечает начало преобразования. Вызывайте сразу после запуска однократного измерения"""
+        self._start = ticks_us()
+
+    def _relearn(self, predicted: int):
+        """Начинает обучение заново при изменении предсказанного времени преобразования (изменение настроек)"""
+        self._predicted = predicted
+        self._latency_us = predicted
+        # первая проверка немного раньше предсказанного времени
+        self._sleep_us = predicted - (predicted >> 3)
+
+    def wait(self) -> bool:
+        """Ожидает готовности данных. Возвращает Истина, если данные готовы, Ложь - если время ожидания истекло.
+        Регистр состояния, считанный проверкой готовности, сохраняется в свойстве status.
+        Начало следующего преобразования отмечается автоматически (непрерывный режим)."""
+        sensor = self._sensor
+        predicted = sensor.get_conversion_cycle_time()
+        if predicted != self._predicted:
+            self._relearn(predicted)
+        start = self._start
+        delay = ticks_diff(ticks_add(start, self._sleep_us), ticks_us())
+        if delay > 0:
+            sleep_us(delay)
+        limit = self._timeout_factor * predicted + self._poll_us
+        polls = 0
+        while True:
+            polls += 1
+            status = sensor.get_status_reg()
+            ready = sensor.is_conversion_ready(status)
+            now = ticks_us()
+            if ready:
+                break
+            if ticks_diff(now, start) > limit:
+                break
+            sleep_us(self._poll_us)
+        self._start = now
+        self._samples += 1
+        self._polls += polls
+        self._last_polls = polls
+        if not ready:
+            self._status = None
+            self._timeouts += 1
+            return False
+        self._status = status
+        self._learn(ticks_diff(now, start), polls)
+        return True
+
+    def _learn(self, latency: int, polls: int):
+        """Уточняет среднее время готовности и время сна до первой проверки"""
+        self._latency_us += (latency - self._latency_us) >> 3
+        if 1 == polls:
+            # данные уже были готовы, возможно сон слишком длинный. пробую проверять раньше
+            self._sleep_us -= self._sleep_us >> 4
+        elif polls > 2:
+            # сон слишком короткий. приближаю его к измеренному времени готовности
+            target = self._latency_us - self._poll_us
+            if target > self._sleep_us:
+                self._sleep_us += (target - self._sleep_us) >> 1
@@ -2,9 +2,20 @@
 # MIT license
 # Copyright (c) 2022 Roman Shevchik   goctaprog@gmail.com
 import struct
-import micropython
 from sensor_pack_2 import bus_service
-from machine import Pin
+
+try:
+    import micropython
+    from machine import Pin
+except ImportError:
+    # CPython (проверки и тесты на ПК). Декораторы генерации кода MicroPython не нужны,
+    # класс Pin используется только в аннотациях типов
+    from sensor_pack_2.bus_service import Pin
+
+    class micropython:
+        @staticmethod
+        def native(func):
+            return func
 
 
 @micropython.native
@@ -89,6 +100,39 @@ class Device:
 class DeviceEx(Device):
     """Класс - основа датчика. Добавил общие методы доступа к шине. 30.01.2024"""
 
+    def __init__(self, adapter: bus_service.BusAdapter, address: [int, Pin], big_byte_order: bool):
+        super().__init__(adapter, address, big_byte_order)
+        # заранее выделенный буфер для чтения 16-ти битных регистров без выделения памяти при каждом чтении
+        self._buf_2 = bytearray(2)
+
+    @micropython.native
+    def read_reg_16(self, reg_addr: int, signed: bool = False) -> int:
+        """Считывает 16-ти битный регистр с адресом reg_addr в заранее выделенный буфер и возвращает его значение.
+        Если signed в Истина, то значение со знаком (дополнительный код). Память в куче не выделяется!"""
+        buf = self._buf_2
+        self.adapter.read_buf_from_memory(self.address, reg_addr, buf, 1)
+        if self.big_byte_order:
+            val = (buf[0] << 8) | buf[1]
+        else:
+            val = (buf[1] << 8) | buf[0]
+        if signed and val & 0x8000:
+            return val - 0x10000
+        return val
+
+    def read_reg_16_from(self, address: int, reg_addr: int, signed: bool = False) -> int:
+        """Как read_reg_16, но для устройства с адресом address на той же шине, например для массива однотипных
+        датчиков, обслуживаемых одним экземпляром драйвера. Адрес самого драйвера не изменяется.
+        Тело повторяет read_reg_16, чтобы не добавлять вызов на самый частый путь. Память в куче не выделяется!"""
+        buf = self._buf_2
+        self.adapter.read_buf_from_memory(address, reg_addr, buf, 1)
+        if self.big_byte_order:
+            val = (buf[0] << 8) | buf[1]
+        else:
+            val = (buf[1] << 8) | buf[0]
+        if signed and val & 0x8000:
+            return val - 0x10000
+        return val
+
     def read_reg(self, reg_addr: int, bytes_count=2) -> bytes:
         """считывает из регистра датчика значение.
         bytes_count - размер значения в байтах.
@@ -100,10 +144,24 @@ class DeviceEx(Device):
     def write_reg(self, reg_addr: int, value: [int, bytes, bytearray], bytes_count) -> int:
         """записывает данные value в датчик, по адресу reg_addr.
         bytes_count - кол-во записываемых данных.
+        Тип value проверяется при каждом вызове. Если value всегда целое, то вызывайте write_reg_int или
+        write_reg_16, без проверки типа.
         Добавил 25.01.2024"""
+        if isinstance(value, int):
+            return self.adapter.write_register_int(self.address, reg_addr, value, bytes_count, self.big_byte_order)
         byte_order = self._get_byteorder_as_str()[0]
         return self.adapter.write_register(self.address, reg_addr, value, bytes_count, byte_order)
 
+    def write_reg_int(self, reg_addr: int, value: int, bytes_count: int) -> int:
+        """записывает целое число value размером bytes_count байт в регистр датчика с адресом reg_addr.
+        Значение упаковывается в буфер адаптера шины, память в куче не выделяется!"""
+        return self.adapter.write_register_int(self.address, reg_addr, value, bytes_count, self.big_byte_order)
+
+    def write_reg_16(self, reg_addr: int, value: int) -> int:
+        """записывает целое число value в 16-ти битный регистр датчика с адресом reg_addr.
+        Значение упаковывается в буфер адаптера шины, память в куче не выделяется!"""
+        return self.adapter.write_register_int(self.address, reg_addr, value, 2, self.big_byte_order)
+
     def read(self, n_bytes: int) -> bytes:
         """Читает из устройства n_bytes байт. Добавил 25.01.2024"""
         return self.adapter.read(self.address, n_bytes)
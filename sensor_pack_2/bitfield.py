@@ -3,7 +3,7 @@
 # Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
 """Представление битового поля"""
 from collections import namedtuple
-from sensor_pack_2.base_sensor import check_value, get_error_str
+from sensor_pack_2.base_sensor import get_error_str
 
 # информация о битовом поле в виде именованного кортежа
 # name: str  - имя
@@ -20,6 +20,35 @@ def _bitmask(bit_rng: range) -> int:
     return sum(map(lambda x: 2 ** x, bit_rng))
 
 
+# скомпилированное описание битовых полей (одно на каждое описание полей, общее для всех экземпляров BitFields)
+# fields_info - описание полей, по которому выполнена компиляция;
+# indexes - словарь имя поля: индекс поля;
+# masks, shifts - битовые маски и сдвиги полей, по индексу поля;
+# widths - ширина полей в битах, по индексу поля
+compiled_fields = namedtuple("compiled_fields", "fields_info indexes masks shifts widths")
+
+# кэш скомпилированных описаний. ключ - id(fields_info)
+_compiled_cache = dict()
+
+
+def compile_fields(fields_info: tuple[bit_field_info, ...]) -> compiled_fields:
+    """Вычисляет маски, сдвиги, ширину и индексы битовых полей один раз для каждого описания полей.
+    Описания полей хранятся в классах устройств, поэтому результат общий для всех экземпляров одного класса."""
+    key = id(fields_info)
+    cf = _compiled_cache.get(key)
+    if cf is not None and cf.fields_info is fields_info:
+        return cf
+    indexes = dict()
+    for index, item in enumerate(fields_info):
+        indexes[item.name] = index
+    cf = compiled_fields(fields_info=fields_info, indexes=indexes,
+                         masks=tuple(_bitmask(item.position) for item in fields_info),
+                         shifts=tuple(item.position.start for item in fields_info),
+                         widths=tuple(len(item.position) for item in fields_info))
+    _compiled_cache[key] = cf
+    return cf
+
+
 class BitFields:
     """Хранилище информации о битовых полях с доступом по индексу.
     _source - кортеж именованных кортежей, описывающих битовые поля;"""
@@ -35,6 +64,12 @@ class BitFields:
     def __init__(self, fields_info: tuple[bit_field_info, ...]):
         BitFields._check(fields_info)
         self._fields_info = fields_info
+        # маски, сдвиги и индексы полей. вычисляются один раз для каждого описания полей
+        _cf = compile_fields(fields_info)
+        self._indexes = _cf.indexes
+        self._masks = _cf.masks
+        self._shifts = _cf.shifts
+        self._widths = _cf.widths
         self._idx = 0
         # имя битового поля, которое будет параметром у методов get_value/set_value
         self._active_field_name = fields_info[0].name
@@ -43,10 +78,18 @@ class BitFields:
 
     def _by_name(self, name: str) -> [bit_field_info, None]:
         """возвращает информацию о битовом поле по его имени (поле name именованного кортежа) или None"""
-        items = self._fields_info
-        for item in items:
-            if name == item.name:
-                return item
+        index = self._indexes.get(name)
+        if index is None:
+            return None
+        return self._fields_info[index]
+
+    def _get_index(self, key: [str, int, None]) -> [int, None]:
+        """возвращает индекс битового поля по его имени/индексу или None. Для внутреннего использования"""
+        if key is None:
+            key = self._active_field_name
+        if isinstance(key, str):
+            return self._indexes.get(key)
+        return key
 
     def _get_field(self, key: [str, int, None]) -> [bit_field_info, None]:
         """для внутреннего использования"""
@@ -60,17 +103,18 @@ class BitFields:
             _itm = self._by_name(key)
         return _itm
 
-    def get_field_value(self, field_name: str = None, validate: bool = False) -> [int, bool]:
-        """возвращает значение битового поля, по его имени(self.field_name), из self.source."""
-        item = self._get_field(field_name)
-        if item is None:
+    def get_field_value(self, field_name: str = None, validate: bool = False, source: [int, None] = None) -> [int, bool]:
+        """возвращает значение битового поля, по его имени(self.field_name), из self.source.
+        Если source is not None, то значение поля извлекается из source."""
+        index = self._get_index(field_name)
+        if index is None:
             raise ValueError(f"get_field_value. Поле с именем {field_name} не существует!")
-        pos = item.position
-        bitmask = _bitmask(pos)
-        val = (self.source & bitmask) >> pos.start  # выделение маской битового диапазона и его сдвиг вправо
-        if item.valid_values and validate:
+        src = self._source_val if source is None else source
+        # выделение маской битового диапазона и его сдвиг вправо
+        val = (src & self._masks[index]) >> self._shifts[index]
+        if validate and self._fields_info[index].valid_values:
             raise NotImplemented("Если вы решили проверить значение поля при его возвращении, то делайте это самостоятельно!!!")
-        if 1 == len(pos):
+        if 1 == self._widths[index]:
             return 0 != val     # bool
         return val              # int
 
@@ -80,22 +124,23 @@ class BitFields:
         Возвращает значение с измененным битовым полем.
         Если field is None, то имя поля берется из свойства self._active_field_name.
         Если source is None, то значение поля, подлежащее изменению, изменяется в свойстве self._source_val"""
-        item = self._get_field(key=field)     #   *
-        rng = item.valid_values
-        if rng and validate:
-            check_value(value, rng, get_error_str(self.field_name, value, rng))
-        pos = item.position
-        bitmask = _bitmask(pos)
+        index = self._get_index(field)
+        if index is None:
+            raise ValueError(f"set_field_value. Поле с именем {field} не существует!")
+        rng = self._fields_info[index].valid_values
+        if rng and validate and value not in rng:
+            # строка сообщения об ошибке создается только в случае ошибки
+            raise ValueError(get_error_str(self._fields_info[index].name, value, rng))
+        bitmask = self._masks[index]
         src = self._get_source(source) & ~bitmask  # чистка битового диапазона
-        src |= (value << pos.start) & bitmask  # установка битов в заданном диапазоне
+        src |= (value << self._shifts[index]) & bitmask  # установка битов в заданном диапазоне
         if source is None:
             self._source_val = src
         return src
 
     def __getitem__(self, key: [int, str]) -> [int, bool]:
         """возвращает значение битового поля из значения в self.source по его имени/индексу"""
-        _bfi = self._get_field(key)
-        return self.get_field_value(_bfi.name)
+        return self.get_field_value(key)
 
     def __setitem__(self, field_name: str, value: [int, bool]):
         """Волшебный метод, вызывает set_field_value.
@@ -103,7 +148,7 @@ class BitFields:
         self.set_field_value(value=value, source=None, field=field_name, validate=True)     #   *
 
     def _get_source(self, source: [int, None]) -> int:
-        return source if source else self._source_val
+        return self._source_val if source is None else source
 
     @property
     def source(self) -> int:
@@ -142,3 +187,84 @@ class BitFields:
         except IndexError:
             self._idx = 0   # для возможности выполнения повторной итерации!
             raise StopIteration
+
+
+class BitFieldsTransaction:
+    """Транзакция изменения нескольких битовых полей одного значения (регистра).
+    Изменения накапливаются, проверяются все вместе и передаются в функцию фиксации commit_func один раз.
+    commit_func(value: int) -> bool - записывает новое значение, возвращает Истина, если была запись в устройство.
+    Пример:
+        with sensor.config_transaction() as tr:
+            tr['BADC'] = 3
+            tr['PGA'] = 1
+    При выходе из блока with без исключения изменения фиксируются, при исключении - отбрасываются."""
+
+    def __init__(self, fields: BitFields, source: int, commit_func):
+        self._fields = fields
+        # значение, к которому применяются изменения
+        self._source = source
+        # накопленные изменения. имя поля: значение
+        self._staged = dict()
+        self._commit_func = commit_func
+
+    def __setitem__(self, field_name: str, value: [int, bool]):
+        self._staged[field_name] = value
+
+    def __getitem__(self, field_name: str) -> [int, bool]:
+        """Возвращает значение поля с учетом накопленных изменений"""
+        return self._fields.get_field_value(field_name, source=self.value)
+
+    def __len__(self) -> int:
+        """Возвращает количество накопленных изменений"""
+        return len(self._staged)
+
+    def validate(self):
+        """Проверяет все накопленные изменения вместе. Выбрасывает одно исключение ValueError со всеми ошибками."""
+        fields = self._fields
+        errors = None
+        for name, value in self._staged.items():
+            index = fields._get_index(name)
+            if index is None:
+                err = f"Поле с именем {name} не существует!"
+            else:
+                rng = fields._fields_info[index].valid_values
+                if not rng or value in rng:
+                    continue
+                err = get_error_str(name, value, rng)
+            if errors is None:
+                errors = []
+            errors.append(err)
+        if errors:
+            raise ValueError(" ".join(errors))
+
+    @property
+    def value(self) -> int:
+        """Возвращает значение с примененными изменениями. Без проверки!"""
+        fields = self._fields
+        src = self._source
+        for name, value in self._staged.items():
+            src = fields.set_field_value(value=value, source=src, field=name, validate=False)
+        return src
+
+    def commit(self) -> bool:
+        """Проверяет изменения и передает новое значение в функцию фиксации.
+        Возвращает Истина, если была запись в устройство."""
+        self.validate()
+        new_val = self.value
+        self._staged.clear()
+        self._source = new_val
+        return self._commit_func(new_val)
+
+    def discard(self):
+        """Отбрасывает накопленные изменения"""
+        self._staged.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+        return False
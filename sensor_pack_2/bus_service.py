@@ -4,7 +4,12 @@
 """MicroPython модуль для работы с шинами ввода/вывода"""
 
 import math
-from machine import I2C, SPI, Pin
+
+try:
+    from machine import I2C, SPI, Pin
+except ImportError:
+    # CPython (проверки и тесты на ПК). Классы используются только в аннотациях типов
+    I2C = SPI = Pin = object
 
 
 def mpy_bl(value: int) -> int:
@@ -38,6 +43,14 @@ class BusAdapter:
         byte_order - порядок расположения байт в записываемом значении."""
         raise NotImplementedError
 
+    def write_register_int(self, device_addr: [int, Pin], reg_addr: int, value: int, bytes_count: int,
+                           big_byte_order: bool):
+        """записывает целое число value в датчик, по адресу reg_addr.
+        bytes_count - кол-во записываемых байт из value.
+        big_byte_order - если Истина, то порядок байт 'big', иначе 'little'.
+        Может быть переопределен в классах-наследниках для записи без выделения памяти."""
+        return self.write_register(device_addr, reg_addr, value, bytes_count, 'big' if big_byte_order else 'little')
+
     def read(self, device_addr: [int, Pin], n_bytes: int) -> bytes:
         """Читает из устройства на шине с адресом device_addr, n_bytes байт.
         Возвращает экземпляр класса типа bytes"""
@@ -87,11 +100,71 @@ class BusAdapter:
     def write_buf_to_memory(self, device_addr: [int, Pin], mem_addr, buf):
         raise NotImplementedError
 
+    def track_reg_pointer(self, device_addr: [int, Pin], enable: bool = True) -> bool:
+        """Включает (enable в Истина) или выключает отслеживание указателя регистра устройства с адресом device_addr.
+        Применимо только к устройствам, которые запоминают (защелкивают) последний адрес регистра, например INA219/INA226!
+        Возвращает Истина, если адаптер поддерживает отслеживание указателя регистра.
+        Для переопределения в классах-наследниках."""
+        return False
+
+    def invalidate_reg_pointer(self, device_addr: [int, Pin, None] = None):
+        """Делает неизвестным текущий указатель регистра устройства с адресом device_addr.
+        Если device_addr is None, то для всех устройств. Для переопределения в классах-наследниках."""
+        pass
+
+
+# значение указателя регистра, которое не совпадает ни с одним адресом регистра
+_REG_PTR_UNKNOWN = -1
+
 
 class I2cAdapter(BusAdapter):
     """Адаптер шины I2C"""
     def __init__(self, bus: I2C):
         super().__init__(bus)
+        # текущие указатели регистров устройств, для которых включено отслеживание. адрес устройства: адрес регистра.
+        # Если указатель уже установлен на нужный регистр, то чтение производится без записи указателя на шину!
+        self._reg_ptr = dict()
+        # заранее выделенные буферы для записи целых чисел размером 1..4 байта в регистры, индекс - размер в байтах
+        self._wr_bufs = None, bytearray(1), bytearray(2), bytearray(3), bytearray(4)
+
+    def track_reg_pointer(self, device_addr: int, enable: bool = True) -> bool:
+        """Включает (enable в Истина) или выключает отслеживание указателя регистра устройства с адресом device_addr.
+        Применимо только к устройствам, которые запоминают (защелкивают) последний адрес регистра, например INA219/INA226!"""
+        ptr = self._reg_ptr
+        if enable:
+            ptr[device_addr] = _REG_PTR_UNKNOWN
+        elif device_addr in ptr:
+            del ptr[device_addr]
+        return True
+
+    def invalidate_reg_pointer(self, device_addr: [int, None] = None):
+        """Делает неизвестным текущий указатель регистра устройства с адресом device_addr.
+        Если device_addr is None, то для всех устройств."""
+        ptr = self._reg_ptr
+        if device_addr is None:
+            for key in ptr:
+                ptr[key] = _REG_PTR_UNKNOWN
+            return
+        if device_addr in ptr:
+            ptr[device_addr] = _REG_PTR_UNKNOWN
+
+    def _is_reg_pointer(self, device_addr: int, reg_addr: int) -> bool:
+        """Возвращает Истина, если указатель регистра устройства уже установлен на reg_addr.
+        Иначе, для отслеживаемых устройств, указатель помечается неизвестным до завершения обмена по шине
+        (на случай исключения во время обмена)."""
+        ptr = self._reg_ptr
+        if device_addr not in ptr:
+            return False
+        if reg_addr == ptr[device_addr]:
+            return True
+        ptr[device_addr] = _REG_PTR_UNKNOWN
+        return False
+
+    def _set_reg_pointer(self, device_addr: int, reg_addr: int):
+        """Запоминает указатель регистра устройства после успешного обмена по шине"""
+        ptr = self._reg_ptr
+        if device_addr in ptr:
+            ptr[device_addr] = reg_addr
 
     def write_register(self, device_addr: int, reg_addr: int, value: [int, bytes, bytearray],
                        bytes_count: int, byte_order: str):
@@ -104,12 +177,44 @@ class I2cAdapter(BusAdapter):
         if isinstance(value, (bytes, bytearray)):
             buf = value
 
-        return self.bus.writeto_mem(device_addr, reg_addr, buf)
+        self._is_reg_pointer(device_addr, reg_addr)
+        result = self.bus.writeto_mem(device_addr, reg_addr, buf)
+        # запись в регистр устанавливает указатель на этот регистр
+        self._set_reg_pointer(device_addr, reg_addr)
+        return result
+
+    def write_register_int(self, device_addr: int, reg_addr: int, value: int, bytes_count: int,
+                           big_byte_order: bool):
+        """записывает целое число value в датчик, по адресу reg_addr, без выделения памяти.
+        Значение упаковывается в заранее выделенный буфер адаптера.
+        bytes_count - кол-во записываемых байт из value, 1..4.
+        big_byte_order - если Истина, то порядок байт 'big', иначе 'little'."""
+        if bytes_count > 4:
+            return self.write_register(device_addr, reg_addr, value, bytes_count,
+                                       'big' if big_byte_order else 'little')
+        buf = self._wr_bufs[bytes_count]
+        if big_byte_order:
+            for i in range(bytes_count - 1, -1, -1):
+                buf[i] = value & 0xFF
+                value >>= 8
+        else:
+            for i in range(bytes_count):
+                buf[i] = value & 0xFF
+                value >>= 8
+        self._is_reg_pointer(device_addr, reg_addr)
+        result = self.bus.writeto_mem(device_addr, reg_addr, buf)
+        self._set_reg_pointer(device_addr, reg_addr)
+        return result
 
     def read_register(self, device_addr: int, reg_addr: int, bytes_count: int) -> bytes:
         """считывает из регистра датчика значение.
         bytes_count - размер значения в байтах"""
-        return self.bus.readfrom_mem(device_addr, reg_addr, bytes_count)
+        if self._is_reg_pointer(device_addr, reg_addr):
+            # указатель уже установлен, запись указателя на шину не нужна
+            return self.bus.readfrom(device_addr, bytes_count)
+        result = self.bus.readfrom_mem(device_addr, reg_addr, bytes_count)
+        self._set_reg_pointer(device_addr, reg_addr)
+        return result
 
     def read(self, device_addr: int, n_bytes: int) -> bytes:
         return self.bus.readfrom(device_addr, n_bytes)
@@ -120,6 +225,8 @@ class I2cAdapter(BusAdapter):
         return buf
     
     def write(self, device_addr: int, buf: bytes):
+        # содержимое buf неизвестно, указатель регистра мог измениться
+        self.invalidate_reg_pointer(device_addr)
         return self.bus.writeto(device_addr, buf)
 
     def read_buf_from_memory(self, device_addr: int, mem_addr, buf, address_size: int = 1):
@@ -128,14 +235,22 @@ class I2cAdapter(BusAdapter):
         address_size - определяет размер адреса в байтах. (в ESP8266 этот аргумент не распознается и размер адреса
         всегда равен 1 (8 бит)).
         Расширение возможностей базового класса."""
+        if self._is_reg_pointer(device_addr, mem_addr):
+            # указатель уже установлен, запись указателя на шину не нужна
+            self.bus.readfrom_into(device_addr, buf)
+            return buf
         self.bus.readfrom_mem_into(device_addr, mem_addr, buf)
+        self._set_reg_pointer(device_addr, mem_addr)
         return buf
 
     def write_buf_to_memory(self, device_addr: int, mem_addr, buf):
         """Записывает в устройство с адресом device_addr все байты из буфера buf.
         Запись начинается с адреса в устройстве: mem_addr.
         Расширение возможностей базового класса."""
-        return self.bus.writeto_mem(device_addr, mem_addr, buf)
+        self._is_reg_pointer(device_addr, mem_addr)
+        result = self.bus.writeto_mem(device_addr, mem_addr, buf)
+        self._set_reg_pointer(device_addr, mem_addr)
+        return result
 
 
 class SpiAdapter(BusAdapter):
@@ -0,0 +1,217 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Запись обмена с устройствами через адаптер шины в компактный двоичный файл и его воспроизведение без оборудования.
+Формат файла: заголовок _MAGIC, затем записи. Запись: заголовок _REC_FMT (операция, адрес устройства,
+адрес регистра, время от предыдущей записи в мкс, длина данных) и данные: прочитанные или записанные байты.
+Пример записи:
+    with open('ina.trc', 'wb') as f:
+        adapter = RecordingAdapter(I2cAdapter(i2c), f)
+        ina = INA226(adapter)
+        ...
+Пример воспроизведения:
+    with open('ina.trc', 'rb') as f:
+        adapter = ReplayAdapter(f.read())
+    ina = INA226(adapter)
+    ..."""
+import struct
+from collections import namedtuple
+from sensor_pack_2.bus_service import BusAdapter
+from sensor_pack_2.timeutil import ticks_us, ticks_diff
+
+_MAGIC = b'BTR1'
+# операция (B), адрес устройства (B), адрес регистра (B), время от предыдущей записи, мкс (I), длина данных (H)
+_REC_FMT = '<BBBIH'
+_REC_SIZE = struct.calcsize(_REC_FMT)
+
+# операции
+OP_READ_REG = 1     # read_register
+OP_WRITE_REG = 2    # write_register, write_register_int
+OP_READ_MEM = 3     # read_buf_from_memory
+OP_WRITE_MEM = 4    # write_buf_to_memory
+OP_READ = 5         # read
+OP_READ_BUF = 6     # read_to_buf
+OP_WRITE = 7        # write
+
+# запись файла обмена
+# op - операция; device - адрес устройства; reg - адрес регистра; dt_us - время от предыдущей записи, мкс;
+# payload - данные (memoryview)
+trace_record = namedtuple("trace_record", "op device reg dt_us payload")
+
+
+def iter_trace(data):
+    """Генератор записей (trace_record) из содержимого файла обмена data (bytes, bytearray)"""
+    mv = memoryview(data)
+    if bytes(mv[:len(_MAGIC)]) != _MAGIC:
+        raise ValueError("Неверный формат файла обмена!")
+    pos, end = len(_MAGIC), len(mv)
+    while pos < end:
+        op, dev, reg, dt, n = struct.unpack_from(_REC_FMT, mv, pos)
+        pos += _REC_SIZE
+        yield trace_record(op=op, device=dev, reg=reg, dt_us=dt, payload=mv[pos:pos + n])
+        pos += n
+
+
+class RecordingAdapter(BusAdapter):
+    """Адаптер-посредник: передает все вызовы адаптеру adapter и записывает каждую операцию обмена
+    в поток out (любой объект с методом write, например файл, открытый в режиме 'wb').
+    Заголовок записи упаковывается в заранее выделенный буфер."""
+
+    def __init__(self, adapter: BusAdapter, out):
+        super().__init__(adapter.bus)
+        self._adapter = adapter
+        self._out = out
+        self._hdr = bytearray(_REC_SIZE)
+        self._last = ticks_us()
+        # количество записей
+        self.records = 0
+        out.write(_MAGIC)
+
+    def _log(self, op: int, device_addr: int, reg_addr: int, payload):
+        now = ticks_us()
+        dt = ticks_diff(now, self._last)
+        self._last = now
+        struct.pack_into(_REC_FMT, self._hdr, 0, op, device_addr & 0xFF, reg_addr & 0xFF, dt if dt > 0 else 0,
+                         len(payload))
+        out = self._out
+        out.write(self._hdr)
+        out.write(payload)
+        self.records += 1
+
+    def flush(self):
+        """Сбрасывает буфер потока записи, если он есть"""
+        if hasattr(self._out, 'flush'):
+            self._out.flush()
+
+    def read_register(self, device_addr: int, reg_addr: int, bytes_count: int) -> bytes:
+        result = self._adapter.read_register(device_addr, reg_addr, bytes_count)
+        self._log(OP_READ_REG, device_addr, reg_addr, result)
+        return result
+
+    def write_register(self, device_addr: int, reg_addr: int, value: [int, bytes, bytearray],
+                       bytes_count: int, byte_order: str):
+        result = self._adapter.write_register(device_addr, reg_addr, value, bytes_count, byte_order)
+        payload = value.to_bytes(bytes_count, byte_order) if isinstance(value, int) else value
+        self._log(OP_WRITE_REG, device_addr, reg_addr, payload)
+        return result
+
+    def write_register_int(self, device_addr: int, reg_addr: int, value: int, bytes_count: int,
+                           big_byte_order: bool):
+        result = self._adapter.write_register_int(device_addr, reg_addr, value, bytes_count, big_byte_order)
+        self._log(OP_WRITE_REG, device_addr, reg_addr, value.to_bytes(bytes_count, 'big' if big_byte_order else 'little'))
+        return result
+
+    def read(self, device_addr: int, n_bytes: int) -> bytes:
+        result = self._adapter.read(device_addr, n_bytes)
+        self._log(OP_READ, device_addr, 0, result)
+        return result
+
+    def read_to_buf(self, device_addr: int, buf: bytearray) -> bytes:
+        result = self._adapter.read_to_buf(device_addr, buf)
+        self._log(OP_READ_BUF, device_addr, 0, buf)
+        return result
+
+    def write(self, device_addr: int, buf: bytes):
+        result = self._adapter.write(device_addr, buf)
+        self._log(OP_WRITE, device_addr, 0, buf)
+        return result
+
+    def read_buf_from_memory(self, device_addr: int, mem_addr, buf, address_size: int = 1):
+        result = self._adapter.read_buf_from_memory(device_addr, mem_addr, buf, address_size)
+        self._log(OP_READ_MEM, device_addr, mem_addr, buf)
+        return result
+
+    def write_buf_to_memory(self, device_addr: int, mem_addr, buf):
+        result = self._adapter.write_buf_to_memory(device_addr, mem_addr, buf)
+        self._log(OP_WRITE_MEM, device_addr, mem_addr, buf)
+        return result
+
+    def track_reg_pointer(self, device_addr: int, enable: bool = True) -> bool:
+        return self._adapter.track_reg_pointer(device_addr, enable)
+
+    def invalidate_reg_pointer(self, device_addr: [int, None] = None):
+        self._adapter.invalidate_reg_pointer(device_addr)
+
+
+class ReplayAdapter(BusAdapter):
+    """Адаптер, воспроизводящий файл обмена, записанный RecordingAdapter, с максимальной скоростью (без пауз).
+    Операции чтения возвращают записанные данные, операции записи только проверяются.
+    Если strict в Истина, то каждая операция драйвера сверяется с записью (операция, адрес устройства,
+    адрес регистра, длина, записываемые данные). При расхождении выбрасывается ValueError."""
+
+    def __init__(self, data, strict: bool = True):
+        """data - содержимое файла обмена (bytes, bytearray)"""
+        super().__init__(None)
+        mv = memoryview(data)
+        if bytes(mv[:len(_MAGIC)]) != _MAGIC:
+            raise ValueError("Неверный формат файла обмена!")
+        self._data = mv
+        self._strict = strict
+        self.rewind()
+
+    def rewind(self):
+        """Воспроизведение с начала"""
+        self._pos = len(_MAGIC)
+        # количество воспроизведенных записей
+        self.replayed = 0
+        # суммарное записанное время между операциями, мкс
+        self.trace_time_us = 0
+
+    def remaining(self) -> int:
+        """Возвращает количество байт файла обмена, которые еще не воспроизведены"""
+        return len(self._data) - self._pos
+
+    def _next(self, op: int, device_addr: int, reg_addr: int, n: int):
+        """Возвращает данные следующей записи (memoryview)"""
+        data, pos = self._data, self._pos
+        if pos >= len(data):
+            raise EOFError("Файл обмена закончился!")
+        r_op, r_dev, r_reg, dt, r_n = struct.unpack_from(_REC_FMT, data, pos)
+        pos += _REC_SIZE
+        if self._strict and (r_op != op or r_dev != device_addr & 0xFF or r_reg != reg_addr & 0xFF
+                             or (n >= 0 and r_n != n)):
+            raise ValueError(f"Расхождение с файлом обмена в позиции {self._pos}: ожидалась операция {r_op} "
+                             f"устройство 0x{r_dev:x} регистр 0x{r_reg:x} длина {r_n}; получена операция {op} "
+                             f"устройство 0x{device_addr & 0xFF:x} регистр 0x{reg_addr & 0xFF:x} длина {n}")
+        self._pos = pos + r_n
+        self.replayed += 1
+        self.trace_time_us += dt
+        return data[pos:pos + r_n]
+
+    def _check_write(self, op: int, device_addr: int, reg_addr: int, payload):
+        recorded = self._next(op, device_addr, reg_addr, len(payload))
+        if not self._strict:
+            return
+        # побайтное сравнение: сравнение memoryview оператором != в MicroPython ненадежно
+        for i in range(len(recorded)):
+            if recorded[i] != payload[i]:
+                raise ValueError(f"Записываемые данные не совпадают с файлом обмена! регистр 0x{reg_addr & 0xFF:x}")
+
+    def read_register(self, device_addr: int, reg_addr: int, bytes_count: int) -> bytes:
+        return bytes(self._next(OP_READ_REG, device_addr, reg_addr, bytes_count))
+
+    def write_register(self, device_addr: int, reg_addr: int, value: [int, bytes, bytearray],
+                       bytes_count: int, byte_order: str):
+        payload = value.to_bytes(bytes_count, byte_order) if isinstance(value, int) else value
+        self._check_write(OP_WRITE_REG, device_addr, reg_addr, payload)
+
+    def write_register_int(self, device_addr: int, reg_addr: int, value: int, bytes_count: int,
+                           big_byte_order: bool):
+        self.write_register(device_addr, reg_addr, value, bytes_count, 'big' if big_byte_order else 'little')
+
+    def read(self, device_addr: int, n_bytes: int) -> bytes:
+        return bytes(self._next(OP_READ, device_addr, 0, n_bytes))
+
+    def read_to_buf(self, device_addr: int, buf: bytearray) -> bytes:
+        buf[:] = self._next(OP_READ_BUF, device_addr, 0, len(buf))
+        return buf
+
+    def write(self, device_addr: int, buf: bytes):
+        self._check_write(OP_WRITE, device_addr, 0, buf)
+
+    def read_buf_from_memory(self, device_addr: int, mem_addr, buf, address_size: int = 1):
+        buf[:] = self._next(OP_READ_MEM, device_addr, mem_addr, len(buf))
+        return buf
+
+    def write_buf_to_memory(self, device_addr: int, mem_addr, buf):
+        self._check_write(OP_WRITE_MEM, device_addr, mem_addr, buf)
@@ -0,0 +1,249 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Цифровые фильтры и прореживание (децимация) потока целых 'сырых' кодов АЦП.
+Все вычисления целочисленные. Выход каждого фильтра - целое число, равное отфильтрованному коду, умноженному на
+коэффициент усиления gain (дробные разряды не теряются). Для перевода в физические величины
+разделите цену младшего разряда АЦП на gain цепочки фильтров.
+
+Integer boxcar, CIC decimator and single pole IIR filters for raw ADC codes."""
+from array import array
+from sensor_pack_2.timeutil import ticks_us, ticks_diff
+
+
+def _noise_averaging(impulse_response) -> float:
+    """Возвращает шумовой эквивалент количества усредняемых отсчетов для фильтра с импульсной
+    характеристикой impulse_response: (сумма h) ** 2 / (сумма h ** 2). Для скользящего среднего из L отсчетов равен L"""
+    s1 = s2 = 0
+    for h in impulse_response:
+        s1 += h
+        s2 += h * h
+    return s1 * s1 / s2
+
+
+class Filter:
+    """Базовый класс фильтра.
+    process(x) принимает входной код и возвращает выходное значение или None, если из-за прореживания выходного
+    значения для этого входного нет."""
+
+    # коэффициент усиления: выход = отфильтрованный код * gain
+    gain = 1
+    # коэффициент прореживания: одно выходное значение на decimation входных
+    decimation = 1
+    # шумовой эквивалент количества усредняемых отсчетов (уменьшение дисперсии шума)
+    averaging = 1
+
+    def reset(self):
+        """Возвращает фильтр в исходное состояние"""
+        raise NotImplementedError
+
+    def process(self, x: int) -> [int, None]:
+        raise NotImplementedError
+
+    def process_block(self, src, dst, count: [int, None] = None) -> int:
+        """Фильтрует count (все при None) значений src и записывает выходные значения в dst (например, array('l')).
+        Возвращает количество записанных в dst значений."""
+        n = len(src) if count is None else count
+        process = self.process
+        k = 0
+        for i in range(n):
+            y = process(src[i])
+            if y is not None:
+                dst[k] = y
+                k += 1
+        return k
+
+
+class Boxcar(Filter):
+    """Скользящее среднее (boxcar) по length отсчетам с прореживанием decimation.
+    Сумма последних length кодов обновляется за одно сложение и одно вычитание. gain = length.
+    При decimation == length - усреднение неперекрывающимися блоками."""
+
+    def __init__(self, length: int, decimation: int = 1):
+        if length < 1 or decimation < 1:
+            raise ValueError(f"Неверный параметр фильтра! length: {length}; decimation: {decimation}")
+        self._hist = array('l', (0 for _ in range(length)))
+        self.gain = self.averaging = length
+        self.decimation = decimation
+        self.reset()
+
+    def reset(self):
+        hist = self._hist
+        for i in range(len(hist)):
+            hist[i] = 0
+        self._sum = self._pos = self._filled = self._phase = 0
+
+    def process(self, x: int) -> [int, None]:
+        hist, pos = self._hist, self._pos
+        self._sum += x - hist[pos]
+        hist[pos] = x
+        pos += 1
+        if pos == len(hist):
+            pos = 0
+        self._pos = pos
+        if self._filled < len(hist):
+            # окно еще не заполнено
+            self._filled += 1
+            if self._filled < len(hist):
+                return None
+        self._phase += 1
+        if self._phase < self.decimation:
+            return None
+        self._phase = 0
+        return self._sum
+
+
+class CIC(Filter):
+    """Прореживающий CIC фильтр (каскад интеграторов и гребенчатых фильтров) порядка order,
+    коэффициент прореживания decimation (R), задержка гребенчатого звена delay (M).
+    Интеграторы работают на входной частоте, гребенчатые звенья - на выходной. Разрядность регистров
+    ограничена по модулю 2 ** bits (bits = input_bits + order * log2(R * M)), поэтому переполнение
+    интеграторов не влияет на результат. gain = (R * M) ** order."""
+
+    def __init__(self, decimation: int, order: int = 3, delay: int = 1, input_bits: int = 16):
+        if decimation < 1 or order < 1 or delay < 1:
+            raise ValueError(f"Неверный параметр фильтра! decimation: {decimation}; order: {order}; delay: {delay}")
+        self.decimation = decimation
+        self._order = order
+        self._delay = delay
+        rm = decimation * delay
+        self.gain = rm ** order
+        bits = input_bits + 1
+        while (1 << (bits - input_bits - 1)) < self.gain:
+            bits += 1
+        self._mask = (1 << bits) - 1
+        self._sign = 1 << (bits - 1)
+        # списки, а не array: разрядность регистров может превышать 32 бита
+        self._integ = [0] * order
+        # линии задержки гребенчатых звеньев: order * delay значений
+        self._comb = [0] * (order * delay)
+        # импульсная характеристика: свертка order прямоугольных окон длиной R * M
+        h = [1]
+        for _ in range(order):
+            nh = [0] * (len(h) + rm - 1)
+            for i, v in enumerate(h):
+                for j in range(rm):
+                    nh[i + j] += v
+            h = nh
+        self.averaging = _noise_averaging(h)
+        self.reset()
+
+    def reset(self):
+        for arr in (self._integ, self._comb):
+            for i in range(len(arr)):
+                arr[i] = 0
+        self._phase = self._comb_pos = 0
+
+    def _wrap(self, v: int) -> int:
+        """Значение по модулю 2 ** bits, со знаком"""
+        v &= self._mask
+        return v - (self._sign << 1) if v & self._sign else v
+
+    def process(self, x: int) -> [int, None]:
+        integ, wrap = self._integ, self._wrap
+        acc = x
+        for i in range(self._order):
+            acc = wrap(integ[i] + acc)
+            integ[i] = acc
+        self._phase += 1
+        if self._phase < self.decimation:
+            return None
+        self._phase = 0
+        comb, delay, pos = self._comb, self._delay, self._comb_pos
+        for i in range(self._order):
+            k = i * delay + pos
+            prev = comb[k]
+            comb[k] = acc
+            acc = wrap(acc - prev)
+        pos += 1
+        self._comb_pos = 0 if pos == delay else pos
+        return acc
+
+
+class IIR(Filter):
+    """Однополюсный БИХ фильтр (экспоненциальное сглаживание) с коэффициентом 2 ** -shift:
+    y += (x - y) / 2 ** shift. Состояние хранится с shift дробными разрядами, gain = 2 ** shift.
+    Постоянная времени примерно 2 ** shift отсчетов."""
+
+    def __init__(self, shift: int, decimation: int = 1):
+        if shift < 0 or decimation < 1:
+            raise ValueError(f"Неверный параметр фильтра! shift: {shift}; decimation: {decimation}")
+        self._shift = shift
+        self.gain = 1 << shift
+        self.decimation = decimation
+        # дисперсия шума уменьшается в (2 - a) / a раз, a = 2 ** -shift
+        self.averaging = (1 << (shift + 1)) - 1
+        self.reset()
+
+    def reset(self):
+        self._state = None
+        self._phase = 0
+
+    def process(self, x: int) -> [int, None]:
+        s = self._state
+        if s is None:
+            # начальное состояние равно первому отсчету, без длительного переходного процесса
+            s = x << self._shift
+        else:
+            s += x - (s >> self._shift)
+        self._state = s
+        self._phase += 1
+        if self._phase < self.decimation:
+            return None
+        self._phase = 0
+        return s
+
+
+class FilterChain(Filter):
+    """Последовательное соединение фильтров. Выход предыдущего фильтра - вход следующего.
+    Пример:
+        chain = FilterChain(CIC(16, 3), Boxcar(8, 8))
+        for code in codes:
+            y = chain.process(code)
+            if y is not None:
+                volts = y * shunt_lsb / chain.gain"""
+
+    def __init__(self, *stages):
+        if not stages:
+            raise ValueError("Пустая цепочка фильтров!")
+        self._stages = stages
+        gain = decimation = 1
+        averaging = 1.0
+        for st in stages:
+            gain *= st.gain
+            # оценка: шум на входе следующего фильтра считается некоррелированным
+            averaging *= st.averaging
+            decimation *= st.decimation
+        self.gain = gain
+        self.decimation = decimation
+        self.averaging = averaging
+
+    def reset(self):
+        for st in self._stages:
+            st.reset()
+
+    def process(self, x: int) -> [int, None]:
+        y = x
+        for st in self._stages:
+            y = st.process(y)
+            if y is None:
+                return None
+        return y
+
+    def effective_averaging(self, chip_averaging: int = 1) -> float:
+        """Возвращает шумовой эквивалент количества усредняемых преобразований АЦП с учетом усреднения
+        внутри датчика (chip_averaging, смотри get_averaging_count у INA219/INA226)"""
+        return chip_averaging * self.averaging
+
+
+def throughput(filt: Filter, count: int = 2000) -> float:
+    """Возвращает количество входных отсчетов в секунду, которое обрабатывает фильтр (цепочка фильтров) filt
+    на этом устройстве. Состояние фильтра сбрасывается."""
+    filt.reset()
+    process = filt.process
+    start = ticks_us()
+    for i in range(count):
+        process(i & 0xFFF)
+    elapsed = ticks_diff(ticks_us(), start)
+    filt.reset()
+    return 1000_000 * count / elapsed if elapsed > 0 else 0.0
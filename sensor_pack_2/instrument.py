@@ -0,0 +1,243 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Инструментирование горячих путей датчика: счетчики обращений к регистрам, байты и гистограммы длительности
+в заранее выделенных массивах array('I').
+При включении (enable) методы доступа к шине экземпляра DeviceEx (read_reg, write_reg, read_buf_from_mem,
+read_reg_16, write_reg_int, write_reg_16) и выбранные методы датчика подменяются в экземпляре обертками.
+При выключении (disable) обертки удаляются, поэтому выключенное инструментирование ничего не стоит.
+Пример:
+    ins = Instrument(ina226, methods=public_methods(ina226))
+    ins.enable()
+    snap = ins.make_snapshot()
+    while True:
+        ...
+        ins.snapshot(snap)      # без выделения памяти
+        ins.reset()"""
+from array import array
+from collections import namedtuple
+from sensor_pack_2.timeutil import ticks_us, ticks_diff
+
+# методы DeviceEx, которые подменяются для подсчета обращений к регистрам
+_REG_METHODS = ('read_reg', 'write_reg', 'read_buf_from_mem', 'read_reg_16', 'write_reg_int', 'write_reg_16')
+
+# статистика регистра
+# reads, writes - количество операций чтения/записи; read_bytes, write_bytes - количество байт;
+# histogram - количество операций по интервалам длительности: индекс i - длительность от 2 ** (i - 1) до 2 ** i мкс
+register_stats = namedtuple("register_stats", "reads writes read_bytes write_bytes histogram")
+# статистика метода. calls - количество вызовов, histogram - как у register_stats
+method_stats = namedtuple("method_stats", "calls histogram")
+
+
+def public_methods(obj, exclude: tuple = _REG_METHODS) -> tuple:
+    """Возвращает имена открытых методов obj (без '_' в начале имени), кроме exclude"""
+    cls = type(obj)
+    return tuple(name for name in dir(cls)
+                 if not name.startswith('_') and name not in exclude and callable(getattr(cls, name)))
+
+
+def _bucket(us: int, last: int) -> int:
+    """Номер интервала гистограммы для длительности us: количество значащих бит, не более last"""
+    b = 0
+    while us > 0 and b < last:
+        us >>= 1
+        b += 1
+    return b
+
+
+def _copy(dst, src):
+    """Поэлементное копирование src в dst без выделения памяти"""
+    for i in range(len(src)):
+        dst[i] = src[i]
+
+
+class InstrumentSnapshot:
+    """Копия счетчиков Instrument. Создается методом Instrument.make_snapshot один раз,
+    затем заполняется методом Instrument.snapshot без выделения памяти."""
+
+    def __init__(self, reg_slots: int, method_count: int, buckets: int):
+        self.reg_map = bytearray(256)
+        self.reads = array('I', (0 for _ in range(reg_slots)))
+        self.writes = array('I', (0 for _ in range(reg_slots)))
+        self.read_bytes = array('I', (0 for _ in range(reg_slots)))
+        self.write_bytes = array('I', (0 for _ in range(reg_slots)))
+        self.reg_hist = array('I', (0 for _ in range(reg_slots * buckets)))
+        self.calls = array('I', (0 for _ in range(method_count)))
+        self.method_hist = array('I', (0 for _ in range(method_count * buckets)))
+
+
+class Instrument:
+    """Счетчики и гистограммы длительности обращений к регистрам и вызовов методов одного устройства.
+    Регистры получают номер ячейки (slot) при первом обращении, не более reg_slots регистров.
+    Обращения к остальным регистрам учитываются в последней ячейке."""
+
+    def __init__(self, device, methods: tuple = (), reg_slots: int = 16, buckets: int = 16):
+        """device - экземпляр DeviceEx (или наследника);
+        methods - имена методов device, вызовы которых учитываются (смотри public_methods);
+        reg_slots - количество учитываемых регистров;
+        buckets - количество интервалов гистограммы длительности."""
+        if reg_slots < 1 or reg_slots > 255 or buckets < 2:
+            raise ValueError(f"Неверный параметр! reg_slots: {reg_slots}; buckets: {buckets}")
+        self._device = device
+        self._methods = tuple(methods)
+        self._reg_slots = reg_slots
+        self._buckets = buckets
+        # адрес регистра -> номер ячейки + 1 (0 - ячейка не назначена)
+        self._reg_map = bytearray(256)
+        self._next_slot = 0
+        self._reads = array('I', (0 for _ in range(reg_slots)))
+        self._writes = array('I', (0 for _ in range(reg_slots)))
+        self._read_bytes = array('I', (0 for _ in range(reg_slots)))
+        self._write_bytes = array('I', (0 for _ in range(reg_slots)))
+        self._reg_hist = array('I', (0 for _ in range(reg_slots * buckets)))
+        self._calls = array('I', (0 for _ in range(len(self._methods))))
+        self._method_hist = array('I', (0 for _ in range(len(self._methods) * buckets)))
+        self._counters = (self._reads, self._writes, self._read_bytes, self._write_bytes, self._reg_hist,
+                          self._calls, self._method_hist)
+        self._enabled = False
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    # учет
+    def _slot(self, reg_addr: int) -> int:
+        reg_addr &= 0xFF
+        s = self._reg_map[reg_addr]
+        if s:
+            return s - 1
+        s = self._next_slot
+        if s < self._reg_slots - 1:
+            self._next_slot = s + 1
+        self._reg_map[reg_addr] = s + 1
+        return s
+
+    def _record_reg(self, reg_addr: int, n_bytes: int, write: bool, us: int):
+        s = self._slot(reg_addr)
+        if write:
+            self._writes[s] += 1
+            self._write_bytes[s] += n_bytes
+        else:
+            self._reads[s] += 1
+            self._read_bytes[s] += n_bytes
+        last = self._buckets - 1
+        self._reg_hist[s * self._buckets + _bucket(us, last)] += 1
+
+    def _record_call(self, index: int, us: int):
+        self._calls[index] += 1
+        last = self._buckets - 1
+        self._method_hist[index * self._buckets + _bucket(us, last)] += 1
+
+    # обертки
+    def _wrap_reg(self, name: str, orig):
+        rec = self._record_reg
+        if 'read_reg' == name:
+            def wrapper(reg_addr, bytes_count=2):
+                t = ticks_us()
+                result = orig(reg_addr, bytes_count)
+                rec(reg_addr, bytes_count, False, ticks_diff(ticks_us(), t))
+                return result
+        elif 'write_reg' == name or 'write_reg_int' == name:
+            def wrapper(reg_addr, value, bytes_count):
+                t = ticks_us()
+                result = orig(reg_addr, value, bytes_count)
+                rec(reg_addr, bytes_count, True, ticks_diff(ticks_us(), t))
+                return result
+        elif 'read_buf_from_mem' == name:
+            def wrapper(address, buf, address_size=1):
+                t = ticks_us()
+                result = orig(address, buf, address_size)
+                rec(address, len(buf), False, ticks_diff(ticks_us(), t))
+                return result
+        elif 'read_reg_16' == name:
+            def wrapper(reg_addr, signed=False):
+                t = ticks_us()
+                result = orig(reg_addr, signed)
+                rec(reg_addr, 2, False, ticks_diff(ticks_us(), t))
+                return result
+        else:   # write_reg_16
+            def wrapper(reg_addr, value):
+                t = ticks_us()
+                result = orig(reg_addr, value)
+                rec(reg_addr, 2, True, ticks_diff(ticks_us(), t))
+                return result
+        return wrapper
+
+    def _wrap_method(self, index: int, orig):
+        rec = self._record_call
+
+        def wrapper(*args, **kwargs):
+            t = ticks_us()
+            result = orig(*args, **kwargs)
+            rec(index, ticks_diff(ticks_us(), t))
+            return result
+        return wrapper
+
+    def enable(self):
+        """Подменяет методы экземпляра устройства обертками со счетчиками"""
+        if self._enabled:
+            return
+        dev = self._device
+        for name in _REG_METHODS:
+            setattr(dev, name, self._wrap_reg(name, getattr(dev, name)))
+        for index, name in enumerate(self._methods):
+            setattr(dev, name, self._wrap_method(index, getattr(dev, name)))
+        self._enabled = True
+
+    def disable(self):
+        """Удаляет обертки: вызываются методы класса, как без инструментирования. Счетчики сохраняются"""
+        if not self._enabled:
+            return
+        dev = self._device
+        for name in _REG_METHODS + self._methods:
+            delattr(dev, name)
+        self._enabled = False
+
+    # чтение счетчиков
+    def reset(self):
+        """Обнуляет счетчики. Назначение ячеек регистрам сохраняется"""
+        for arr in self._counters:
+            for i in range(len(arr)):
+                arr[i] = 0
+
+    def make_snapshot(self) -> InstrumentSnapshot:
+        """Возвращает копию счетчиков нужного размера для метода snapshot"""
+        snap = InstrumentSnapshot(self._reg_slots, len(self._methods), self._buckets)
+        self.snapshot(snap)
+        return snap
+
+    def snapshot(self, out: InstrumentSnapshot) -> InstrumentSnapshot:
+        """Копирует счетчики в out без выделения памяти. Возвращает out"""
+        _copy(out.reg_map, self._reg_map)
+        _copy(out.reads, self._reads)
+        _copy(out.writes, self._writes)
+        _copy(out.read_bytes, self._read_bytes)
+        _copy(out.write_bytes, self._write_bytes)
+        _copy(out.reg_hist, self._reg_hist)
+        _copy(out.calls, self._calls)
+        _copy(out.method_hist, self._method_hist)
+        return out
+
+    def get_register_stats(self, reg_addr: int) -> [register_stats, None]:
+        """Возвращает статистику регистра или None, если обращений к нему не было"""
+        s = self._reg_map[reg_addr & 0xFF]
+        if not s:
+            return None
+        s -= 1
+        b = self._buckets
+        return register_stats(reads=self._reads[s], writes=self._writes[s], read_bytes=self._read_bytes[s],
+                              write_bytes=self._write_bytes[s], histogram=tuple(self._reg_hist[s * b:(s + 1) * b]))
+
+    def get_method_stats(self, name: str) -> method_stats:
+        """Возвращает статистику метода name"""
+        index = self._methods.index(name)
+        b = self._buckets
+        return method_stats(calls=self._calls[index], histogram=tuple(self._method_hist[index * b:(index + 1) * b]))
+
+    def registers(self) -> tuple:
+        """Возвращает адреса регистров, к которым были обращения"""
+        return tuple(addr for addr in range(256) if self._reg_map[addr])
+
+    @property
+    def methods(self) -> tuple:
+        return self._methods
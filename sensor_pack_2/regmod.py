@@ -4,8 +4,9 @@
 """представление аппаратного регистра устройства"""
 
 # from sensor_pack_2 import bus_service
+from collections import namedtuple
 from sensor_pack_2.base_sensor import DeviceEx, get_error_str, check_value
-from sensor_pack_2.bitfield import BitFields
+from sensor_pack_2.bitfield import BitFields, BitFieldsTransaction
 
 # 24.04.2024 было-> address: int; стало-> address: [int, None]. Смотри def __init__(...
 
@@ -42,6 +43,7 @@ class BaseRegistry:
                         get_error_str('field.position.step', field.position.step, range(1, 2)))  # шаг только единица!
         #
         self._value = 0  # значение, считанное из регистра
+        self._dev_value = None  # значение, которое находится в регистре устройства. None - неизвестно
 
     def _rw_enabled(self) -> bool:
         """Возвращает Истина, когда возможна запись в регистр по шине"""
@@ -97,6 +99,7 @@ class RegistryRO(BaseRegistry):
         by = self._device.read_reg(self._address, bl)
         fmt = "B" if 1 == bl else "H"
         self._value = self._device.unpack(fmt, by)[0]
+        self._dev_value = self._value
         return self._value
 
     def __int__(self) -> int:
@@ -110,5 +113,131 @@ class RegistryRW(RegistryRO):
         """Запись значения в регистр устройства.
         Если value в None, то метод запишет в регистр значение поля self.value"""
         if self._rw_enabled():
-            val = value if value else self.value
-            self._device.write_reg(self._address, val, self._byte_len)
+            val = value if value is not None else self.value
+            self._device.write_reg_int(self._address, val, self._byte_len)
+            self._dev_value = val
+
+    def _commit(self, value: int) -> bool:
+        """Функция фиксации транзакции. Записывает value в регистр, только если оно отличается от значения в регистре
+        устройства. Возвращает Истина, если была запись."""
+        self._value = value
+        if value == self._dev_value:
+            return False
+        self.write(value)
+        return self._rw_enabled()
+
+    def transaction(self) -> BitFieldsTransaction:
+        """Возвращает транзакцию для изменения нескольких битовых полей регистра одной записью по шине.
+        Если значение регистра не изменилось, записи не будет."""
+        return BitFieldsTransaction(self._fields, self.value, self._commit)
+
+
+# счетчики теневых копий регистров
+# hits - чтения, обслуженные без обращения к шине;
+# misses - чтения, потребовавшие обращения к шине;
+# writes - записи в регистры устройства;
+# suppressed - записи, которые не производились, так как значение в регистре не изменилось
+shadow_stats = namedtuple("shadow_stats", "hits misses writes suppressed")
+
+
+class RegisterShadow:
+    """Теневые копии записываемых 16-ти битных регистров устройства.
+    Запись в регистр со значением, равным теневой копии, не производится. Чтение регистра с известной
+    теневой копией не требует обращения к шине.
+    writable - словарь: адрес регистра: маска записываемых бит. Биты вне маски (флаги, зарезервированные биты)
+    в теневой копии не хранятся и при сравнении не учитываются."""
+
+    def __init__(self, device: DeviceEx, writable: dict):
+        self._device = device
+        self._masks = writable
+        # теневые копии. адрес регистра: значение. Отсутствие адреса - значение неизвестно
+        self._values = dict()
+        # адреса регистров, теневые копии которых изменены, но еще не записаны в устройство
+        self._dirty = set()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Обнуляет счетчики"""
+        self._hits = self._misses = self._writes = self._suppressed = 0
+
+    def get_stats(self) -> shadow_stats:
+        """Возвращает счетчики теневых копий"""
+        return shadow_stats(hits=self._hits, misses=self._misses, writes=self._writes, suppressed=self._suppressed)
+
+    def __contains__(self, reg_addr: int) -> bool:
+        """Возвращает Истина, если значение регистра известно"""
+        return reg_addr in self._values
+
+    def get(self, reg_addr: int) -> [int, None]:
+        """Возвращает теневую копию регистра без обращения к шине или None, если она неизвестна"""
+        return self._values.get(reg_addr)
+
+    def update(self, reg_addr: int, value: int):
+        """Запоминает значение, прочитанное из регистра устройства другим способом"""
+        if reg_addr in self._masks and reg_addr not in self._dirty:
+            self._values[reg_addr] = value & self._masks[reg_addr]
+
+    def read(self, reg_addr: int) -> int:
+        """Возвращает значение регистра. Обращение к шине производится только если теневая копия неизвестна"""
+        val = self._values.get(reg_addr)
+        if val is not None:
+            self._hits += 1
+            return val
+        self._misses += 1
+        val = self._device.read_reg_16(reg_addr) & self._masks[reg_addr]
+        self._values[reg_addr] = val
+        return val
+
+    def write(self, reg_addr: int, value: int, force: bool = False) -> bool:
+        """Сквозная запись value в регистр устройства. Если force в Ложь и value совпадает с теневой копией,
+        то запись не производится. Возвращает Истина, если запись была произведена."""
+        val = value & self._masks[reg_addr]
+        if not force and val == self._values.get(reg_addr) and reg_addr not in self._dirty:
+            self._suppressed += 1
+            return False
+        # на случай исключения во время обмена по шине
+        self._values.pop(reg_addr, None)
+        self._device.write_reg_16(reg_addr, value)
+        self._values[reg_addr] = val
+        self._dirty.discard(reg_addr)
+        self._writes += 1
+        return True
+
+    def set(self, reg_addr: int, value: int):
+        """Изменяет теневую копию без записи в устройство (отложенная запись). Смотри метод flush"""
+        val = value & self._masks[reg_addr]
+        if val == self._values.get(reg_addr):
+            return
+        self._values[reg_addr] = val
+        self._dirty.add(reg_addr)
+
+    def is_dirty(self, reg_addr: [int, None] = None) -> bool:
+        """Возвращает Истина, если теневая копия регистра (любого регистра при reg_addr is None) не записана в устройство"""
+        if reg_addr is None:
+            return 0 != len(self._dirty)
+        return reg_addr in self._dirty
+
+    def flush(self) -> int:
+        """Записывает в устройство все измененные теневые копии. Возвращает количество записей"""
+        cnt = 0
+        for reg_addr in tuple(self._dirty):
+            self.write(reg_addr, self._values[reg_addr], force=True)
+            cnt += 1
+        return cnt
+
+    def invalidate(self, reg_addr: [int, None] = None):
+        """Делает теневую копию регистра (всех регистров при reg_addr is None) неизвестной.
+        Неизвестные копии будут считаны из устройства при следующем чтении"""
+        if reg_addr is None:
+            self._values.clear()
+            self._dirty.clear()
+            return
+        self._values.pop(reg_addr, None)
+        self._dirty.discard(reg_addr)
+
+    def resync(self, reg_addr: [int, None] = None):
+        """Считывает из устройства регистр (все записываемые регистры при reg_addr is None) в теневые копии"""
+        addresses = self._masks if reg_addr is None else (reg_addr,)
+        for addr in addresses:
+            self.invalidate(addr)
+            self.read(addr)
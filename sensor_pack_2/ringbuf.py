@@ -0,0 +1,113 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Кольцевой буфер на массивах array для быстрого сбора 'сырых' отсчетов"""
+from array import array
+
+
+class RingBuffer:
+    """Кольцевой буфер из нескольких каналов (массивов array) одинаковой длины.
+    Предназначен для одного производителя и одного потребителя (SPSC) и не требует блокировок:
+    производитель изменяет только индекс записи, потребитель - только индекс чтения.
+    Производитель и потребитель могут работать в разных потоках (_thread) или в обработчике прерывания,
+    запланированном через micropython.schedule.
+    Во время работы память в куче не выделяется!
+    Производитель:
+        i = rb.reserve()
+        if i >= 0:
+            rb.channel(0)[i] = value
+            rb.commit()
+    Потребитель:
+        i = rb.peek()
+        if i >= 0:
+            value = rb.channel(0)[i]
+            rb.release()"""
+
+    def __init__(self, capacity: int, typecodes: [tuple, str]):
+        """capacity - количество элементов в каждом канале;
+        typecodes - коды типов элементов каналов (смотри модуль array), по одному на канал. Например ('h', 'H')"""
+        if capacity < 1 or not typecodes:
+            raise ValueError(f"Неверный параметр кольцевого буфера! capacity: {capacity}; typecodes: {typecodes}")
+        # одна ячейка всегда свободна, чтобы отличить полный буфер от пустого
+        size = 1 + capacity
+        self._size = size
+        self._channels = tuple(array(tc, (0 for _ in range(size))) for tc in typecodes)
+        self._head = 0  # индекс записи. изменяет только производитель
+        self._tail = 0  # индекс чтения. изменяет только потребитель
+        # количество отсчетов, которые не поместились в буфер
+        self.overruns = 0
+
+    @property
+    def capacity(self) -> int:
+        """Возвращает емкость буфера в элементах"""
+        return self._size - 1
+
+    @property
+    def channels(self) -> int:
+        """Возвращает количество каналов"""
+        return len(self._channels)
+
+    def channel(self, index: int) -> array:
+        """Возвращает массив канала с номером index"""
+        return self._channels[index]
+
+    def __len__(self) -> int:
+        """Возвращает количество элементов, доступных для чтения"""
+        return (self._head - self._tail) % self._size
+
+    def is_empty(self) -> bool:
+        return self._head == self._tail
+
+    def is_full(self) -> bool:
+        return (self._head + 1) % self._size == self._tail
+
+    # производитель
+    def reserve(self) -> int:
+        """Возвращает индекс элемента для записи или -1, если буфер полон (счетчик overruns увеличивается).
+        После записи значений во все каналы вызовите commit."""
+        head = self._head
+        if (head + 1) % self._size == self._tail:
+            self.overruns += 1
+            return -1
+        return head
+
+    def commit(self):
+        """Делает записанный элемент доступным потребителю"""
+        self._head = (self._head + 1) % self._size
+
+    # потребитель
+    def peek(self) -> int:
+        """Возвращает индекс самого старого элемента для чтения или -1, если буфер пуст.
+        После чтения значений из всех каналов вызовите release."""
+        tail = self._tail
+        if tail == self._head:
+            return -1
+        return tail
+
+    def release(self):
+        """Освобождает прочитанный элемент"""
+        self._tail = (self._tail + 1) % self._size
+
+    def clear(self):
+        """Освобождает все элементы. Вызывается потребителем!"""
+        self._tail = self._head
+
+    def drain(self, out: tuple, start: int = 0) -> int:
+        """Переносит все доступные элементы в массивы out (по одному на канал, None - канал пропускается),
+        начиная с индекса start. Переносится не больше элементов, чем помещается в out.
+        Возвращает количество перенесенных элементов."""
+        channels = self._channels
+        n_channels = len(channels)
+        limit = min(len(arr) for arr in out if arr is not None) - start
+        cnt = 0
+        while cnt < limit:
+            i = self.peek()
+            if i < 0:
+                break
+            for ch in range(n_channels):
+                dst = out[ch]
+                if dst is not None:
+                    dst[start + cnt] = channels[ch][i]
+            self.release()
+            cnt += 1
+        return cnt
@@ -0,0 +1,289 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Эмуляция шины I2C и устройств на ней, для проверок и измерений без оборудования (например, на ПК).
+SimI2C имеет те же методы, что и machine.I2C, поэтому передается в bus_service.I2cAdapter вместо настоящей шины:
+    bus = SimI2C()
+    bus.attach(0x40, INA226Emu())
+    adapter = I2cAdapter(bus)
+SimPin заменяет machine.Pin с прерыванием, например для вывода ALERT эмулятора INA226."""
+from collections import namedtuple
+
+
+class SimClock:
+    """Управляемые вручную часы в мкс, для детерминированных проверок.
+    Экземпляр вызывается как функция и возвращает текущее время, время изменяется только методом advance."""
+
+    def __init__(self, start_us: int = 0):
+        self.now = start_us
+
+    def __call__(self) -> int:
+        return self.now
+
+    def advance(self, us: int) -> int:
+        """Сдвигает время вперед на us мкс. Возвращает новое время"""
+        self.now += us
+        return self.now
+
+
+class SimDevice:
+    """Устройство на эмулируемой шине I2C. Для переопределения в классах-наследниках!"""
+
+    def i2c_write(self, data):
+        """Транзакция записи: data - все байты после адреса устройства"""
+        raise NotImplementedError
+
+    def i2c_read(self, n: int) -> bytes:
+        """Транзакция чтения n байт"""
+        raise NotImplementedError
+
+
+class RegisterDevice(SimDevice):
+    """Устройство с 16-ти битными регистрами (порядок байт 'big') и указателем регистра, который запоминается
+    устройством: первый байт записи - адрес регистра, следующие два байта (если есть) - значение регистра.
+    Чтение возвращает значение регистра, на который указывает указатель."""
+
+    def __init__(self):
+        self._pointer = 0
+
+    @property
+    def pointer(self) -> int:
+        """Текущее значение указателя регистра"""
+        return self._pointer
+
+    def read_reg(self, reg_addr: int) -> int:
+        """Для переопределения в классах-наследниках!"""
+        raise NotImplementedError
+
+    def write_reg(self, reg_addr: int, value: int):
+        """Для переопределения в классах-наследниках!"""
+        raise NotImplementedError
+
+    def i2c_write(self, data):
+        if not data:
+            return
+        self._pointer = data[0]
+        if len(data) >= 3:
+            self.write_reg(data[0], (data[1] << 8) | data[2])
+
+    def i2c_read(self, n: int) -> bytes:
+        val = self.read_reg(self._pointer)
+        buf = bytearray(n)
+        for i in range(n):
+            # байты сверх двух повторяют значение регистра
+            buf[i] = (val >> 8) & 0xFF if 0 == i & 1 else val & 0xFF
+        return buf
+
+
+class SimI2C:
+    """Эмулируемая шина I2C. Методы совпадают с machine.I2C.
+    Обращение к адресу, по которому нет устройства, вызывает OSError(19) (ENODEV), как у MicroPython."""
+
+    def __init__(self):
+        self._devices = dict()
+
+    def attach(self, address: int, device: SimDevice) -> SimDevice:
+        """Подключает устройство device к шине по адресу address. Возвращает device"""
+        self._devices[address] = device
+        return device
+
+    def detach(self, address: int):
+        self._devices.pop(address, None)
+
+    def device(self, address: int) -> SimDevice:
+        """Возвращает устройство по адресу address"""
+        dev = self._devices.get(address)
+        if dev is None:
+            raise OSError(19)
+        return dev
+
+    def scan(self) -> list:
+        return sorted(self._devices)
+
+    def writeto(self, addr: int, buf, stop: bool = True) -> int:
+        """Возвращает количество подтвержденных (ACK) байт"""
+        self.device(addr).i2c_write(bytes(buf))
+        return len(buf)
+
+    def readfrom(self, addr: int, nbytes: int, stop: bool = True) -> bytes:
+        return bytes(self.device(addr).i2c_read(nbytes))
+
+    def readfrom_into(self, addr: int, buf, stop: bool = True):
+        buf[:] = self.device(addr).i2c_read(len(buf))
+
+    def writeto_mem(self, addr: int, memaddr: int, buf, addrsize: int = 8):
+        dev = self.device(addr)
+        dev.i2c_write(bytes((memaddr,)) + bytes(buf))
+
+    def readfrom_mem(self, addr: int, memaddr: int, nbytes: int, addrsize: int = 8) -> bytes:
+        dev = self.device(addr)
+        dev.i2c_write(bytes((memaddr,)))
+        return bytes(dev.i2c_read(nbytes))
+
+    def readfrom_mem_into(self, addr: int, memaddr: int, buf, addrsize: int = 8):
+        dev = self.device(addr)
+        dev.i2c_write(bytes((memaddr,)))
+        buf[:] = dev.i2c_read(len(buf))
+
+
+# затраты времени шины
+# transactions - количество транзакций (от START до STOP); bytes - количество байт на шине, включая байты адреса
+# устройства и указателя регистра; busy_us - время занятости шины, мкс
+bus_stats = namedtuple("bus_stats", "transactions bytes busy_us")
+
+
+class TimedSimI2C(SimI2C):
+    """Эмулируемая шина I2C с учетом времени передачи на уровне битов.
+    Байт на шине занимает 9 тактов (8 бит данных и ACK/NACK), условия START, повторный START и STOP - по одному такту.
+    Чтение регистра (readfrom_mem) - одна транзакция: START, адрес(W), указатель, повторный START, адрес(R),
+    данные, STOP. Запись (writeto_mem) - START, адрес(W), указатель, данные, STOP.
+    Если передан clock (SimClock), то его время сдвигается на время каждой транзакции: эмуляторы устройств
+    'видят' реальное время обмена по шине.
+    Пример:
+        bus = TimedSimI2C(freq=400_000)
+        ...
+        bus.reset_stats()
+        ina.read_snapshot()
+        print(bus.get_stats(0x40))"""
+
+    def __init__(self, freq: int = 400_000, clock: [SimClock, None] = None, record: bool = False,
+                 max_records: int = 10_000):
+        """freq - частота тактирования шины, Гц (100_000, 400_000, 1_000_000);
+        record - записывать каждую транзакцию (смотри свойство records), не более max_records записей."""
+        super().__init__()
+        if freq <= 0:
+            raise ValueError(f"Неверная частота шины: {freq}")
+        self.freq = freq
+        self._clock = clock
+        self._record = record
+        self._max_records = max_records
+        self._clock_rem_ns = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Обнуляет счетчики и записи транзакций"""
+        # адрес устройства: [транзакции, байты, такты]
+        self._counters = dict()
+        # записи: (адрес, байт записано, байт прочитано, повторный START, длительность в нс)
+        self.records = []
+
+    def _account(self, addr: int, n_write: int, n_read: int, repeated: bool):
+        """Учет транзакции: n_write байт записи и n_read байт чтения после адреса устройства"""
+        n_bytes = n_write + n_read + (2 if repeated else 1)
+        bits = 9 * n_bytes + (3 if repeated else 2)
+        cnt = self._counters.get(addr)
+        if cnt is None:
+            cnt = self._counters[addr] = [0, 0, 0]
+        cnt[0] += 1
+        cnt[1] += n_bytes
+        cnt[2] += bits
+        duration_ns = bits * 1_000_000_000 // self.freq
+        if self._record and len(self.records) < self._max_records:
+            self.records.append((addr, n_write, n_read, repeated, duration_ns))
+        if self._clock is not None:
+            # остаток в нс переносится на следующую транзакцию, чтобы время не 'отставало'
+            ns = self._clock_rem_ns + duration_ns
+            self._clock.advance(ns // 1000)
+            self._clock_rem_ns = ns % 1000
+
+    def _check(self, addr: int):
+        """Устройство не ответило (NACK) на адрес: транзакция из одного байта"""
+        if addr not in self._devices:
+            self._account(addr, 0, 0, False)
+            raise OSError(19)
+
+    def get_stats(self, address: [int, None] = None) -> bus_stats:
+        """Возвращает затраты шины на обмен с устройством по адресу address (со всеми устройствами при None)"""
+        if address is None:
+            counters = self._counters.values()
+        else:
+            counters = (self._counters.get(address, (0, 0, 0)),)
+        tr = by = bits = 0
+        for cnt in counters:
+            tr += cnt[0]
+            by += cnt[1]
+            bits += cnt[2]
+        return bus_stats(transactions=tr, bytes=by, busy_us=bits * 1_000_000 / self.freq)
+
+    def per_sample(self, samples: int, address: [int, None] = None) -> bus_stats:
+        """Возвращает затраты шины в расчете на один отсчет, если было произведено samples отсчетов"""
+        st = self.get_stats(address)
+        return bus_stats(transactions=st.transactions / samples, bytes=st.bytes / samples,
+                         busy_us=st.busy_us / samples)
+
+    def writeto(self, addr: int, buf, stop: bool = True) -> int:
+        self._check(addr)
+        self._account(addr, len(buf), 0, False)
+        return super().writeto(addr, buf, stop)
+
+    def readfrom(self, addr: int, nbytes: int, stop: bool = True) -> bytes:
+        self._check(addr)
+        self._account(addr, 0, nbytes, False)
+        return super().readfrom(addr, nbytes, stop)
+
+    def readfrom_into(self, addr: int, buf, stop: bool = True):
+        self._check(addr)
+        self._account(addr, 0, len(buf), False)
+        return super().readfrom_into(addr, buf, stop)
+
+    def writeto_mem(self, addr: int, memaddr: int, buf, addrsize: int = 8):
+        self._check(addr)
+        self._account(addr, addrsize // 8 + len(buf), 0, False)
+        return super().writeto_mem(addr, memaddr, buf, addrsize)
+
+    def readfrom_mem(self, addr: int, memaddr: int, nbytes: int, addrsize: int = 8) -> bytes:
+        self._check(addr)
+        self._account(addr, addrsize // 8, nbytes, True)
+        return super().readfrom_mem(addr, memaddr, nbytes, addrsize)
+
+    def readfrom_mem_into(self, addr: int, memaddr: int, buf, addrsize: int = 8):
+        self._check(addr)
+        self._account(addr, addrsize // 8, len(buf), True)
+        return super().readfrom_mem_into(addr, memaddr, buf, addrsize)
+
+
+class SimPin:
+    """Заменитель machine.Pin (вход с прерыванием), для проверок без оборудования.
+    Уровень входа возвращает функция level (например, lambda: emu.alert_pin). Перепады уровня обнаруживаются
+    методом poll, который вызывается после изменения времени эмулятора, и вызывают обработчик, подключенный
+    методом irq, как прерывание вывода MCU:
+        pin = SimPin(lambda: emu.alert_pin)
+        reader = AlertReader(ina226, pin)
+        reader.start()
+        clock.advance(1100)
+        pin.poll()"""
+    IRQ_FALLING = 0x04
+    IRQ_RISING = 0x08
+
+    def __init__(self, level):
+        self._level = level
+        self._last = bool(level())
+        self._trigger = 0
+        self._handler = None
+        # количество вызовов обработчика
+        self.irq_count = 0
+
+    def value(self) -> int:
+        return 1 if self._level() else 0
+
+    def irq(self, handler=None, trigger: int = IRQ_FALLING | IRQ_RISING):
+        """Подключает обработчик handler(pin), вызываемый при перепаде trigger. None - отключает"""
+        self._handler = handler
+        self._trigger = trigger
+        self._last = bool(self._level())
+
+    def poll(self) -> bool:
+        """Сравнивает уровень входа с предыдущим. При перепаде, заданном в irq, вызывает обработчик.
+        Возвращает Истина, если обработчик был вызван. Обработчик может изменить уровень (например, чтение
+        Mask/Enable INA226 освобождает ALERT), поэтому после него уровень запоминается заново"""
+        level = bool(self._level())
+        edge = 0
+        if level != self._last:
+            edge = SimPin.IRQ_RISING if level else SimPin.IRQ_FALLING
+        self._last = level
+        if self._handler is None or not edge & self._trigger:
+            return False
+        self.irq_count += 1
+        self._handler(self)
+        self._last = bool(self._level())
+        return True
@@ -0,0 +1,202 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Потоковая статистика (количество, среднее, минимум, максимум, СКЗ, СКО) по целым 'сырым' кодам АЦП"""
+import math
+from collections import namedtuple
+from sensor_pack_2.timeutil import ticks_ms, ticks_diff
+
+# итог окна в физических величинах
+# count - количество отсчетов; mean - среднее; min, max - минимум и максимум; rms - среднеквадратичное значение;
+# std - среднеквадратичное отклонение (несмещенная оценка, 0 при count < 2)
+stats_summary = namedtuple("stats_summary", "count mean min max rms std")
+
+
+# предел сумм блока: 'малые' целые MicroPython на 32-х битных портах по модулю меньше 2 ** 30
+_BLOCK_LIMIT = (1 << 30) - 1
+# предел количества отсчетов блока: при отклонениях 16-ти битных кодов (по модулю меньше 2 ** 16) сумма отклонений
+# блока остается 'малым' целым
+_BLOCK_MAX = 1 << 14
+
+
+class RunningStats:
+    """Статистика одной величины. Отсчеты - целые 'сырые' коды АЦП, в физические величины (умножением на lsb)
+    они переводятся только в методе summary.
+    Вместо алгоритма Уэлфорда с плавающей точкой (числа с плавающей точкой в MicroPython размещаются в куче)
+    накапливаются целые суммы отклонений от первого отсчета блока и их квадратов. Блок заканчивается, когда
+    очередной отсчет вывел бы суммы за пределы 'малых' целых MicroPython (по модулю меньше 2 ** 30 на 32-х битных
+    портах) или в блоке _BLOCK_MAX отсчетов. Тогда суммы блока переносятся в точные итоговые суммы кодов и их квадратов
+    (это 'длинные' целые, память выделяется только при переносе), а следующий отсчет начинает новый блок.
+    Поэтому обработка отсчета не выделяет память при любой длине окна. Исключение - отклонение кода от первого
+    отсчета блока от 32 768 и больше (квадрат такого отклонения уже не 'малое' целое)."""
+
+    __slots__ = ("lsb", "shift", "_n", "_min", "_max", "_nb", "_ref", "_s1", "_s2", "_t1", "_t2")
+
+    def __init__(self, lsb: float = 1.0, shift: int = 0):
+        """lsb - цена младшего разряда кода, для перевода в физические величины;
+        shift - сдвиг вправо кода перед обработкой (например, 3 для регистра напряжения на шине INA219)."""
+        self.lsb = lsb
+        self.shift = shift
+        self.reset()
+
+    def reset(self):
+        """Начинает новое окно"""
+        self._n = self._min = self._max = 0
+        # блок: количество отсчетов, первый отсчет, суммы отклонений от него и их квадратов
+        self._nb = self._ref = self._s1 = self._s2 = 0
+        # итоговые суммы кодов и их квадратов по завершенным блокам
+        self._t1 = self._t2 = 0
+
+    @property
+    def count(self) -> int:
+        return self._n
+
+    def add(self, raw: int):
+        """Учитывает отсчет raw"""
+        raw >>= self.shift
+        if 0 == self._n:
+            self._min = self._max = raw
+        elif raw < self._min:
+            self._min = raw
+        elif raw > self._max:
+            self._max = raw
+        self._n += 1
+        if self._nb:
+            d = raw - self._ref
+            dd = d * d
+            if self._nb < _BLOCK_MAX and dd <= _BLOCK_LIMIT - self._s2:
+                self._nb += 1
+                self._s1 += d
+                self._s2 += dd
+                return
+            self._fold()
+        # первый отсчет блока
+        self._ref = raw
+        self._nb = 1
+
+    def _fold(self):
+        """Переносит суммы блока в итоговые суммы"""
+        t1, t2 = self._sums()
+        self._t1, self._t2 = t1, t2
+        self._nb = self._s1 = self._s2 = 0
+
+    def _sums(self) -> tuple:
+        """Возвращает точные суммы кодов и их квадратов с учетом текущего блока"""
+        nb, ref, s1 = self._nb, self._ref, self._s1
+        return self._t1 + nb * ref + s1, self._t2 + self._s2 + 2 * ref * s1 + nb * ref * ref
+
+    def raw_mean(self) -> float:
+        """Возвращает среднее значение в единицах кода"""
+        n = self._n
+        return self._sums()[0] / n if n else 0.0
+
+    def raw_variance(self) -> float:
+        """Возвращает дисперсию (несмещенную оценку) в единицах кода в квадрате"""
+        n = self._n
+        if n < 2:
+            return 0.0
+        t1, t2 = self._sums()
+        # числитель вычисляется в целых числах точно
+        return (n * t2 - t1 * t1) / (n * (n - 1))
+
+    def raw_rms(self) -> float:
+        """Возвращает среднеквадратичное значение в единицах кода"""
+        n = self._n
+        return math.sqrt(self._sums()[1] / n) if n else 0.0
+
+    def summary(self) -> stats_summary:
+        """Возвращает итог в физических величинах"""
+        lsb = self.lsb
+        return stats_summary(count=self._n, mean=lsb * self.raw_mean(), min=lsb * self._min, max=lsb * self._max,
+                             rms=abs(lsb) * self.raw_rms(), std=abs(lsb) * math.sqrt(self.raw_variance()))
+
+
+class WindowStats:
+    """Статистика нескольких величин (каналов) по окнам из window отсчетов и/или длительностью window_ms мс.
+    По окончании окна итоги всех каналов (кортеж stats_summary) передаются в callback, запоминаются в свойстве last
+    и окно начинается заново. Память выделяется при завершении окна (и изредка при переносе сумм блока, смотри
+    RunningStats), но не на каждый отсчет.
+    Пример:
+        ws = WindowStats(lsbs=(2.5E-6, 1.25E-3), window=1000, callback=print)
+        while True:
+            ws.add(0, shunt_raw)
+            ws.add(1, bus_raw)
+            ws.end_sample()"""
+
+    def __init__(self, lsbs: tuple, shifts: [tuple, None] = None, window: int = 0, window_ms: int = 0,
+                 callback=None):
+        """lsbs - цены младших разрядов каналов (количество каналов равно len(lsbs));
+        shifts - сдвиги вправо кодов каналов или None;
+        window - длина окна в отсчетах (0 - не ограничена);
+        window_ms - длительность окна в мс (0 - не ограничена);
+        callback(summaries: tuple) - вызывается по окончании каждого окна или None."""
+        if window < 0 or window_ms < 0 or not lsbs:
+            raise ValueError(f"Неверный параметр окна! window: {window}; window_ms: {window_ms}")
+        self._channels = tuple(RunningStats(lsb, shifts[i] if shifts else 0) for i, lsb in enumerate(lsbs))
+        self._window = window
+        self._window_ms = window_ms
+        self._callback = callback
+        self._n = 0
+        self._start_ms = 0
+        # итоги последнего завершенного окна
+        self.last = None
+        # количество завершенных окон
+        self.windows = 0
+
+    @property
+    def channels(self) -> int:
+        return len(self._channels)
+
+    def channel(self, index: int) -> RunningStats:
+        """Возвращает статистику канала с номером index"""
+        return self._channels[index]
+
+    def add(self, index: int, raw: int):
+        """Учитывает код raw канала index. После добавления кодов всех каналов отсчета вызовите end_sample"""
+        self._channels[index].add(raw)
+
+    def end_sample(self) -> [tuple, None]:
+        """Завершает отсчет. Возвращает итоги окна (кортеж stats_summary по каналам), если окно завершено, иначе None"""
+        if 0 == self._n:
+            self._start_ms = ticks_ms()
+        self._n += 1
+        if self._window and self._n >= self._window:
+            return self.emit()
+        if self._window_ms and ticks_diff(ticks_ms(), self._start_ms) >= self._window_ms:
+            return self.emit()
+        return None
+
+    def emit(self) -> [tuple, None]:
+        """Принудительно завершает текущее окно. Возвращает итоги или None, если в окне нет отсчетов"""
+        if 0 == self._n:
+            return None
+        result = tuple(ch.summary() for ch in self._channels)
+        self.reset()
+        self.last = result
+        self.windows += 1
+        if self._callback is not None:
+            self._callback(result)
+        return result
+
+    def reset(self):
+        """Отбрасывает текущее окно"""
+        self._n = 0
+        for ch in self._channels:
+            ch.reset()
+
+    def consume(self, rb, channel_indexes: [tuple, None] = None) -> int:
+        """Забирает все отсчеты из кольцевого буфера rb (sensor_pack_2.ringbuf.RingBuffer).
+        channel_indexes - номера каналов буфера для каналов статистики по порядку. Если None, то 0, 1, 2...
+        Возвращает количество обработанных отсчетов."""
+        channels = self._channels
+        src = tuple(rb.channel(i) for i in (range(len(channels)) if channel_indexes is None else channel_indexes))
+        cnt = 0
+        while True:
+            i = rb.peek()
+            if i < 0:
+                return cnt
+            for k in range(len(channels)):
+                channels[k].add(src[k][i])
+            rb.release()
+            self.end_sample()
+            cnt += 1
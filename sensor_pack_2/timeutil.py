@@ -0,0 +1,37 @@
+# micropython
+# MIT license
+# Copyright (c) 2024 Roman Shevchik   goctaprog@gmail.com
+"""Отсчеты времени в мкс/мс и задержки. Одинаковы для MicroPython и CPython (для проверок на ПК)"""
+import time
+
+try:
+    from time import ticks_us, ticks_ms, ticks_diff, ticks_add, sleep_us, sleep_ms
+except ImportError:
+    # CPython. Поведение как у MicroPython: значения отсчетов 'заворачиваются' по модулю _TICKS_PERIOD
+    _TICKS_PERIOD = 1 << 30
+    _TICKS_MAX = _TICKS_PERIOD - 1
+    _TICKS_HALF_PERIOD = _TICKS_PERIOD // 2
+
+    def ticks_us() -> int:
+        return (time.perf_counter_ns() // 1000) & _TICKS_MAX
+
+    def ticks_ms() -> int:
+        return (time.perf_counter_ns() // 1000_000) & _TICKS_MAX
+
+    def ticks_diff(ticks1: int, ticks2: int) -> int:
+        """Возвращает разность ticks1 - ticks2 с учетом 'заворачивания' значений"""
+        diff = (ticks1 - ticks2) & _TICKS_MAX
+        if diff >= _TICKS_HALF_PERIOD:
+            return diff - _TICKS_PERIOD
+        return diff
+
+    def ticks_add(ticks: int, delta: int) -> int:
+        return (ticks + delta) & _TICKS_MAX
+
+    def sleep_us(us: int):
+        if us > 0:
+            time.sleep(us / 1000_000)
+
+    def sleep_ms(ms: int):
+        if ms > 0:
+            time.sleep(ms / 1000)
@@ -0,0 +1,62 @@
+"""Проверка записи обмена (sensor_pack_2.bus_trace.RecordingAdapter) и его воспроизведения (ReplayAdapter)
+на эмулируемой шине: воспроизведение дает те же снимки, при расхождении в строгом режиме выбрасывается ValueError.
+Запуск: python -m pytest tests или python -m unittest discover tests
+
+Record and replay round trip test on the emulated bus."""
+import io
+import unittest
+from sensor_pack_2.bus_service import I2cAdapter
+from sensor_pack_2.sim_bus import SimI2C, SimClock
+from sensor_pack_2.bus_trace import RecordingAdapter, ReplayAdapter
+from ina_emu import INA226Emu
+from ina_ti import INA226
+
+# количество снимков
+_SAMPLES = 5
+
+
+def _session(sensor: INA226, advance=None) -> list:
+    """Калибровка, запуск измерений и чтение снимков. Возвращает значения снимков"""
+    sensor.calibrate(2.0, 0.01)
+    sensor.start_measurement(continuous=True)
+    result = []
+    for _ in range(_SAMPLES):
+        if advance:
+            advance()
+        snap = sensor.read_snapshot()
+        result.append(tuple(getattr(snap, name) for name in snap.__slots__))
+    return result
+
+
+class TestBusTrace(unittest.TestCase):
+
+    def setUp(self):
+        clock = SimClock()
+        bus = SimI2C()
+        emu = bus.attach(0x40, INA226Emu(clock=clock))
+        emu.set_input(shunt_voltage=0.0123, bus_voltage=11.7)
+        out = io.BytesIO()
+        self.recorder = RecordingAdapter(I2cAdapter(bus), out)
+        cycle = emu.get_cycle_time()
+        self.recorded = _session(INA226(self.recorder), lambda: clock.advance(cycle))
+        self.trace = out.getvalue()
+
+    def test_round_trip(self):
+        """Воспроизведение дает те же снимки и использует все записи"""
+        replay = ReplayAdapter(self.trace)
+        self.assertEqual(self.recorded, _session(INA226(replay)))
+        self.assertEqual(self.recorder.records, replay.replayed)
+        self.assertEqual(0, replay.remaining())
+
+    def test_strict_mismatch(self):
+        """Другие записываемые данные (калибровка для другого шунта) в строгом режиме - ValueError"""
+        sensor = INA226(ReplayAdapter(self.trace))
+        with self.assertRaises(ValueError):
+            sensor.calibrate(2.0, 0.02)
+        # без строгой проверки расхождение данных не обнаруживается
+        sensor = INA226(ReplayAdapter(self.trace, strict=False))
+        sensor.calibrate(2.0, 0.02)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+"""Проверка ina_ti.ConversionWaiter на эмулируемой шине: флаг готовности данных в снимке и количество транзакций.
+Эмулятор работает по реальному времени (ticks_us), так как ожидание использует реальное время.
+Запуск: python -m pytest tests или python -m unittest discover tests
+
+ConversionWaiter test on the emulated bus."""
+import unittest
+from sensor_pack_2.bus_service import I2cAdapter
+from sensor_pack_2.sim_bus import TimedSimI2C
+from ina_emu import INA219Emu, INA226Emu
+from ina_ti import INA219, INA226, ConversionWaiter
+
+# количество отсчетов
+_SAMPLES = 20
+
+
+class TestConversionWaiter(unittest.TestCase):
+
+    def _check(self, cls, emu, cal_args: tuple, data_regs: int):
+        bus = TimedSimI2C()
+        bus.attach(0x40, emu).set_input(shunt_voltage=0.0123, bus_voltage=11.7)
+        sensor = cls(I2cAdapter(bus))
+        sensor.calibrate(*cal_args)
+        sensor.start_measurement(continuous=True)
+        # большой запас времени ожидания: проверка не должна зависеть от загрузки компьютера
+        waiter = ConversionWaiter(sensor, timeout_factor=20)
+        for _ in range(_SAMPLES):
+            bus.reset_stats()
+            polls = waiter.get_stats().polls
+            self.assertTrue(waiter.wait(), cls.__name__)
+            snap = sensor.read_snapshot(status=waiter.status)
+            self.assertTrue(snap.conv_ready, cls.__name__)
+            # проверки готовности и регистры данных. Регистр состояния повторно не читается
+            polls = waiter.get_stats().polls - polls
+            self.assertEqual(polls + data_regs, bus.get_stats(0x40).transactions, cls.__name__)
+
+    def test_ina226(self):
+        # шунт, шина, ток, мощность
+        self._check(INA226, INA226Emu(), (2.0, 0.01), 4)
+
+    def test_ina219(self):
+        # шунт, ток, мощность (регистр шины INA219 и есть регистр состояния)
+        self._check(INA219, INA219Emu(), (2.0, 0.1), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+"""Проверка ina_array.SensorArray на эмулируемой шине: один драйвер опрашивает несколько датчиков.
+Запуск: python -m pytest tests или python -m unittest discover tests
+
+SensorArray test on the emulated bus."""
+import unittest
+from sensor_pack_2.bus_service import I2cAdapter
+from sensor_pack_2.sim_bus import SimI2C, SimClock
+from ina_emu import INA219Emu, INA226Emu
+from ina_ti import INA219, INA226
+from ina_array import SensorArray
+
+_ADDRESSES = (0x40, 0x41, 0x44)
+
+
+class TestSensorArray(unittest.TestCase):
+
+    def _check(self, cls, emu_cls, shunt_resistance: float):
+        clock = SimClock()
+        bus = SimI2C()
+        emus = [bus.attach(addr, emu_cls(clock=clock)) for addr in _ADDRESSES]
+        for i, emu in enumerate(emus):
+            emu.set_input(shunt_voltage=0.001 * (i + 1), bus_voltage=5.0 + i)
+        drv = cls(I2cAdapter(bus), address=_ADDRESSES[0], shunt_resistance=shunt_resistance)
+        drv.calibrate(2.0, shunt_resistance)
+        drv.start_measurement(continuous=True)
+        cal, cfg = drv.get_clbr_reg(), drv.get_config_field()
+        arr = SensorArray(drv, _ADDRESSES)
+        arr.set_config(drv.get_config_field())
+        arr.calibrate(1.0)
+        self.assertEqual(2 * len(_ADDRESSES), arr.apply())
+        self.assertEqual(0, arr.apply())
+        clock.advance(10_000)
+        arr.poll()
+        # адрес, калибровка и конфигурация, сохраненные драйвером, не изменяются
+        self.assertEqual(_ADDRESSES[0], drv.address)
+        self.assertEqual(cal, drv.get_clbr_reg())
+        self.assertEqual(cfg, drv.get_config_field())
+        units = arr.get_units()
+        for i, emu in enumerate(emus):
+            self.assertEqual(emu.read_reg(0x01), arr.shunt[i])
+            self.assertAlmostEqual(5.0 + i, units.bus[i], 2)
+            # ток = напряжение на шунте / сопротивление шунта
+            self.assertAlmostEqual(0.001 * (i + 1) / shunt_resistance, units.current[i], 2)
+        # все столбцы одного типа
+        self.assertEqual(1, len(set(type(col) for col in units)))
+
+    def test_ina226(self):
+        self._check(INA226, INA226Emu, 0.01)
+
+    def test_ina219(self):
+        self._check(INA219, INA219Emu, 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""Проверка ina_async.AsyncINA на эмулируемой шине: флаг готовности данных в снимке и количество транзакций.
+Эмулятор работает по реальному времени (ticks_us), так как asyncio ожидает реальное время.
+Запуск: python -m pytest tests или python -m unittest discover tests
+
+AsyncINA test on the emulated bus."""
+import unittest
+from sensor_pack_2.bus_service import I2cAdapter
+from sensor_pack_2.sim_bus import TimedSimI2C
+from ina_emu import INA219Emu, INA226Emu
+from ina_ti import INA219, INA226
+from ina_async import AsyncINA, asyncio
+
+# количество отсчетов
+_SAMPLES = 5
+
+
+class TestAsyncINA(unittest.TestCase):
+
+    def _check(self, cls, emu, cal_args: tuple):
+        bus = TimedSimI2C()
+        emu = bus.attach(0x40, emu)
+        emu.set_input(shunt_voltage=0.0123, bus_voltage=11.7)
+        sensor = cls(I2cAdapter(bus))
+        sensor.calibrate(*cal_args)
+        ina = AsyncINA(sensor, poll_interval_us=200, max_polls=50)
+        # подсчет проверок готовности
+        polls = [0]
+        get_status_reg = sensor.get_status_reg
+
+        def counted():
+            polls[0] += 1
+            return get_status_reg()
+        sensor.get_status_reg = counted
+
+        async def main():
+            await ina.start_measurement(continuous=True)
+            for _ in range(_SAMPLES):
+                bus.reset_stats()
+                polls[0] = 0
+                snap = await ina.read_snapshot()
+                self.assertTrue(snap.conv_ready, cls.__name__)
+                self.assertAlmostEqual(11.7, snap.bus, 2)
+                # проверки готовности и регистры данных: INA226 - шунт, шина, ток, мощность; INA219 - шунт, ток,
+                # мощность (регистр шины INA219 и есть регистр состояния). Регистр состояния повторно не читается
+                data_regs = 4 if cls is INA226 else 3
+                self.assertEqual(polls[0] + data_regs, bus.get_stats(0x40).transactions, cls.__name__)
+
+        asyncio.run(main())
+
+    def test_ina226(self):
+        self._check(INA226, INA226Emu(), (2.0, 0.01))
+
+    def test_ina219(self):
+        self._check(INA219, INA219Emu(), (2.0, 0.1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""Проверка сбора данных INA226 по прерыванию от вывода ALERT (ina_irq.AlertReader) на эмулируемой шине.
+Вывод MCU заменяется sensor_pack_2.sim_bus.SimPin, уровень которого задает вывод ALERT эмулятора (INA226Emu.alert_pin).
+Запуск: python -m pytest tests или python -m unittest discover tests
+
+AlertReader test on the emulated bus with a stand-in interrupt pin."""
+import unittest
+from sensor_pack_2.bus_service import I2cAdapter
+from sensor_pack_2.sim_bus import SimI2C, SimClock, SimPin
+from ina_emu import INA226Emu
+from ina_ti import INA226, CAPTURE_BUS
+from ina_irq import AlertReader
+
+# количество циклов преобразования
+_CYCLES = 10
+
+
+class TestAlertReader(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = SimClock()
+        bus = SimI2C()
+        self.emu = bus.attach(0x40, INA226Emu(clock=self.clock))
+        self.emu.set_input(shunt_voltage=0.0123, bus_voltage=11.7)
+        self.sensor = INA226(I2cAdapter(bus))
+        self.sensor.calibrate(2.0, 0.01)
+        self.sensor.start_measurement(continuous=True)
+        self.pin = SimPin(lambda: self.emu.alert_pin)
+        self.reader = AlertReader(self.sensor, self.pin, capacity=64)
+        self.cycle = self.emu.get_cycle_time()
+
+    def _run(self, cycles: int):
+        for _ in range(cycles):
+            self.clock.advance(self.cycle)
+            self.pin.poll()
+
+    def test_conversion_ready(self):
+        """Обработчик вызывается по каждому преобразованию (CNVR), в буфер записывается отсчет"""
+        self.reader.start()
+        self._run(_CYCLES)
+        self.assertEqual(_CYCLES, self.pin.irq_count)
+        self.assertEqual(_CYCLES, self.reader.samples)
+        rb = self.reader.buffer
+        self.assertEqual(_CYCLES, len(rb))
+        self.assertEqual(9360, rb.channel(CAPTURE_BUS)[rb.peek()])
+        # чтение Mask/Enable в обработчике освобождает ALERT
+        self.assertTrue(self.emu.alert_pin)
+
+    def test_limit_alert(self):
+        """Обработчик вызывается по срабатыванию порога (AFF), функция CNVR выключена"""
+        self.reader.start()
+        self.sensor.enable_conversion_ready_alert(False)
+        self.sensor.set_threshold('bus_ov', 10.0)
+        self._run(_CYCLES)
+        self.assertEqual(_CYCLES, self.pin.irq_count)
+        self.assertEqual(_CYCLES, self.reader.samples)
+        # порог не превышен: ALERT не срабатывает
+        self.sensor.set_threshold('bus_ov', 12.0)
+        self._run(_CYCLES)
+        self.assertEqual(_CYCLES, self.pin.irq_count)
+
+    def test_threshold_keeps_conversion_ready(self):
+        """set_threshold не выключает функцию CNVR и не изменяет LEN, APOL"""
+        self.reader.start()
+        me_reg = self.sensor.get_mask_enable()
+        self.sensor.set_threshold('bus_ov', 12.0)
+        self.assertEqual(me_reg | 0x2000, self.sensor.get_mask_enable())
+        self._run(_CYCLES)
+        self.assertEqual(_CYCLES, self.pin.irq_count)
+        self.sensor.clear_threshold()
+        self.assertEqual(me_reg, self.sensor.get_mask_enable())
+
+    def test_stop(self):
+        """После stop обработчик не вызывается"""
+        self.reader.start()
+        self._run(2)
+        self.reader.stop()
+        self._run(_CYCLES)
+        self.assertEqual(2, self.pin.irq_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""Проверка: чтение 16-ти битных регистров (DeviceEx.read_reg_16, get_shunt_reg, get_bus_reg) выполняется в заранее
+выделенный буфер. Эмулируемая шина считает вызовы методов machine.I2C, которые возвращают новый объект bytes
+(readfrom, readfrom_mem), то есть выделяют память в куче. На пути чтения такие вызовы недопустимы.
+Выполняется на эмулируемой шине (sensor_pack_2.sim_bus, ina_emu), без оборудования.
+Запуск: python -m pytest tests или python -m unittest discover tests
+
+Test that the 16-bit register read path only uses the non-allocating bus calls."""
+import unittest
+from sensor_pack_2.bus_service import I2cAdapter
+from sensor_pack_2.sim_bus import SimI2C, SimClock
+from ina_emu import INA219Emu, INA226Emu
+import ina_ti
+
+# количество вызовов каждого метода
+_CALLS = 100
+_CLASSES = (ina_ti.INA219Simple, ina_ti.INA219, ina_ti.INA226)
+# методы чтения: имя метода: аргументы
+_READ_PATH = {'get_shunt_reg': (), 'get_bus_reg': (), 'read_reg_16': (0x01, True)}
+
+
+class _SpyI2C(SimI2C):
+    """Эмулируемая шина, считающая вызовы методов с выделением памяти (allocating) и без него (into)"""
+
+    def __init__(self):
+        super().__init__()
+        self.allocating = self.into = 0
+
+    def readfrom(self, addr: int, nbytes: int, stop: bool = True) -> bytes:
+        self.allocating += 1
+        return super().readfrom(addr, nbytes, stop)
+
+    def readfrom_mem(self, addr: int, memaddr: int, nbytes: int, addrsize: int = 8) -> bytes:
+        self.allocating += 1
+        return super().readfrom_mem(addr, memaddr, nbytes, addrsize)
+
+    def readfrom_into(self, addr: int, buf, stop: bool = True):
+        self.into += 1
+        return super().readfrom_into(addr, buf, stop)
+
+    def readfrom_mem_into(self, addr: int, memaddr: int, buf, addrsize: int = 8):
+        self.into += 1
+        return super().readfrom_mem_into(addr, memaddr, buf, addrsize)
+
+
+def _make(cls, shunt_voltage: float = 0.0123):
+    clock = SimClock()
+    bus = _SpyI2C()
+    emu = bus.attach(0x40, INA226Emu(clock=clock) if cls is ina_ti.INA226 else INA219Emu(clock=clock))
+    emu.set_input(shunt_voltage=shunt_voltage, bus_voltage=11.7)
+    sensor = cls(I2cAdapter(bus))
+    clock.advance(10_000)
+    return sensor, bus, emu
+
+
+class TestReadPath(unittest.TestCase):
+
+    def test_no_allocating_bus_calls(self):
+        """Каждое чтение - один вызов readfrom_mem_into/readfrom_into, readfrom/readfrom_mem не вызываются"""
+        for cls in _CLASSES:
+            for name, args in _READ_PATH.items():
+                sensor, bus, _ = _make(cls)
+                method = getattr(sensor, name)
+                for _ in range(_CALLS):
+                    method(*args)
+                msg = f"{cls.__name__}.{name}"
+                self.assertEqual(0, bus.allocating, msg)
+                self.assertEqual(_CALLS, bus.into, msg)
+
+    def test_values(self):
+        """Значения, считанные через заранее выделенный буфер, совпадают с регистрами эмулятора"""
+        sensor, _, emu = _make(ina_ti.INA226, shunt_voltage=-0.0123)
+        self.assertEqual(-4920, sensor.get_shunt_reg())
+        self.assertEqual(9360, sensor.get_bus_reg())
+        self.assertEqual(emu.read_reg(0x01), sensor.read_reg_16(0x01, False))
+
+
+if __name__ == '__main__':
+    unittest.main()
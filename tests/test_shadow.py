@@ -0,0 +1,46 @@
+"""Проверка теневых копий регистров (sensor_pack_2.regmod.RegisterShadow) датчиков INA на эмулируемой шине.
+Запуск: python -m pytest tests или python -m unittest discover tests
+
+Register shadow test on the emulated bus."""
+import unittest
+from sensor_pack_2.bus_service import I2cAdapter
+from sensor_pack_2.sim_bus import TimedSimI2C
+from ina_emu import INA226Emu
+from ina_ti import INABaseEx, INA226
+
+
+class _Plain(INABaseEx):
+    """Наследник INABaseEx без собственного словаря _writable_regs"""
+
+    def get_pwr_lsb(self, curr_lsb: float) -> float:
+        return 20 * curr_lsb
+
+
+class TestShadow(unittest.TestCase):
+
+    def test_ina226_config_resync(self):
+        """Биты 14..12 конфигурации INA226 (только для чтения, читаются как 0b100) не вызывают лишних записей"""
+        bus = TimedSimI2C()
+        bus.attach(0x40, INA226Emu())
+        sensor = INA226(I2cAdapter(bus))
+        sensor.resync_shadow()
+        cfg = sensor.get_cfg_reg()
+        self.assertEqual(0x4000, cfg & 0x7000)
+        bus.reset_stats()
+        self.assertFalse(sensor.set_cfg_reg(cfg, force=False))
+        self.assertFalse(sensor.set_cfg_reg(cfg & 0x0FFF, force=False))
+        self.assertEqual(0, bus.get_stats(0x40).transactions)
+
+    def test_default_writable_regs(self):
+        """Наследник без собственного словаря _writable_regs создается, конфигурация и калибровка записываются"""
+        bus = TimedSimI2C()
+        bus.attach(0x40, INA226Emu())
+        sensor = _Plain(I2cAdapter(bus), 0x40, INA226._shunt_voltage_limit, 0.01, INA226._config_reg_ina226, 0.00512)
+        self.assertTrue(sensor.set_cfg_reg(0x4127, force=False))
+        self.assertFalse(sensor.set_cfg_reg(0x4127, force=False))
+        self.assertTrue(sensor.set_clbr_reg(2048))
+        self.assertEqual(2048, sensor.get_clbr_reg())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""Проверка sensor_pack_2.stats.RunningStats: итоги совпадают с модулем statistics, суммы блока остаются 'малыми'
+целыми MicroPython (по модулю меньше 2 ** 30) при любой длине окна.
+Запуск: python -m pytest tests или python -m unittest discover tests
+
+RunningStats test: exact results and bounded per-sample accumulators."""
+import math
+import random
+import statistics
+import unittest
+from sensor_pack_2.stats import RunningStats
+
+_SMALL = 1 << 30
+
+
+class TestRunningStats(unittest.TestCase):
+
+    def _check(self, codes: list):
+        rs = RunningStats(lsb=0.5)
+        for raw in codes:
+            rs.add(raw)
+            self.assertLess(abs(rs._s1), _SMALL)
+            self.assertLess(rs._s2, _SMALL)
+        s = rs.summary()
+        self.assertEqual(len(codes), s.count)
+        self.assertAlmostEqual(0.5 * statistics.fmean(codes), s.mean, 6)
+        self.assertEqual(0.5 * min(codes), s.min)
+        self.assertEqual(0.5 * max(codes), s.max)
+        self.assertAlmostEqual(0.5 * statistics.stdev(codes), s.std, 6)
+        self.assertAlmostEqual(0.5 * math.sqrt(sum(c * c for c in codes) / len(codes)), s.rms, 6)
+
+    def test_long_window(self):
+        """Отклонения около 1000 кодов, окно намного длиннее блока без переноса сумм"""
+        rnd = random.Random(1)
+        self._check([20000 + rnd.randint(-1000, 1000) for _ in range(50_000)])
+
+    def test_full_scale(self):
+        """Коды во всем 16-ти битном диапазоне со знаком"""
+        rnd = random.Random(2)
+        self._check([rnd.randint(-32768, 32767) for _ in range(5000)])
+
+    def test_shift_and_reset(self):
+        rs = RunningStats(shift=3)
+        rs.add(8 * 100)
+        rs.reset()
+        self.assertEqual(0, rs.count)
+        for raw in (8 * 10, 8 * 20, 8 * 30):
+            rs.add(raw)
+        self.assertEqual(20.0, rs.raw_mean())
+        self.assertEqual(100.0, rs.raw_variance())
+
+
+if __name__ == '__main__':
+    unittest.main()